@@ -1,7 +1,15 @@
 from typing import Any
 
-from accounts.tools import tools
+import os
 
+from accounts.tools import tools, sessions
+from accounts.session import thread_id
+from accounts import preroute
+from accounts.compaction import make_compaction_node
+from accounts.streaming import stream_model, astream_model
+
+from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_google_vertexai import ChatVertexAI
 
 from langgraph.graph import StateGraph, START, END
@@ -9,9 +17,13 @@ from langgraph.prebuilt import ToolNode
 from langgraph.prebuilt.chat_agent_executor import AgentState
 
 model_with_tools = ChatVertexAI(model='gemini-2.5-flash').bind_tools(tools)
+summary_model = ChatVertexAI(model='gemini-2.5-flash')
 
 QUERY = "How many account does James Smith (credit card number 8248) have?"
 
+# Rule-based identification before the first model turn, disable with ACCOUNTS_FAST_PATH=0
+FAST_PATH = os.environ.get('ACCOUNTS_FAST_PATH', '1') != '0'
+
 class State(AgentState):
     # updated by the tool
     user_id: int
@@ -24,9 +36,30 @@ def should_continue(state: State):
     return END
 
 
-def call_model(state: State):
+def with_user_details(messages: list, details: dict) -> list:
+    """Messages with details of the identified user added to the system message"""
+    note = f'Details of the identified user, as returned by get_user_details: {details}'
+    if messages and isinstance(messages[0], SystemMessage):
+        return [SystemMessage(f'{messages[0].content}\n\n{note}'), *messages[1:]]
+    return [SystemMessage(note), *messages]
+
+
+def call_model(state: State, config: RunnableConfig):
+    messages = state["messages"]
+    # Details prefetched when identify_user set user_id save a get_user_details round trip
+    details = sessions.get(thread_id(config), state.get("user_id"))
+    if details is not None:
+        messages = with_user_details(messages, details)
+    response = stream_model(model_with_tools, messages, config)
+    return {"messages": [response]}
+
+
+async def acall_model(state: State, config: RunnableConfig):
     messages = state["messages"]
-    response = model_with_tools.invoke(messages)
+    details = await sessions.aget(thread_id(config), state.get("user_id"))
+    if details is not None:
+        messages = with_user_details(messages, details)
+    response = await astream_model(model_with_tools, messages, config)
     return {"messages": [response]}
 
 tool_node = ToolNode(tools)
@@ -34,11 +67,20 @@ tool_node = ToolNode(tools)
 workflow = StateGraph(State)
 
 # Define the two nodes we will cycle between
-workflow.add_node("agent", call_model)
+# Sync and async runs stream the model, ainvoke/astream keep no thread busy during generation
+workflow.add_node("agent", RunnableLambda(call_model, afunc=acall_model, name="agent"))
 workflow.add_node("tools", tool_node)
+# Long threads are summarized before the model sees them again
+workflow.add_node("compact", make_compaction_node(summary_model))
 
-workflow.add_edge(START, "agent")
+if FAST_PATH:
+    workflow.add_node("preroute", preroute.preroute)
+    workflow.add_edge(START, "preroute")
+    workflow.add_conditional_edges("preroute", preroute.route, {"tools": "tools", "agent": "compact"})
+else:
+    workflow.add_edge(START, "compact")
+workflow.add_edge("compact", "agent")
 workflow.add_conditional_edges("agent", should_continue, ["tools", END])
-workflow.add_edge("tools", "agent")
+workflow.add_edge("tools", "compact")
 
 app = workflow.compile()
\ No newline at end of file
@@ -0,0 +1,120 @@
+from typing import Optional, List, Tuple
+
+import os
+
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately, get_buffer_string
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+# Thread is compacted once its messages exceed this many tokens, configurable per run as compact_threshold
+COMPACT_THRESHOLD = int(os.environ.get('ACCOUNTS_COMPACT_TOKENS', 8000))
+# Most recent messages kept as they are, configurable per run as compact_keep
+COMPACT_KEEP = 6
+
+SUMMARY_ID = 'compaction-summary'
+
+SUMMARY_PROMPT = """Summarize the earlier part of a customer support conversation below for the assistant continuing it.
+Keep facts the assistant may still need: who the user is, identification already done, account numbers and types,
+questions asked and answers given. Leave out greetings and repeated tool payloads. Respond with the summary only.
+
+{conversation}"""
+
+
+def _setting(config: Optional[RunnableConfig], key: str, default: int) -> int:
+    return int(((config or {}).get('configurable') or {}).get(key, default))
+
+
+def split_history(messages: List[BaseMessage], keep: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """
+    Split messages into older part to summarize and recent part to keep
+
+    The recent part starts with the user message of the current turn, so the model always sees
+    the question it works on, and whole turns are kept where possible. When the current turn
+    alone is longer than keep, its earlier tool calls and results are summarized, and after the
+    user message the recent part never starts with a tool result separated from its AI call.
+    """
+    start = max(len(messages) - keep, 0)
+    turn = next((index for index in range(len(messages) - 1, -1, -1) if isinstance(messages[index], HumanMessage)), None)
+
+    if turn is None:
+        while 0 < start < len(messages) and isinstance(messages[start], ToolMessage):
+            start -= 1
+        return messages[:start], messages[start:]
+
+    if start <= turn:
+        # Back to the user message of the turn the window begins in, forward to the first one
+        # when the window begins before any user message (e.g. with an earlier summary)
+        humans = [index for index in range(turn + 1) if isinstance(messages[index], HumanMessage)]
+        start = max((index for index in humans if index <= start), default=humans[0])
+        return messages[:start], messages[start:]
+
+    # Current turn alone is longer than keep, its user message stays ahead of the kept part
+    while start > turn + 1 and isinstance(messages[start], ToolMessage):
+        start -= 1
+    return messages[:turn] + messages[turn + 1:start], [messages[turn]] + messages[start:]
+
+
+def _summary_input(older: List[BaseMessage], user_id: Optional[int]) -> str:
+    conversation = get_buffer_string(older)
+    if user_id is not None:
+        conversation = f'Identified user_id: {user_id}\n\n{conversation}'
+    return SUMMARY_PROMPT.format(conversation=conversation)
+
+
+def _update(summary: str, recent: List[BaseMessage], user_id: Optional[int]) -> dict:
+    note = f'Summary of the earlier conversation:\n{summary}'
+    if user_id is not None:
+        note += f'\n\nThe user is already identified, user_id = {user_id}.'
+    # Summary has to be the first message, so the whole list is replaced
+    return {'messages': [RemoveMessage(id=REMOVE_ALL_MESSAGES), SystemMessage(note, id=SUMMARY_ID), *recent]}
+
+
+def make_compaction_node(model: Runnable, threshold: int = COMPACT_THRESHOLD, keep: int = COMPACT_KEEP) -> RunnableLambda:
+    """
+    Create graph node compacting message history of long threads
+
+    When messages of the thread exceed threshold tokens, everything but the last keep messages
+    (including an earlier summary and old tool results) is summarized by model into one system
+    note at the start of the thread. user_id in the state is untouched and repeated in the note.
+    Threshold and keep can be overridden per run with configurable compact_threshold and compact_keep.
+
+    Args:
+        model: Chat model writing the summary
+        threshold: Token count of messages which triggers compaction
+        keep: Number of most recent messages kept as they are
+
+    Returns:
+        Node with sync and async implementation
+    """
+    # Summary is internal, its tokens are not streamed to the user
+    model = model.with_config(tags=[TAG_NOSTREAM])
+
+    def plan(state, config: RunnableConfig) -> Optional[Tuple[List[BaseMessage], List[BaseMessage]]]:
+        messages = state['messages']
+        if count_tokens_approximately(messages) <= _setting(config, 'compact_threshold', threshold):
+            return None
+        older, recent = split_history(messages, _setting(config, 'compact_keep', keep))
+        # A lone earlier summary is not worth summarizing again
+        if not older or (len(older) == 1 and older[0].id == SUMMARY_ID):
+            return None
+        return older, recent
+
+    def compact(state, config: RunnableConfig):
+        split = plan(state, config)
+        if split is None:
+            return {}
+        older, recent = split
+        summary = model.invoke(_summary_input(older, state.get('user_id')), config)
+        return _update(summary.text(), recent, state.get('user_id'))
+
+    async def acompact(state, config: RunnableConfig):
+        split = plan(state, config)
+        if split is None:
+            return {}
+        older, recent = split
+        summary = await model.ainvoke(_summary_input(older, state.get('user_id')), config)
+        return _update(summary.text(), recent, state.get('user_id'))
+
+    return RunnableLambda(compact, afunc=acompact, name='compact')
@@ -0,0 +1,162 @@
+from typing import Optional, Union, Dict, List, Tuple, Iterable
+
+import gc
+from collections import defaultdict
+from pathlib import Path
+
+# Account types which are not credit cards, matched by account_last_four
+NON_CREDIT_TYPES = ('CHECKING', 'SAVINGS')
+
+
+def normalize_name(name: str) -> str:
+    """Form of a name used for lookups, case- and surrounding whitespace-insensitive"""
+    return name.strip().casefold()
+
+
+def last_four(account_no: Union[int, str]) -> str:
+    return str(account_no)[-4:]
+
+
+class Directory:
+    """
+    Customer directory with hash indexes over users and accounts
+
+    Indexes are built once, so identifying a user and getting their details cost the same
+    however many users and accounts the directory holds:
+    - (first name, last name) -> user IDs
+    - (user ID, account type, last four digits) -> accounts
+    - user ID -> user and their accounts
+
+    Users and accounts have the same shape as accounts.tools.USERS and ACCOUNTS.
+
+    Args:
+        users: Users with id, name (first, last) and DOB
+        accounts: Accounts with account_no, user and type
+    """
+
+    def __init__(self, users: Iterable[Dict], accounts: Iterable[Dict]):
+        self._users: Dict[int, Dict] = {}
+        self._by_name: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        self._by_last_four: Dict[Tuple[int, str, str], List[Dict]] = defaultdict(list)
+        self._accounts: Dict[int, List[Dict]] = defaultdict(list)
+        self._frames = None
+
+        # Building millions of small containers triggers many useless cyclic GC passes
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for user in users:
+                self._users[user['id']] = user
+                self._by_name[normalize_name(user['name']['first']), normalize_name(user['name']['last'])].append(user['id'])
+
+            for account in accounts:
+                self._accounts[account['user']].append(account)
+                self._by_last_four[account['user'], account['type'], last_four(account['account_no'])].append(account)
+        finally:
+            if enabled:
+                gc.enable()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def identify(
+        self,
+        first_name: str,
+        last_name: str,
+        credit_card_last_four: Optional[str] = None,
+        account_last_four: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        Find user by name and last four digits of a credit card or another account
+
+        Returns:
+            User ID if a user with this name has a matching account, None otherwise
+        """
+        for user_id in self._by_name.get((normalize_name(first_name), normalize_name(last_name)), ()):
+            if credit_card_last_four and (user_id, 'CREDIT', credit_card_last_four) in self._by_last_four:
+                return user_id
+            if account_last_four and any(
+                (user_id, kind, account_last_four) in self._by_last_four for kind in NON_CREDIT_TYPES
+            ):
+                return user_id
+        return None
+
+    def user(self, user_id: int) -> Optional[Dict]:
+        return self._users.get(user_id)
+
+    def accounts(self, user_id: int) -> List[Dict]:
+        return list(self._accounts.get(user_id, ()))
+
+    def frames(self):
+        """
+        Indexes as pandas DataFrames for vectorized joins, built on first use
+
+        Returns:
+            Names with columns first_key, last_key, user_id and rank (order of users sharing
+            the name), and accounts keys with columns user_id, type and last_four
+        """
+        if self._frames is None:
+            import pandas as pd
+
+            names = pd.DataFrame(
+                [(first, last, user_id, rank) for (first, last), ids in self._by_name.items() for rank, user_id in enumerate(ids)],
+                columns=['first_key', 'last_key', 'user_id', 'rank']
+            )
+            keys = pd.DataFrame(list(self._by_last_four), columns=['user_id', 'type', 'last_four'])
+            self._frames = names, keys
+        return self._frames
+
+    @classmethod
+    def from_frames(cls, users, accounts) -> 'Directory':
+        """
+        Build directory from pandas DataFrames
+
+        Args:
+            users: Columns id, first, last and DOB (dates, datetimes or ISO strings, missing allowed)
+            accounts: Columns account_no, user and type
+        """
+        import pandas as pd
+
+        # Same values as in USERS: dates, and None (not NaT) where DOB is missing
+        dob = pd.to_datetime(users['DOB'], format='ISO8601')
+        dob = dob.dt.date.astype(object).where(dob.notna(), None)
+
+        # Columns are converted to Python lists once, iterating over rows of a DataFrame is slow
+        return cls(
+            (
+                {'id': id, 'name': {'first': first, 'last': last}, 'DOB': birth}
+                for id, first, last, birth in zip(
+                    users['id'].tolist(), users['first'].tolist(), users['last'].tolist(), dob.tolist()
+                )
+            ),
+            (
+                {'account_no': account_no, 'user': user, 'type': type}
+                for account_no, user, type in zip(
+                    accounts['account_no'].tolist(), accounts['user'].tolist(), accounts['type'].tolist()
+                )
+            )
+        )
+
+    @classmethod
+    def load(cls, users: Union[str, Path], accounts: Union[str, Path]) -> 'Directory':
+        """
+        Bulk load directory from CSV or Parquet files, chosen by file extension
+
+        Args:
+            users: File with columns id, first, last and DOB (YYYY-MM-DD in CSV)
+            accounts: File with columns account_no, user and type
+        """
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise ImportError('Loading directory from files requires pandas') from e
+
+        def read(path: Union[str, Path], dtype: Dict):
+            if Path(path).suffix.lower() in ('.parquet', '.pq'):
+                return pd.read_parquet(path)
+            return pd.read_csv(path, dtype=dtype)
+
+        return cls.from_frames(
+            read(users, {'id': 'int64', 'first': str, 'last': str, 'DOB': str}),
+            read(accounts, {'account_no': 'int64', 'user': 'int64', 'type': str})
+        )
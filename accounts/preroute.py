@@ -0,0 +1,97 @@
+from typing import Optional, Dict, List
+
+import re
+import uuid
+from collections import Counter
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+# Two capitalized words, e.g. "James Smith" or "Mary-Ann O'Neil"; pairs overlap, so a greeting or
+# a title before a name does not hide it and a three word name is ambiguous
+_WORD = r"[A-Z](?:[a-z]+|(?='[A-Z]))(?:[-'][A-Za-z]+)*"
+_NAME = re.compile(rf"(?<![\w'-])(?=({_WORD}) ({_WORD})\b)")
+# Card or account mention followed closely by its number, the last four digits are used
+_CREDIT = re.compile(r'\b(?:credit\s*card|card)\b\D{0,30}?(\d[\d -]{2,22}\d)\b', re.IGNORECASE)
+_ACCOUNT = re.compile(r'\b(?:account|checking|savings)\b\D{0,30}?(\d[\d -]{2,22}\d)\b', re.IGNORECASE)
+_DIGITS = re.compile(r'\D')
+
+# Capitalized words which start a sentence or a greeting rather than a name
+STOPWORDS = frozenset({
+    'How', 'What', 'When', 'Where', 'Which', 'Who', 'Why', 'Can', 'Could', 'Would', 'Will',
+    'Does', 'Do', 'Is', 'Are', 'Please', 'Hello', 'Hi', 'Hey', 'Dear', 'My', 'The', 'This',
+    'Credit', 'Card', 'Account', 'Checking', 'Savings', 'Mr', 'Mrs', 'Ms', 'Dr',
+})
+
+# Fast path decisions: hit (identify_user called directly), miss (LLM decides), skipped
+stats = Counter()
+
+
+def _last_four(matches: List[str]) -> Optional[str]:
+    """Last four digits if all matches agree on them, None otherwise"""
+    numbers = {_DIGITS.sub('', match)[-4:] for match in matches}
+    if len(numbers) != 1:
+        return None
+    number = numbers.pop()
+    return number if len(number) == 4 else None
+
+
+def extract_identification(text: str) -> Optional[Dict[str, str]]:
+    """
+    Extract identify_user arguments from a message with rules
+
+    Returns:
+        Arguments if the message names exactly one person and gives unambiguous last four
+        digits of a credit card or an account, None otherwise
+    """
+    names = {
+        (first, last) for first, last in _NAME.findall(text)
+        if first not in STOPWORDS and last not in STOPWORDS
+    }
+    if len(names) != 1:
+        return None
+    first_name, last_name = names.pop()
+
+    arguments = {'first_name': first_name, 'last_name': last_name}
+    credit = _CREDIT.findall(text)
+    account = _ACCOUNT.findall(text)
+    if credit:
+        if (number := _last_four(credit)) is None:
+            return None
+        arguments['credit_card_last_four'] = number
+    if account:
+        if (number := _last_four(account)) is None:
+            return None
+        arguments['account_last_four'] = number
+    if len(arguments) == 2:
+        return None
+    return arguments
+
+
+def preroute(state) -> Dict:
+    """
+    Call identify_user directly when the new question carries the identification
+
+    Saves the model turn deciding to call the tool. Runs only while no user is identified and
+    the last message is from the user; anything ambiguous is left to the model.
+    """
+    messages = state["messages"]
+    if state.get("user_id") is not None or not messages or not isinstance(messages[-1], HumanMessage):
+        stats['skipped'] += 1
+        return {}
+
+    arguments = extract_identification(messages[-1].text())
+    if arguments is None:
+        stats['miss'] += 1
+        return {}
+
+    stats['hit'] += 1
+    call = {'name': 'identify_user', 'args': arguments, 'id': f'preroute-{uuid.uuid4()}', 'type': 'tool_call'}
+    return {"messages": [AIMessage(content='', tool_calls=[call])]}
+
+
+def route(state) -> str:
+    """Go to tools if preroute synthesized a tool call, to the model otherwise"""
+    last_message = state["messages"][-1]
+    if isinstance(last_message, AIMessage) and last_message.tool_calls:
+        return "tools"
+    return "agent"
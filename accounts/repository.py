@@ -0,0 +1,236 @@
+from typing import Optional, Union, Dict, List, Iterable, Callable, TypeVar
+
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import date
+from pathlib import Path
+
+from accounts.directory import Directory, NON_CREDIT_TYPES, normalize_name, last_four
+
+T = TypeVar('T')
+
+# Connections opened by one SQLiteRepository
+POOL_SIZE = 4
+
+
+class Repository(ABC):
+    """
+    Store of users and accounts used by accounts tools
+
+    Sync methods serve invoke/stream of the graph, async ones ainvoke/astream. Async methods
+    run the sync ones in the default executor unless a subclass has a native implementation.
+    Users and accounts have the same shape as accounts.tools.USERS and ACCOUNTS.
+    """
+
+    @abstractmethod
+    def identify(
+        self,
+        first_name: str,
+        last_name: str,
+        credit_card_last_four: Optional[str] = None,
+        account_last_four: Optional[str] = None
+    ) -> Optional[int]:
+        """User ID if a user with this name has a matching account, None otherwise"""
+
+    @abstractmethod
+    def get_user(self, user_id: int) -> Optional[Dict]:
+        """User by ID, None if not found"""
+
+    @abstractmethod
+    def get_accounts(self, user_id: int) -> List[Dict]:
+        """All accounts of the user"""
+
+    async def aidentify(
+        self,
+        first_name: str,
+        last_name: str,
+        credit_card_last_four: Optional[str] = None,
+        account_last_four: Optional[str] = None
+    ) -> Optional[int]:
+        return await asyncio.to_thread(self.identify, first_name, last_name, credit_card_last_four, account_last_four)
+
+    async def aget_user(self, user_id: int) -> Optional[Dict]:
+        return await asyncio.to_thread(self.get_user, user_id)
+
+    async def aget_accounts(self, user_id: int) -> List[Dict]:
+        return await asyncio.to_thread(self.get_accounts, user_id)
+
+    def close(self):
+        pass
+
+
+class DirectoryRepository(Repository):
+    """Repository over an in-memory Directory, lookups never block"""
+
+    def __init__(self, directory: Directory):
+        self.directory = directory
+
+    def identify(self, first_name, last_name, credit_card_last_four=None, account_last_four=None):
+        return self.directory.identify(first_name, last_name, credit_card_last_four, account_last_four)
+
+    def get_user(self, user_id):
+        return self.directory.user(user_id)
+
+    def get_accounts(self, user_id):
+        return self.directory.accounts(user_id)
+
+    async def aidentify(self, first_name, last_name, credit_card_last_four=None, account_last_four=None):
+        return self.identify(first_name, last_name, credit_card_last_four, account_last_four)
+
+    async def aget_user(self, user_id):
+        return self.get_user(user_id)
+
+    async def aget_accounts(self, user_id):
+        return self.get_accounts(user_id)
+
+
+class SQLiteRepository(Repository):
+    """
+    Reference repository backed by SQLite
+
+    Queries run in an executor with pool_size threads, each thread with its own connection, so
+    at most pool_size connections are open and each is used by one query at a time. Sync calls
+    wait for the result, async calls await it without holding a thread, so many concurrent tool
+    calls share one event loop and a few threads. SQL texts are constant and parametrized, so
+    every connection prepares each statement once and reuses it from its statement cache.
+
+    Args:
+        path: SQLite database file, created with the schema if needed
+        pool_size: Maximum number of open connections
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        first TEXT NOT NULL,
+        last TEXT NOT NULL,
+        first_key TEXT NOT NULL,
+        last_key TEXT NOT NULL,
+        dob TEXT,
+        -- Order in which users were added, users sharing a name are matched in this order like in Directory
+        rank INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS users_name ON users (last_key, first_key, rank);
+    CREATE TABLE IF NOT EXISTS accounts (
+        account_no INTEGER PRIMARY KEY,
+        user INTEGER NOT NULL REFERENCES users (id),
+        type TEXT NOT NULL,
+        last_four TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS accounts_user ON accounts (user, type, last_four);
+    """
+    IDENTIFY = f"""
+    SELECT users.id FROM users JOIN accounts ON accounts.user = users.id
+    WHERE users.last_key = ? AND users.first_key = ? AND (
+        (accounts.type = 'CREDIT' AND accounts.last_four = ?)
+        OR (accounts.type IN ({', '.join(f"'{kind}'" for kind in NON_CREDIT_TYPES)}) AND accounts.last_four = ?)
+    )
+    ORDER BY users.rank LIMIT 1
+    """
+    USER = 'SELECT id, first, last, dob FROM users WHERE id = ?'
+    ACCOUNTS = 'SELECT account_no, user, type FROM accounts WHERE user = ? ORDER BY account_no'
+
+    def __init__(self, path: Union[str, Path], pool_size: int = POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='accounts-db')
+        with closing(self._connect()) as db:
+            db.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, cached_statements=32)
+        db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    def populate(self, users: Iterable[Dict], accounts: Iterable[Dict]):
+        """Bulk insert users and accounts, replacing rows with the same IDs; users rank after those already stored"""
+        with closing(self._connect()) as db, db:
+            start = db.execute('SELECT COALESCE(MAX(rank), -1) + 1 FROM users').fetchone()[0]
+            db.executemany(
+                'INSERT OR REPLACE INTO users (id, first, last, first_key, last_key, dob, rank) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    (
+                        user['id'], user['name']['first'], user['name']['last'],
+                        normalize_name(user['name']['first']), normalize_name(user['name']['last']),
+                        user['DOB'].isoformat() if user.get('DOB') else None, rank
+                    )
+                    for rank, user in enumerate(users, start)
+                )
+            )
+            db.executemany(
+                'INSERT OR REPLACE INTO accounts (account_no, user, type, last_four) VALUES (?, ?, ?, ?)',
+                (
+                    (account['account_no'], account['user'], account['type'], last_four(account['account_no']))
+                    for account in accounts
+                )
+            )
+
+    def _query(self, query: Callable[[sqlite3.Connection], T]) -> T:
+        # Runs in the executor, connection of the thread is opened on its first query
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = self._connect()
+            with self._lock:
+                self._connections.append(db)
+        return query(db)
+
+    def _run(self, query: Callable[[sqlite3.Connection], T]) -> T:
+        return self._executor.submit(self._query, query).result()
+
+    async def _arun(self, query: Callable[[sqlite3.Connection], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._query, query)
+
+    def _identify_query(self, first_name, last_name, credit_card_last_four, account_last_four):
+        # None never equals a column value, so a missing number matches nothing
+        parameters = (normalize_name(last_name), normalize_name(first_name), credit_card_last_four or None, account_last_four or None)
+
+        def query(db: sqlite3.Connection) -> Optional[int]:
+            row = db.execute(self.IDENTIFY, parameters).fetchone()
+            return row[0] if row else None
+        return query
+
+    def _user_query(self, user_id: int):
+        def query(db: sqlite3.Connection) -> Optional[Dict]:
+            row = db.execute(self.USER, (user_id,)).fetchone()
+            if row is None:
+                return None
+            id, first, last, dob = row
+            return {'id': id, 'name': {'first': first, 'last': last}, 'DOB': date.fromisoformat(dob) if dob else None}
+        return query
+
+    def _accounts_query(self, user_id: int):
+        def query(db: sqlite3.Connection) -> List[Dict]:
+            rows = db.execute(self.ACCOUNTS, (user_id,)).fetchall()
+            return [{'account_no': account_no, 'user': user, 'type': type} for account_no, user, type in rows]
+        return query
+
+    def identify(self, first_name, last_name, credit_card_last_four=None, account_last_four=None):
+        return self._run(self._identify_query(first_name, last_name, credit_card_last_four, account_last_four))
+
+    def get_user(self, user_id):
+        return self._run(self._user_query(user_id))
+
+    def get_accounts(self, user_id):
+        return self._run(self._accounts_query(user_id))
+
+    async def aidentify(self, first_name, last_name, credit_card_last_four=None, account_last_four=None):
+        return await self._arun(self._identify_query(first_name, last_name, credit_card_last_four, account_last_four))
+
+    async def aget_user(self, user_id):
+        return await self._arun(self._user_query(user_id))
+
+    async def aget_accounts(self, user_id):
+        return await self._arun(self._accounts_query(user_id))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for db in self._connections:
+                db.close()
+            self._connections.clear()
@@ -0,0 +1,151 @@
+from typing import Optional, Dict, Callable, Awaitable, Any
+
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain_core.runnables import RunnableConfig
+
+# Cached details are dropped after this many seconds
+SESSION_TTL = 300.0
+# Least recently used sessions are dropped above this number
+MAX_SESSIONS = 10_000
+# How long call_model waits for details still being prefetched
+PREFETCH_WAIT = 2.0
+
+
+def thread_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    """ID of the conversation thread of the run, None when the graph runs without one"""
+    return ((config or {}).get('configurable') or {}).get('thread_id')
+
+
+class _Entry:
+    __slots__ = ('user_id', 'future', 'created')
+
+    def __init__(self, user_id: int, future: Future):
+        self.user_id = user_id
+        self.future = future
+        self.created = time.monotonic()
+
+
+class SessionCache:
+    """
+    Details of the identified user of each conversation thread
+
+    Details are fetched speculatively in the background as soon as the user is identified,
+    since the next step almost always needs them. An entry is invalid once it is older than
+    ttl or the thread identifies a different user, and can be dropped with invalidate().
+
+    Args:
+        ttl: Seconds cached details stay valid
+        max_sessions: Maximum number of threads kept, least recently used are dropped
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='accounts-prefetch')
+        self.stats = {'prefetched': 0, 'hits': 0, 'misses': 0}
+
+    def _store(self, thread: str, user_id: int, future: Future):
+        with self._lock:
+            self._entries[thread] = _Entry(user_id, future)
+            self._entries.move_to_end(thread)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def _current(self, thread: str, user_id: int) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(thread)
+            if entry is None:
+                return None
+            if entry.user_id != user_id or time.monotonic() - entry.created > self.ttl:
+                del self._entries[thread]
+                return None
+            self._entries.move_to_end(thread)
+            return entry
+
+    def prefetch(self, thread: Optional[str], user_id: int, fetch: Callable[[int], Any]):
+        """
+        Start fetching details of the user in a background thread, unless already cached
+
+        Args:
+            thread: Conversation thread, nothing is cached without it
+            user_id: Identified user
+            fetch: Function returning details of the user
+        """
+        if thread is None or self._current(thread, user_id) is not None:
+            return
+        self._store(thread, user_id, self._executor.submit(fetch, user_id))
+        self.stats['prefetched'] += 1
+
+    def aprefetch(self, thread: Optional[str], user_id: int, fetch: Callable[[int], Awaitable]):
+        """Async version of prefetch, fetch coroutine runs as a task of the running loop"""
+        if thread is None or self._current(thread, user_id) is not None:
+            return
+        future = Future()
+        task = asyncio.get_running_loop().create_task(fetch(user_id))
+
+        def done(task: asyncio.Task):
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+        task.add_done_callback(done)
+        self._store(thread, user_id, future)
+        self.stats['prefetched'] += 1
+
+    def get(self, thread: Optional[str], user_id: Optional[int], wait: float = PREFETCH_WAIT) -> Optional[Dict]:
+        """
+        Cached details of the user, waiting up to wait seconds for a running prefetch
+
+        Returns:
+            Details if cached for this thread and user, None otherwise
+        """
+        if thread is None or user_id is None:
+            return None
+        entry = self._current(thread, user_id)
+        if entry is not None:
+            try:
+                details = entry.future.result(timeout=wait)
+                self.stats['hits'] += 1
+                return details
+            except Exception:
+                # Failed prefetch is dropped, details are fetched again on demand
+                self.invalidate(thread)
+        self.stats['misses'] += 1
+        return None
+
+    async def aget(self, thread: Optional[str], user_id: Optional[int], wait: float = PREFETCH_WAIT) -> Optional[Dict]:
+        """Async version of get, waiting for a running prefetch without blocking the loop"""
+        if thread is None or user_id is None:
+            return None
+        entry = self._current(thread, user_id)
+        if entry is not None:
+            try:
+                details = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(entry.future)), wait)
+                self.stats['hits'] += 1
+                return details
+            except Exception:
+                self.invalidate(thread)
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, thread: Optional[str], user_id: int, details: Dict):
+        """Cache details fetched some other way"""
+        if thread is None:
+            return
+        future = Future()
+        future.set_result(details)
+        self._store(thread, user_id, future)
+
+    def invalidate(self, thread: str):
+        with self._lock:
+            self._entries.pop(thread, None)
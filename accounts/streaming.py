@@ -0,0 +1,129 @@
+"""
+Streaming model calls for graph nodes with latency metrics
+
+Nodes call stream_model / astream_model instead of model.invoke. The model is streamed, so
+LangGraph stream_mode="messages" forwards token chunks as they arrive, and every call records
+time to first token and total latency:
+- in metadata of the calling node run (key model_latency) when the run is traced to LangSmith
+- in response_metadata['latency'] of the returned message
+- as a 'model_latency' custom event of the run (visible in traces and astream_events)
+- in the process-wide latency_stats, for percentiles per deployment
+"""
+from typing import Optional, Dict, List, Sequence
+
+import math
+import threading
+from collections import deque
+from time import perf_counter
+
+from langchain_core.callbacks.manager import dispatch_custom_event, adispatch_custom_event
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.messages.ai import add_ai_message_chunks
+from langchain_core.messages.utils import message_chunk_to_message
+from langchain_core.runnables import Runnable, RunnableConfig
+from langsmith.run_helpers import get_current_run_tree
+
+# Calls kept for percentiles by LatencyStats
+LATENCY_WINDOW = 1000
+
+
+class LatencyStats:
+    """
+    Rolling window of model call latencies
+
+    Args:
+        window: Number of most recent calls kept
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._calls = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, metrics: Dict[str, float]):
+        with self._lock:
+            self._calls.append(metrics)
+
+    def percentile(self, key: str, p: float) -> Optional[float]:
+        """Nearest-rank percentile of ttft or total over the window, None without calls"""
+        with self._lock:
+            values = sorted(call[key] for call in self._calls if call.get(key) is not None)
+        if not values:
+            return None
+        return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            'calls': len(self._calls),
+            'ttft_p50': self.percentile('ttft', 50),
+            'ttft_p95': self.percentile('ttft', 95),
+            'total_p50': self.percentile('total', 50),
+            'total_p95': self.percentile('total', 95),
+        }
+
+
+latency_stats = LatencyStats()
+
+
+def _finish(chunks: List, start: float, first: Optional[float], model_name: str) -> AIMessage:
+    end = perf_counter()
+    if not chunks:
+        message = AIMessage(content='')
+    else:
+        message = message_chunk_to_message(add_ai_message_chunks(*chunks))
+
+    metrics = {
+        'model': model_name,
+        'ttft': None if first is None else first - start,
+        'total': end - start,
+        'chunks': len(chunks),
+    }
+    message.response_metadata['latency'] = metrics
+    latency_stats.record(metrics)
+
+    # Node run is the current run tree while its function runs, metadata is sent when it ends
+    run = get_current_run_tree()
+    if run is not None:
+        run.add_metadata({'model_latency': metrics})
+    return message
+
+
+def _model_name(model: Runnable) -> str:
+    bound = getattr(model, 'bound', model)
+    return getattr(bound, 'model_name', None) or getattr(bound, 'model', None) or type(bound).__name__
+
+
+def stream_model(model: Runnable, messages: Sequence[BaseMessage], config: Optional[RunnableConfig] = None) -> AIMessage:
+    """
+    Call chat model by streaming, measuring time to first token and total latency
+
+    Args:
+        model: Chat model, possibly with bound tools
+        messages: Input messages
+        config: Config of the calling node, carries callbacks forwarding the chunks
+
+    Returns:
+        Complete message with latency metrics in response_metadata
+    """
+    start, first, chunks = perf_counter(), None, []
+    for chunk in model.stream(messages, config):
+        if first is None:
+            first = perf_counter()
+        chunks.append(chunk)
+    message = _finish(chunks, start, first, _model_name(model))
+    # Custom events need the callbacks of a parent run, e.g. a graph node
+    if config and config.get('callbacks'):
+        dispatch_custom_event('model_latency', message.response_metadata['latency'], config=config)
+    return message
+
+
+async def astream_model(model: Runnable, messages: Sequence[BaseMessage], config: Optional[RunnableConfig] = None) -> AIMessage:
+    """Async version of stream_model, the event loop is free while tokens are generated"""
+    start, first, chunks = perf_counter(), None, []
+    async for chunk in model.astream(messages, config):
+        if first is None:
+            first = perf_counter()
+        chunks.append(chunk)
+    message = _finish(chunks, start, first, _model_name(model))
+    if config and config.get('callbacks'):
+        await adispatch_custom_event('model_latency', message.response_metadata['latency'], config=config)
+    return message
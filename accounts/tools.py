@@ -1,12 +1,16 @@
 from typing import Annotated, Optional, Dict, List, Union
 
 from datetime import date
-from langchain.tools import tool
+from langchain_core.tools import StructuredTool
 from langgraph.types import Command
 from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.messages import ToolMessage
 from langchain_core.runnables import RunnableConfig
 
+from accounts.directory import Directory
+from accounts.repository import Repository, DirectoryRepository
+from accounts.session import SessionCache, thread_id
+
 
 # Keep existing data structures
 USERS = [
@@ -71,12 +75,90 @@ ACCOUNTS = [
     },
 ]
 
+# Indexed view of the data used by the tools, replace with Directory.load(...) for a real book
+directory = Directory(USERS, ACCOUNTS)
+
+# Store the tools read users and accounts from, e.g. SQLiteRepository for a real book
+repository: Repository = DirectoryRepository(directory)
+
+# Details of identified users per conversation thread, prefetched by identify_user
+sessions = SessionCache()
+
 class UserIdentificationError(Exception):
     """Custom exception for user identification errors"""
     pass
 
-@tool
-def identify_user(
+# Error codes of identification, also reported per row by accounts.bulk
+MISSING_NUMBER = 'MISSING_NUMBER'
+INVALID_CREDIT_CARD = 'INVALID_CREDIT_CARD'
+INVALID_ACCOUNT = 'INVALID_ACCOUNT'
+NOT_FOUND = 'NOT_FOUND'
+
+ERROR_MESSAGES = {
+    MISSING_NUMBER: "Either credit_card_last_four or account_last_four must be provided",
+    INVALID_CREDIT_CARD: "credit_card_last_four must be exactly 4 digits",
+    INVALID_ACCOUNT: "account_last_four must be exactly 4 digits",
+    NOT_FOUND: "User not found",
+}
+
+def identification_error(credit_card_last_four: Optional[str], account_last_four: Optional[str]) -> Optional[str]:
+    """
+    Check identification numbers before looking the user up.
+
+    Returns:
+        Error code if neither number is provided or a number is not 4 digits, None otherwise
+    """
+    # Validate that at least one of the last four digits is provided
+    if not credit_card_last_four and not account_last_four:
+        return MISSING_NUMBER
+
+    # Validate format if credit card last four is provided
+    if credit_card_last_four and not (credit_card_last_four.isdigit() and len(credit_card_last_four) == 4):
+        return INVALID_CREDIT_CARD
+
+    # Validate format if account last four is provided
+    if account_last_four and not (account_last_four.isdigit() and len(account_last_four) == 4):
+        return INVALID_ACCOUNT
+
+    return None
+
+def validate_identification(credit_card_last_four: Optional[str], account_last_four: Optional[str]):
+    """
+    Check identification numbers before looking the user up.
+
+    Raises:
+        UserIdentificationError: If neither number is provided or a number is not 4 digits
+    """
+    error = identification_error(credit_card_last_four, account_last_four)
+    if error is not None:
+        raise UserIdentificationError(ERROR_MESSAGES[error])
+
+def _identified(user_id: Optional[int], tool_call_id: str) -> Command:
+    if user_id is None:
+        raise UserIdentificationError(ERROR_MESSAGES[NOT_FOUND])
+
+    return Command(
+        update={
+            'user_id': user_id,
+            'messages': [ToolMessage(f'User ID = {user_id}', tool_call_id=tool_call_id)]
+        }
+    )
+
+def _details(user: Optional[Dict], user_accounts: List[Dict]) -> Dict[str, Union[Dict, List]]:
+    if not user:
+        raise UserIdentificationError(ERROR_MESSAGES[NOT_FOUND])
+
+    # Return user details with their accounts
+    return {
+        "user": {
+            "id": user['id'],
+            "name": user['name'],
+            "DOB": user['DOB']
+        },
+        "accounts": user_accounts
+    }
+
+def _identify_user(
     tool_call_id: Annotated[str, InjectedToolCallId], 
     config: RunnableConfig,
     first_name: str,
@@ -99,68 +181,38 @@ def identify_user(
     Raises:
         UserIdentificationError: If validation fails or user not found
     """
-    # Validate that at least one of the last four digits is provided
-    if not credit_card_last_four and not account_last_four:
-        raise UserIdentificationError(
-            "Either credit_card_last_four or account_last_four must be provided"
-        )
+    validate_identification(credit_card_last_four, account_last_four)
 
-    # Validate format if credit card last four is provided
-    if credit_card_last_four and not (credit_card_last_four.isdigit() and len(credit_card_last_four) == 4):
-        raise UserIdentificationError(
-            "credit_card_last_four must be exactly 4 digits"
-        )
+    user_id = repository.identify(first_name, last_name, credit_card_last_four, account_last_four)
+    command = _identified(user_id, tool_call_id)
+    # Next step almost always needs the details, get them while the graph moves on
+    sessions.prefetch(thread_id(config), user_id, _lookup_details)
+    return command
 
-    # Validate format if account last four is provided
-    if account_last_four and not (account_last_four.isdigit() and len(account_last_four) == 4):
-        raise UserIdentificationError(
-            "account_last_four must be exactly 4 digits"
-        )
-
-    # Find user by name first
-    matching_user = None
-    for user in USERS:
-        if (user['name']['first'].lower() == first_name.lower() and 
-            user['name']['last'].lower() == last_name.lower()):
-            matching_user = user
-            break
-    
-    if not matching_user:
-        raise UserIdentificationError("User not found")
+async def _aidentify_user(
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    config: RunnableConfig,
+    first_name: str,
+    last_name: str,
+    credit_card_last_four: Optional[str] = None,
+    account_last_four: Optional[str] = None
+) -> Command:
+    validate_identification(credit_card_last_four, account_last_four)
 
-    # Get all user's accounts
-    user_accounts = [acc for acc in ACCOUNTS if acc['user'] == matching_user['id']]
-    
-    # Check credit card last four if provided
-    if credit_card_last_four:
-        credit_accounts = [acc for acc in user_accounts if acc['type'] == 'CREDIT']
-        for account in credit_accounts:
-            if str(account['account_no'])[-4:] == credit_card_last_four:
-                x = Command(
-                    update={
-                        'user_id': matching_user['id'],
-                        'messages': [ToolMessage(f'User ID = {matching_user["id"]}', tool_call_id=tool_call_id)]
-                    }
-                )
-                return x
-
-    # Check account last four if provided
-    if account_last_four:
-        non_credit_accounts = [acc for acc in user_accounts if acc['type'] in ['CHECKING', 'SAVINGS']]
-        for account in non_credit_accounts:
-            if str(account['account_no'])[-4:] == account_last_four:
-                print('Found with account No')
-                return Command(
-                    update={
-                        'user_id': matching_user['id'],
-                        'messages': [ToolMessage(f'User ID = {matching_user["id"]}', tool_call_id=tool_call_id)]
-                    }
-                )
-    
-    raise UserIdentificationError("User not found")
+    user_id = await repository.aidentify(first_name, last_name, credit_card_last_four, account_last_four)
+    command = _identified(user_id, tool_call_id)
+    sessions.aprefetch(thread_id(config), user_id, _alookup_details)
+    return command
+
+def _lookup_details(user_id: int) -> Dict[str, Union[Dict, List]]:
+    user = repository.get_user(user_id)
+    return _details(user, repository.get_accounts(user_id) if user else [])
+
+async def _alookup_details(user_id: int) -> Dict[str, Union[Dict, List]]:
+    user = await repository.aget_user(user_id)
+    return _details(user, await repository.aget_accounts(user_id) if user else [])
 
-@tool
-def get_user_details(user_id: int) -> Dict[str, Union[Dict, List]]:
+def _get_user_details(user_id: int, config: RunnableConfig) -> Dict[str, Union[Dict, List]]:
     """
     Get user details and their accounts based on user ID.
 
@@ -173,23 +225,24 @@ def get_user_details(user_id: int) -> Dict[str, Union[Dict, List]]:
     Raises:
         UserIdentificationError: If user not found
     """
-    # Find user by ID
-    user = next((u for u in USERS if u['id'] == user_id), None)
-    if not user:
-        raise UserIdentificationError("User not found")
-    
-    # Get all accounts for the user
-    user_accounts = [acc for acc in ACCOUNTS if acc['user'] == user_id]
-    
-    # Return user details with their accounts
-    return {
-        "user": {
-            "id": user['id'],
-            "name": user['name'],
-            "DOB": user['DOB']
-        },
-        "accounts": user_accounts
-    }
+    thread = thread_id(config)
+    details = sessions.get(thread, user_id)
+    if details is None:
+        details = _lookup_details(user_id)
+        sessions.put(thread, user_id, details)
+    return details
+
+async def _aget_user_details(user_id: int, config: RunnableConfig) -> Dict[str, Union[Dict, List]]:
+    thread = thread_id(config)
+    details = await sessions.aget(thread, user_id)
+    if details is None:
+        details = await _alookup_details(user_id)
+        sessions.put(thread, user_id, details)
+    return details
+
+# ToolNode runs func with invoke/stream and awaits coroutine with ainvoke/astream, both read repository
+identify_user = StructuredTool.from_function(func=_identify_user, coroutine=_aidentify_user, name='identify_user')
+get_user_details = StructuredTool.from_function(func=_get_user_details, coroutine=_aget_user_details, name='get_user_details')
 
 # List of all available tools
 tools = [identify_user, get_user_details]
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark of XML prompt serialization
+
+Compares the previous to_xml implementation (model_dump + recursive f-strings, joined per
+article) with the current one (cached field plan, single buffer, to_xml_many).
+
+Usage:
+    python -m benchmarks.bench_xml [--count 10000] [--repeat 5]
+"""
+from typing import List
+
+import argparse
+import timeit
+
+from pydantic import BaseModel
+
+from updater.collect import Article
+from updater.utils import RSSEntry, to_xml_many
+
+
+def legacy_to_xml(model: BaseModel) -> str:
+    """BaseXMLModel.to_xml before the fast path"""
+    def _escape_xml(value: str) -> str:
+        if not isinstance(value, str):
+            return str(value)
+        return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').replace("'", '&apos;')
+
+    def _to_xml_element(key: str, value) -> str:
+        if value is None:
+            return f"<{key}/>"
+        elif isinstance(value, (list, tuple)):
+            items = '\n'.join(f"<ITEM>{_escape_xml(item)}</ITEM>" for item in value)
+            return f"<{key}>\n{items}\n</{key}>"
+        elif isinstance(value, dict):
+            nested = '\n'.join(_to_xml_element(k, v) for k, v in value.items())
+            return f"<{key}>\n{nested}\n</{key}>"
+        else:
+            return f"<{key}>{_escape_xml(value)}</{key}>"
+
+    data = model.model_dump()
+    elements = [_to_xml_element(key, value) for key, value in data.items()]
+    root_tag = model.__class__.__name__
+    return f"<{root_tag}>\n{''.join(elements)}\n</{root_tag}>"
+
+
+def legacy_article_to_xml(article: Article) -> str:
+    """Article.to_xml before the fast path"""
+    content = f'<TITLE>{article.title}</TITLE>'
+    if article.summary:
+        content += f'\n<SUMMARY>{article.summary}</SUMMARY>'
+    return f'<ARTICLE ID={article.id}\n' + content + '\n</ARTICLE>'
+
+
+def make_articles(count: int) -> List[Article]:
+    return [
+        Article(
+            url=f'https://example.com/posts/{i}',
+            title=f'Post number {i} about "agents" & <tools>',
+            summary=f'<p>Summary of post {i}. It\'s about LLM agents & evaluation.</p>' * 4,
+            mime_type='text/html'
+        )
+        for i in range(count)
+    ]
+
+
+def make_entries(count: int) -> List[RSSEntry]:
+    return [
+        RSSEntry(
+            title=f'Post number {i} about "agents" & <tools>',
+            url=f'https://example.com/posts/{i}',
+            media_type='text/html',
+            summary=f'<p>Summary of post {i}. It\'s about LLM agents & evaluation.</p>' * 4
+        )
+        for i in range(count)
+    ]
+
+
+def bench(name: str, legacy, current, repeat: int):
+    assert legacy() == current(), f'{name}: outputs differ'
+    before = min(timeit.repeat(legacy, number=1, repeat=repeat))
+    after = min(timeit.repeat(current, number=1, repeat=repeat))
+    print(f'{name:<40} {before * 1000:9.1f} ms {after * 1000:9.1f} ms {before / after:6.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    articles = make_articles(args.count)
+    entries = make_entries(args.count)
+
+    print(f'{"":<40} {"before":>12} {"after":>12} {"speedup":>7}')
+    bench(
+        f'{args.count} Article -> <ARTICLES>',
+        lambda: '<ARTICLES>' + ''.join([legacy_article_to_xml(a) for a in articles]) + '</ARTICLES>',
+        lambda: to_xml_many(articles, tag='ARTICLES'),
+        args.repeat
+    )
+    bench(
+        f'{args.count} BaseXMLModel.to_xml',
+        lambda: [legacy_to_xml(e) for e in entries],
+        lambda: [e.to_xml() for e in entries],
+        args.repeat
+    )
+    bench(
+        f'{args.count} BaseXMLModel -> to_xml_many',
+        lambda: ''.join([legacy_to_xml(e) for e in entries]),
+        lambda: to_xml_many(entries),
+        args.repeat
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Offline benchmarks, run with:
+
+    python -m pytest benchmarks --benchmark-only
+"""
+import pytest
+
+from benchmarks.fixtures import FeedServer
+
+
+@pytest.fixture(scope='session')
+def feed_server():
+    with FeedServer(entries=20) as server:
+        yield server
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Print throughput and step overhead recorded by benchmarks in extra_info"""
+    session = getattr(terminalreporter.config, '_benchmarksession', None)
+    benchmarks = getattr(session, 'benchmarks', [])
+
+    collection = [bench for bench in benchmarks if 'feeds' in bench.extra_info]
+    if collection:
+        terminalreporter.write_sep('-', 'collection throughput (mean)')
+        for bench in collection:
+            feeds = bench.extra_info['feeds'] / bench.stats.mean
+            entries = bench.extra_info['entries'] / bench.stats.mean
+            terminalreporter.write_line(f'{bench.name:<60} {feeds:10.1f} feeds/s {entries:12.1f} entries/s')
+
+    graphs = [bench for bench in benchmarks if 'threads' in bench.extra_info or 'steps' in bench.extra_info]
+    if graphs:
+        terminalreporter.write_sep('-', 'graph throughput and overhead (mean)')
+        for bench in graphs:
+            if 'threads' in bench.extra_info:
+                threads = bench.extra_info['threads'] / bench.stats.mean
+                terminalreporter.write_line(f'{bench.name:<60} {threads:10.1f} threads/s')
+            else:
+                info = bench.extra_info
+                terminalreporter.write_line(f'{bench.name:<60} {info["steps"]:>4} steps {info["step_overhead_us"]:8} us/step')
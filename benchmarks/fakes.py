@@ -0,0 +1,111 @@
+"""
+Scripted fake chat models for offline graph benchmarks
+
+A ScriptedChatModel answers from a script instead of calling Vertex AI. The step of the script
+is chosen from the conversation itself (number of tool results since the last user message),
+so one model instance serves any number of concurrent threads.
+
+install() replaces ChatVertexAI before the graphs are imported, so accounts.agent and
+chain.agent load without credentials.
+"""
+from typing import Any, Dict, List, Union, Iterator, AsyncIterator
+
+import json
+import time
+import uuid
+import asyncio
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Script step: text of the answer, or a tool call {'name': ..., 'args': {...}}
+Step = Union[str, Dict[str, Any]]
+
+# Identifies the user, looks up details and answers, like a real accounts conversation
+ACCOUNTS_SCRIPT: List[Step] = [
+    {'name': 'identify_user', 'args': {'first_name': 'James', 'last_name': 'Smith', 'credit_card_last_four': '8248'}},
+    {'name': 'get_user_details', 'args': {'user_id': 1}},
+    'James Smith has 2 accounts: a credit card ending in 8248 and a checking account ending in 1567.',
+]
+CHAIN_SCRIPT: List[Step] = ['I will not answer that. Figure it out yourself, as everybody else does.']
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model replaying a script with configurable latency
+
+    Args:
+        script: Steps of the conversation, the last one repeats
+        latency: Seconds before the first token
+        token_latency: Seconds between streamed tokens
+        model: Name reported in metrics
+    """
+    script: List[Step] = ['OK']
+    latency: float = 0.0
+    token_latency: float = 0.0
+    model: str = 'scripted'
+
+    @property
+    def _llm_type(self) -> str:
+        return 'scripted'
+
+    def bind_tools(self, tools, **kwargs) -> 'ScriptedChatModel':
+        return self
+
+    def _step(self, messages: List[BaseMessage]) -> Step:
+        results = 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            results += isinstance(message, ToolMessage)
+        return self.script[min(results, len(self.script) - 1)]
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        step = self._step(messages)
+        if isinstance(step, dict):
+            call = {'name': step['name'], 'args': json.dumps(step['args']), 'id': f'call-{uuid.uuid4()}', 'index': 0}
+            return [AIMessageChunk(content='', tool_call_chunks=[call])]
+        words = step.split(' ')
+        return [AIMessageChunk(content=word if i == 0 else ' ' + word) for i, word in enumerate(words)]
+
+    def _message(self, messages: List[BaseMessage]) -> AIMessage:
+        chunks = self._chunks(messages)
+        merged = chunks[0]
+        for chunk in chunks[1:]:
+            merged = merged + chunk
+        return AIMessage(content=merged.content, tool_calls=merged.tool_calls)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency + self.token_latency * len(self._chunks(messages)))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency + self.token_latency * len(self._chunks(messages)))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for index, chunk in enumerate(self._chunks(messages)):
+            if index and self.token_latency:
+                time.sleep(self.token_latency)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for index, chunk in enumerate(self._chunks(messages)):
+            if index and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+
+def install():
+    """Replace ChatVertexAI with ScriptedChatModel, call before importing the graphs"""
+    import langchain_google_vertexai
+    langchain_google_vertexai.ChatVertexAI = ScriptedChatModel
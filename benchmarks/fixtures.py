@@ -0,0 +1,177 @@
+"""
+Local HTTP server with synthetic feeds for offline benchmarks
+
+Serves RSS (/rss/<n>), Atom (/atom/<n>) and YouTube-style Atom (/youtube/<n>) feeds and
+answers HEAD requests of their articles (/article/<n>/<i>), with configurable number of
+entries, response latency and injected errors.
+"""
+from typing import List, Dict, Sequence
+
+import json
+import time
+import random
+import threading
+import multiprocessing
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+KINDS = ('rss', 'atom', 'youtube')
+
+
+class _Server(ThreadingHTTPServer):
+    # Default backlog of 5 drops connections when many requests start at once
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def _rss(base: str, feed: int, entries: int, now: datetime) -> str:
+    items = ''.join(
+        f'<item><title>Post {i} of feed {feed} &amp; friends</title>'
+        f'<link>{base}/article/{feed}/{i}</link><guid>{base}/article/{feed}/{i}</guid>'
+        f'<description>&lt;p&gt;Summary of post {i} about agents, evaluation and tools.&lt;/p&gt;</description>'
+        f'<pubDate>{format_datetime(now - timedelta(hours=i))}</pubDate></item>'
+        for i in range(entries)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Feed {feed}</title><link>{base}</link>{items}</channel></rss>'
+
+
+def _atom(base: str, feed: int, entries: int, now: datetime, youtube: bool = False) -> str:
+    def link(i):
+        return f'https://www.youtube.com/watch?v=feed{feed}video{i}' if youtube else f'{base}/article/{feed}/{i}'
+
+    items = ''.join(
+        f'<entry><id>urn:feed:{feed}:{i}</id><title>Post {i} of feed {feed}</title>'
+        f'<link rel="alternate" href="{link(i)}"/>'
+        f'<updated>{(now - timedelta(hours=i)).isoformat()}</updated>'
+        f'<published>{(now - timedelta(hours=i)).isoformat()}</published>'
+        f'<summary>Summary of post {i} about agents, evaluation and tools.</summary></entry>'
+        for i in range(entries)
+    )
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+        f'<title>Feed {feed}</title><id>urn:feed:{feed}</id><updated>{now.isoformat()}</updated>{items}</feed>'
+    )
+
+
+class _State:
+    """Options and request counters of a running server"""
+
+    def __init__(self, entries: int, latency: float, error_rate: float, seed: int):
+        self.entries = entries
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = {'GET': 0, 'HEAD': 0, 'errors': 0}
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.lock = threading.Lock()
+        self.base = ''
+
+
+def _handler(state: _State):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes = b'', content_type: str = 'text/html; charset=utf-8'):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body and self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def _fail(self) -> bool:
+            with state.lock:
+                state.requests[self.command] += 1
+                failed = bool(state.error_rate) and state.random.random() < state.error_rate
+                if failed:
+                    state.requests['errors'] += 1
+            if state.latency:
+                time.sleep(state.latency)
+            if failed:
+                self._send(500)
+            return failed
+
+        def do_HEAD(self):
+            if not self._fail():
+                self._send(200 if self.path.startswith('/article/') else 404)
+
+        def do_GET(self):
+            if self.path == '/_stats':
+                with state.lock:
+                    return self._send(200, json.dumps(state.requests).encode(), 'application/json')
+
+            if self._fail():
+                return
+            parts = self.path.strip('/').split('/')
+            if len(parts) != 2 or parts[0] not in KINDS or not parts[1].isdigit():
+                return self._send(404)
+
+            kind, feed = parts[0], int(parts[1])
+            if kind == 'rss':
+                self._send(200, _rss(state.base, feed, state.entries, state.now).encode(), 'application/rss+xml; charset=utf-8')
+            else:
+                body = _atom(state.base, feed, state.entries, state.now, kind == 'youtube')
+                self._send(200, body.encode(), 'application/atom+xml; charset=utf-8')
+
+    return Handler
+
+
+def _serve(connection, entries: int, latency: float, error_rate: float, seed: int):
+    """Run server in a child process and send its address back"""
+    state = _State(entries, latency, error_rate, seed)
+    server = _Server(('127.0.0.1', 0), _handler(state))
+    host, port = server.server_address[:2]
+    state.base = f'http://{host}:{port}'
+    connection.send(state.base)
+    server.serve_forever()
+
+
+class FeedServer:
+    """
+    Fixture server running in its own process, use as context manager
+
+    The server does not share the GIL with the code under benchmark.
+
+    Args:
+        entries: Entries in every feed
+        latency: Delay of every response in seconds
+        error_rate: Probability of answering any request with 500
+        seed: Seed of error injection
+    """
+
+    def __init__(self, entries: int = 20, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.entries = entries
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.base = None
+        self._process = None
+
+    def feeds(self, count: int, kinds: Sequence[str] = KINDS) -> List[str]:
+        """URLs of count feeds, cycling through kinds"""
+        return [f'{self.base}/{kinds[i % len(kinds)]}/{i}' for i in range(count)]
+
+    @property
+    def requests(self) -> Dict[str, int]:
+        """Number of GET and HEAD requests and injected errors so far"""
+        with urllib.request.urlopen(f'{self.base}/_stats') as response:
+            return json.load(response)
+
+    def __enter__(self) -> 'FeedServer':
+        context = multiprocessing.get_context('spawn')
+        parent, child = context.Pipe()
+        self._process = context.Process(
+            target=_serve, args=(child, self.entries, self.latency, self.error_rate, self.seed), daemon=True
+        )
+        self._process.start()
+        self.base = parent.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join()
@@ -0,0 +1,184 @@
+"""
+Offline load harness for the accounts and chain graphs
+
+Runs many concurrent conversation threads through accounts.agent.app and chain.agent.graph with
+scripted fake models (see benchmarks.fakes) and reports:
+- throughput of whole threads per second under concurrency
+- node steps per thread and framework overhead per step, measured on a single thread with
+  zero model latency, so it is the time spent in LangGraph, tools and serialization
+- mean time per node
+- peak Python memory of the concurrent run (tracemalloc, measured in a separate pass)
+
+Usage:
+    python -m benchmarks.graphs [--graph accounts chain] [--threads 2000] [--concurrency 500]
+                                [--latency 0.05] [--token-latency 0.0]
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import time
+import asyncio
+import argparse
+import tracemalloc
+from collections import defaultdict
+
+from pydantic import BaseModel
+from langchain_core.messages import HumanMessage
+
+from benchmarks import fakes
+from benchmarks.fakes import ScriptedChatModel, ACCOUNTS_SCRIPT, CHAIN_SCRIPT
+
+
+class GraphReport(BaseModel):
+    graph: str
+    threads: int
+    concurrency: int
+    seconds: float
+    # Whole threads per second
+    throughput: float
+    # Node executions per thread
+    steps: int
+    # Mean wall time of a step without model latency, microseconds
+    step_overhead_us: float
+    # Mean wall time of each node without model latency, microseconds
+    nodes_us: Dict[str, float]
+    peak_memory_mb: Optional[float] = None
+
+
+class Target(BaseModel):
+    """Graph with its fake model and the input of one thread"""
+    model_config = {'arbitrary_types_allowed': True}
+
+    graph: Any
+    model: ScriptedChatModel
+    make_input: Callable[[int], Dict]
+
+
+def load_targets(latency: float = 0.0, token_latency: float = 0.0) -> Dict[str, Target]:
+    """Import graphs with scripted models instead of Vertex AI"""
+    fakes.install()
+    import accounts.agent
+    import chain.agent
+
+    accounts.agent.model_with_tools = ScriptedChatModel(script=ACCOUNTS_SCRIPT, latency=latency, token_latency=token_latency)
+    chain.agent.llm = ScriptedChatModel(script=CHAIN_SCRIPT, latency=latency, token_latency=token_latency)
+
+    return {
+        'accounts': Target(
+            graph=accounts.agent.app,
+            model=accounts.agent.model_with_tools,
+            make_input=lambda i: {'messages': [HumanMessage(accounts.agent.QUERY)]}
+        ),
+        'chain': Target(
+            graph=chain.agent.graph,
+            model=chain.agent.llm,
+            make_input=lambda i: {'input': 'Why is the sky blue?', 'messages': []}
+        ),
+    }
+
+
+def _config(name: str, index: int) -> Dict:
+    # Distinct thread per conversation, like separate users of a deployment
+    return {'configurable': {'thread_id': f'bench-{name}-{index}'}}
+
+
+async def profile_steps(name: str, target: Target, rounds: int = 20) -> Tuple[int, float, Dict[str, float]]:
+    """
+    Time nodes of one thread at a time with zero model latency
+
+    Returns:
+        Steps per thread, mean overhead per step and mean time per node in microseconds
+    """
+    latency, token_latency = target.model.latency, target.model.token_latency
+    target.model.latency = target.model.token_latency = 0.0
+    try:
+        times: Dict[str, List[float]] = defaultdict(list)
+        steps = total = 0
+        for index in range(rounds):
+            start = last = time.perf_counter()
+            steps = 0
+            async for update in target.graph.astream(
+                target.make_input(index), _config(f'{name}-profile', index), stream_mode='updates'
+            ):
+                now = time.perf_counter()
+                # Nodes finishing in the same superstep share its time
+                for node in update:
+                    times[node].append((now - last) / len(update))
+                steps += len(update)
+                last = now
+            total += last - start
+    finally:
+        target.model.latency, target.model.token_latency = latency, token_latency
+
+    nodes = {node: sum(values) / len(values) * 1e6 for node, values in times.items()}
+    return steps, total / rounds / max(steps, 1) * 1e6, nodes
+
+
+async def run_threads(name: str, target: Target, threads: int, concurrency: int) -> float:
+    """Run threads through the graph, at most concurrency at a time, returns elapsed seconds"""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(index: int):
+        async with limit:
+            await target.graph.ainvoke(target.make_input(index), _config(name, index))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(threads)))
+    return time.perf_counter() - start
+
+
+async def measure(name: str, target: Target, threads: int, concurrency: int, memory: bool = True) -> GraphReport:
+    steps, overhead, nodes = await profile_steps(name, target)
+    seconds = await run_threads(name, target, threads, concurrency)
+
+    peak = None
+    if memory:
+        # Separate pass, tracing allocations slows the run down
+        tracemalloc.start()
+        try:
+            await run_threads(f'{name}-memory', target, threads, concurrency)
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+
+    return GraphReport(
+        graph=name,
+        threads=threads,
+        concurrency=concurrency,
+        seconds=seconds,
+        throughput=threads / seconds,
+        steps=steps,
+        step_overhead_us=overhead,
+        nodes_us=nodes,
+        peak_memory_mb=peak
+    )
+
+
+def print_report(report: GraphReport):
+    memory = f'{report.peak_memory_mb:8.1f} MB' if report.peak_memory_mb is not None else ''
+    print(
+        f'{report.graph:<10} {report.threads:>7} threads {report.concurrency:>5} concurrent '
+        f'{report.seconds:8.2f} s {report.throughput:9.1f} threads/s '
+        f'{report.steps:>3} steps {report.step_overhead_us:9.0f} us/step {memory}'
+    )
+    for node, us in report.nodes_us.items():
+        print(f'{"":<10} {node:<20} {us:9.0f} us')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--graph', nargs='+', default=['accounts', 'chain'], choices=['accounts', 'chain'])
+    parser.add_argument('--threads', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds before first token of every model call')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='Seconds between streamed tokens')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the memory pass')
+    args = parser.parse_args()
+
+    targets = load_targets(args.latency, args.token_latency)
+    for name in args.graph:
+        report = asyncio.run(measure(name, targets[name], args.threads, args.concurrency, memory=not args.no_memory))
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+
+from benchmarks.fixtures import FeedServer
+from updater.collect import new_articles, get_media_type
+from updater.media import MediaTypeResolver, MediaTypeCache
+
+STARTING_POINT = datetime(2000, 1, 1)
+# All fixture feeds are on one host, do not let the per-host cap hide the engine
+MAX_PER_HOST = 64
+
+
+def collect(urls):
+    # Resolver without cache, so every round measures the HEAD requests too
+    return new_articles(urls, STARTING_POINT, max_per_host=MAX_PER_HOST, resolver=MediaTypeResolver())
+
+
+@pytest.mark.parametrize('feeds', [10, 100])
+def test_new_articles(benchmark, feed_server, feeds):
+    urls = feed_server.feeds(feeds)
+    articles = benchmark(collect, urls)
+    assert len(articles) == feeds * feed_server.entries
+    benchmark.extra_info.update(feeds=feeds, entries=len(articles))
+
+
+@pytest.mark.parametrize('entries', [10, 100])
+def test_new_articles_entries(benchmark, entries):
+    with FeedServer(entries=entries) as server:
+        urls = server.feeds(20)
+        articles = benchmark(collect, urls)
+    assert len(articles) == 20 * entries
+    benchmark.extra_info.update(feeds=20, entries=len(articles))
+
+
+def test_new_articles_latency(benchmark):
+    with FeedServer(entries=20, latency=0.05) as server:
+        urls = server.feeds(50)
+        articles = benchmark.pedantic(collect, (urls,), rounds=3)
+    assert len(articles) == 50 * 20
+    benchmark.extra_info.update(feeds=50, entries=len(articles))
+
+
+def test_new_articles_errors(benchmark):
+    with FeedServer(entries=20, error_rate=0.1) as server:
+        urls = server.feeds(50)
+        articles = benchmark.pedantic(collect, (urls,), rounds=3)
+        errors = server.requests['errors']
+    benchmark.extra_info.update(feeds=50, entries=len(articles), errors=errors)
+
+
+def test_get_media_type_head(benchmark, feed_server):
+    url = f'{feed_server.base}/article/0/0'
+    assert benchmark(get_media_type, url, MediaTypeResolver()) == 'text/html'
+
+
+def test_get_media_type_rule(benchmark):
+    url = 'https://www.youtube.com/watch?v=video'
+    assert benchmark(get_media_type, url) == 'video/vnd.youtube.yt'
+
+
+def test_get_media_type_cached(benchmark, feed_server):
+    url = f'{feed_server.base}/article/0/1'
+    resolver = MediaTypeResolver(cache=MediaTypeCache(':memory:'))
+    get_media_type(url, resolver)
+    assert benchmark(get_media_type, url, resolver) == 'text/html'
+    assert resolver.stats['network'] == 1
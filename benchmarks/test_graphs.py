@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from benchmarks.graphs import load_targets, profile_steps, run_threads
+
+THREADS = 200
+CONCURRENCY = 100
+
+
+@pytest.fixture(scope='module')
+def targets():
+    return load_targets(latency=0.01)
+
+
+@pytest.mark.parametrize('name', ['accounts', 'chain'])
+def test_graph_threads(benchmark, targets, name):
+    seconds = benchmark.pedantic(lambda: asyncio.run(run_threads(name, targets[name], THREADS, CONCURRENCY)), rounds=3)
+    assert seconds > 0
+    benchmark.extra_info.update(threads=THREADS)
+
+
+@pytest.mark.parametrize('name', ['accounts', 'chain'])
+def test_graph_step_overhead(benchmark, targets, name):
+    steps, overhead, nodes = benchmark.pedantic(lambda: asyncio.run(profile_steps(name, targets[name], rounds=5)), rounds=3)
+    assert steps > 0
+    benchmark.extra_info.update(steps=steps, step_overhead_us=round(overhead), **{f'{node}_us': round(us) for node, us in nodes.items()})
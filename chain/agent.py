@@ -2,6 +2,7 @@ from typing import Annotated, TypedDict
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_google_vertexai import ChatVertexAI
 
 from langgraph.graph.message import AnyMessage, add_messages
@@ -9,6 +10,8 @@ from langgraph.graph import StateGraph, END
 from langgraph.types import Command
 from langgraph.checkpoint.memory import MemorySaver
 
+from accounts.streaming import stream_model, astream_model
+
 class State(TypedDict):
     input: str
     messages: Annotated[list[AnyMessage], add_messages]
@@ -28,8 +31,14 @@ def convert(state: State):
         'messages': messages.messages
     }
 
-def chat(state: State):
-    messages = [llm.invoke(state['messages'])]
+def chat(state: State, config: RunnableConfig):
+    messages = [stream_model(llm, state['messages'], config)]
+    return {
+        'messages': messages
+    }
+
+async def achat(state: State, config: RunnableConfig):
+    messages = [await astream_model(llm, state['messages'], config)]
     return {
         'messages': messages
     }
@@ -41,20 +50,22 @@ def human(state: State):
             goto=END
         )
     else:
-        return {
-            'messages': HumanMessage(state['input'])
-        }
+        return Command(
+            goto="llm",
+            update={
+                'messages': HumanMessage(state['input'])
+            }
+        )
 
 
 builder = StateGraph(state_schema=State)
 
 builder.set_entry_point("convert")
 builder.add_node("convert", convert)
-builder.add_node("llm", chat)
+builder.add_node("llm", RunnableLambda(chat, afunc=achat, name="llm"))
 builder.add_node("human", human)
 
 builder.add_edge("convert", "llm")
 builder.add_edge("llm", "human")
-builder.add_edge("human", "llm")
 
 graph = builder.compile()
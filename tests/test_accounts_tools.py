@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from accounts import tools
+from accounts.repository import SQLiteRepository
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    # Book without James Smith, the in-memory directory still has him
+    repository = SQLiteRepository(tmp_path / 'accounts.sqlite')
+    repository.populate([user for user in tools.USERS if user['id'] != 1], tools.ACCOUNTS)
+    monkeypatch.setattr(tools, 'repository', repository)
+    yield repository
+    repository.close()
+
+
+def identify(first_name: str, last_name: str, credit_card_last_four: str) -> dict:
+    return {
+        'type': 'tool_call', 'id': 'call', 'name': 'identify_user',
+        'args': {'first_name': first_name, 'last_name': last_name, 'credit_card_last_four': credit_card_last_four}
+    }
+
+
+def test_sync_and_async_tools_read_repository(repository):
+    config = {'configurable': {'thread_id': 'test'}}
+    sarah = identify('Sarah', 'Johnson', '2345')
+    assert tools.identify_user.invoke(sarah, config).update['user_id'] == 2
+    assert asyncio.run(tools.identify_user.ainvoke(sarah, config)).update['user_id'] == 2
+
+    james = identify('James', 'Smith', '8248')
+    for call in (lambda: tools.identify_user.invoke(james, config), lambda: asyncio.run(tools.identify_user.ainvoke(james, config))):
+        with pytest.raises(tools.UserIdentificationError):
+            call()
+
+    details = tools.get_user_details.invoke({'user_id': 3}, {'configurable': {'thread_id': 'sync'}})
+    adetails = asyncio.run(tools.get_user_details.ainvoke({'user_id': 3}, {'configurable': {'thread_id': 'async'}}))
+    assert details == adetails
+    assert details['user']['name'] == {'first': 'Michael', 'last': 'Chen'}
@@ -0,0 +1,73 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from updater.batch import ArticleBatch, _Interned, _Strings
+from updater.collect import Article
+
+
+def articles():
+    return [
+        Article(
+            url='https://example.com/a', title='Agents – überblick', summary='Tools and memory',
+            mime_type='text/html', feed='https://example.com/feed', published=datetime(2025, 1, 10, 12, 30),
+            content_hash=hashlib.sha256(b'body').hexdigest()
+        ),
+        Article(
+            url='https://example.com/b', title='', summary=None, mime_type='application/pdf',
+            feed=None, published=datetime(2025, 1, 10, 12, tzinfo=timezone(timedelta(hours=2)))
+        ),
+        Article(
+            url='https://example.com/c', title='Inline', summary='', content=b'%PDF', mime_type='application/pdf',
+            feed='https://example.com/feed', published=None
+        ),
+    ]
+
+
+def test_round_trip():
+    original = articles()
+    batch = ArticleBatch(original)
+    assert len(batch) == 3
+    assert batch.to_articles() == original
+    assert batch[-1] == original[-1]
+    assert batch.index(original[1].id) == 1
+    assert batch.take([2, 0]).to_articles() == [original[2], original[0]]
+    assert batch.content(2) == b'%PDF'
+    assert batch.content(1) is None
+
+    with pytest.raises(IndexError):
+        batch[3]
+    with pytest.raises(ValueError):
+        batch.index(uuid.uuid4())
+
+
+def test_strings_keep_none_apart_from_empty():
+    column = _Strings()
+    for value in ['first', None, '', 'ünïcode', None]:
+        column.append(value)
+    assert [column[i] for i in range(5)] == ['first', None, '', 'ünïcode', None]
+    assert column.nbytes == len('firstünïcode'.encode()) + 8 * 6
+
+
+def test_interned_values_are_shared():
+    column = _Interned()
+    feeds = [''.join(['https://example.com/', 'feed']) for _ in range(3)]
+    for value in feeds + [None, 'https://example.com/other']:
+        column.append(value)
+
+    assert [column[i] for i in range(5)] == feeds + [None, 'https://example.com/other']
+    assert column[0] is column[2]
+    assert column.values == [None, 'https://example.com/feed', 'https://example.com/other']
+    assert ArticleBatch(articles()).feeds == ['https://example.com/feed']
+
+
+def test_published_kind():
+    batch = ArticleBatch(articles())
+    naive, aware, missing = (batch.published(i) for i in range(3))
+
+    assert naive == datetime(2025, 1, 10, 12, 30) and naive.tzinfo is None
+    # Aware times come back in UTC, the same instant
+    assert aware == datetime(2025, 1, 10, 10, tzinfo=timezone.utc) and aware.tzinfo == timezone.utc
+    assert missing is None
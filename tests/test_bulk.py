@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from accounts.bulk import RECORD_COLUMNS, identify_frames, identify_many
+from accounts.directory import Directory
+from accounts.tools import ACCOUNTS, NOT_FOUND, USERS, identification_error
+
+FIRST = ['James', 'Sarah', 'Michael', 'Elena', 'Zoë']
+LAST = ['Smith', 'Johnson', 'Chen']
+TYPES = ['CREDIT', 'CHECKING', 'SAVINGS']
+
+
+@pytest.fixture(scope='module')
+def book():
+    rng = random.Random(7)
+    users = [{'id': i, 'name': {'first': rng.choice(FIRST), 'last': rng.choice(LAST)}} for i in range(1, 301)]
+    accounts = [
+        {'account_no': rng.randrange(10 ** 15, 10 ** 16), 'user': rng.randint(1, 300), 'type': rng.choice(TYPES)}
+        for _ in range(600)
+    ]
+    return Directory(users, accounts), accounts
+
+
+def number(rng: random.Random, accounts) -> str:
+    return rng.choice([
+        None, '', '12a4', '123', '12345', f'{rng.randrange(10000):04d}',
+        str(rng.choice(accounts)['account_no'])[-4:], str(rng.choice(accounts)['account_no'])[-4:]
+    ])
+
+
+def expected(directory: Directory, first, last, credit, account):
+    error = identification_error(credit, account)
+    if error is not None:
+        return None, error
+    user_id = directory.identify(first, last, credit or None, account or None)
+    return user_id, None if user_id is not None else NOT_FOUND
+
+
+def test_bulk_matches_directory_identify(book):
+    directory, accounts = book
+    rng = random.Random(11)
+    records = [
+        (rng.choice(FIRST + [' james ', 'SARAH', 'Nobody']), rng.choice(LAST + ['smith']), number(rng, accounts), number(rng, accounts))
+        for _ in range(5000)
+    ]
+
+    results = list(identify_many(records, directory, chunk_size=700))
+
+    assert [result.index for result in results] == list(range(len(records)))
+    assert [(result.user_id, result.error) for result in results] == [expected(directory, *record) for record in records]
+    assert any(result.user_id is not None for result in results)
+
+
+def test_bulk_frame_input_keeps_index():
+    directory = Directory(USERS, ACCOUNTS)
+    frame = pd.DataFrame(
+        [
+            ('James', 'Smith', None, '1567'),
+            ('james ', 'SMITH', '8248', ''),
+            ('Sarah', 'Johnson', '8248', None),
+            ('James', 'Smith', None, None),
+        ],
+        columns=RECORD_COLUMNS,
+        index=['a', 'b', 'c', 'd']
+    )
+
+    result = pd.concat(identify_frames(frame, directory))
+
+    assert list(result.index) == ['a', 'b', 'c', 'd']
+    assert list(result['user_id'].astype(object).where(result['user_id'].notna(), None)) == [1, 1, None, None]
+    assert list(result['error'].astype(object).where(result['error'].notna(), None)) == [None, None, NOT_FOUND, 'MISSING_NUMBER']
@@ -0,0 +1,63 @@
+import os
+import asyncio
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from updater.cache import CachedFeed, FeedCache
+from updater.collect import _Pass
+from updater.utils import FeedEntry
+
+FEED = 'https://example.com/feed'
+LAST_MODIFIED = 'Wed, 08 Jan 2025 10:00:00 GMT'
+
+
+def cached_feed() -> CachedFeed:
+    return CachedFeed(
+        etag='"v1"', last_modified=LAST_MODIFIED, content_hash='abc',
+        entries=[FeedEntry(title='Post', url='https://example.com/1', published=datetime(2025, 1, 8), guid='1')]
+    )
+
+
+def test_round_trip_across_reopen(tmp_path):
+    with FeedCache(tmp_path / 'feeds.sqlite') as cache:
+        assert cache.get(FEED) is None
+        cache.put(FEED, cached_feed())
+    with FeedCache(tmp_path / 'feeds.sqlite') as cache:
+        assert cache.get(FEED) == cached_feed()
+        cache.put(FEED, cached_feed().model_copy(update={'etag': None}))
+        assert cache.get(FEED).etag is None
+
+
+def test_conditional_request_headers(tmp_path):
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append((request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since')))
+        return httpx.Response(304)
+
+    async def fetch(cache):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await _Pass(client, cache=cache).fetch_entries(FEED)
+
+    with FeedCache(tmp_path / 'feeds.sqlite') as cache:
+        cache.put(FEED, cached_feed())
+        assert asyncio.run(fetch(cache)) == cached_feed().entries
+        cache.put(FEED, cached_feed().model_copy(update={'etag': None}))
+        asyncio.run(fetch(cache))
+
+    assert sent == [('"v1"', LAST_MODIFIED), (None, LAST_MODIFIED)]
+
+
+def test_cache_dir_from_environment(tmp_path):
+    # CACHE_DIR is read on import, check it in a fresh interpreter
+    script = 'from updater.cache import FeedCache; cache = FeedCache(); print(cache.path); cache.close()'
+    result = subprocess.run(
+        [sys.executable, '-c', script], env={**os.environ, 'UPDATER_CACHE_DIR': str(tmp_path / 'cache')},
+        cwd=Path(__file__).parents[1], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == str(tmp_path / 'cache' / 'feeds.sqlite')
+    assert (tmp_path / 'cache' / 'feeds.sqlite').exists()
@@ -0,0 +1,169 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from updater import collect
+from updater.cache import FeedCache
+from updater.collect import anew_articles, astream_articles, new_articles
+from updater.media import MediaTypeResolver
+from updater.state import FeedState
+
+STARTING_POINT = datetime(2000, 1, 1)
+NOW = datetime(2025, 1, 10, 12)
+
+
+def rss(host: str, entries: int = 3) -> bytes:
+    items = ''.join(
+        f'<item><title>Post {i} on {host}</title><link>https://{host}/article/{i}</link>'
+        f'<pubDate>{format_datetime(NOW - timedelta(hours=i))}</pubDate></item>'
+        for i in range(entries)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>{host}</title>{items}</channel></rss>'.encode()
+
+
+def feed_handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == '/broken':
+        return httpx.Response(500)
+    if request.method == 'HEAD':
+        return httpx.Response(200, headers={'Content-Type': 'text/html'})
+    return httpx.Response(200, content=rss(request.url.host), headers={'Content-Type': 'application/rss+xml'})
+
+
+def client(handler=feed_handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def resolver() -> MediaTypeResolver:
+    return MediaTypeResolver(rules=[])
+
+
+def collected(**kwargs):
+    async def run():
+        async with client(kwargs.pop('handler', feed_handler)) as http:
+            return await anew_articles(kwargs.pop('feeds'), STARTING_POINT, http, resolver=resolver(), **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_host_and_global_caps():
+    in_flight = Counter()
+    peak = Counter()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        in_flight[host] += 1
+        in_flight['all'] += 1
+        peak[host] = max(peak[host], in_flight[host])
+        peak['all'] = max(peak['all'], in_flight['all'])
+        await asyncio.sleep(0.01)
+        in_flight[host] -= 1
+        in_flight['all'] -= 1
+        return feed_handler(request)
+
+    feeds = [f'https://host{i}.example.com/feed' for i in range(4)]
+    articles = collected(feeds=feeds, handler=handler, max_connections=5, max_per_host=2)
+
+    assert len(articles) == 12
+    assert peak['all'] == 5
+    assert max(peak[f'host{i}.example.com'] for i in range(4)) == 2
+
+
+def test_failing_feed_does_not_abort_pass():
+    articles = collected(feeds=['https://a.example.com/broken', 'https://b.example.com/feed'])
+    assert [article.feed for article in articles] == ['https://b.example.com/feed'] * 3
+
+
+def test_unchanged_feed_is_not_parsed(monkeypatch):
+    parsed = []
+    parse_entries = collect.parse_entries
+    monkeypatch.setattr(collect, 'parse_entries', lambda *args: parsed.append(args) or parse_entries(*args))
+    conditional = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == '/etag':
+            conditional.append(request.headers.get('If-None-Match'))
+            if request.headers.get('If-None-Match') == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(
+                200, content=rss('a.example.com'), headers={'ETag': '"v1"', 'Content-Type': 'application/rss+xml'}
+            )
+        return feed_handler(request)
+
+    cache = FeedCache(':memory:')
+    feeds = ['https://a.example.com/etag', 'https://b.example.com/feed']
+    first = collected(feeds=feeds, handler=handler, cache=cache)
+    second = collected(feeds=feeds, handler=handler, cache=cache)
+
+    # Second pass answers one feed by 304 and the other by the unchanged body hash
+    assert len(parsed) == 2
+    assert conditional == [None, '"v1"']
+    assert [(a.url, a.published) for a in first] == [(a.url, a.published) for a in second]
+
+
+def test_state_is_saved_when_pass_fails():
+    state = FeedState(':memory:')
+    saves = []
+    state.save = lambda: saves.append(True)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise RuntimeError('transport is broken')
+
+    with pytest.raises(RuntimeError):
+        collected(feeds=['https://a.example.com/feed'], handler=handler, state=state)
+    assert saves == [True]
+
+
+def test_stream_saves_state_when_consumer_stops():
+    state = FeedState(':memory:')
+    saves = []
+    state.save = lambda: saves.append(True)
+
+    async def run():
+        async with client() as http:
+            stream = astream_articles(
+                ['https://a.example.com/feed', 'https://b.example.com/feed'], STARTING_POINT, http,
+                resolver=resolver(), state=state, buffer=1
+            )
+            first = await anext(stream)
+            await stream.aclose()
+            return first
+
+    assert asyncio.run(run()).title.startswith('Post')
+    assert saves == [True]
+
+
+def test_stream_returns_same_articles():
+    feeds = ['https://a.example.com/feed', 'https://b.example.com/broken', 'https://c.example.com/feed']
+
+    async def run():
+        async with client() as http:
+            return [article async for article in astream_articles(feeds, STARTING_POINT, http, resolver=resolver())]
+
+    streamed = asyncio.run(run())
+    assert sorted(a.url for a in streamed) == sorted(a.url for a in collected(feeds=feeds))
+
+
+def test_new_articles_inside_running_loop(monkeypatch):
+    monkeypatch.setattr(collect, '_client', lambda *args: client())
+
+    async def notebook_cell():
+        return new_articles(['https://a.example.com/feed'], STARTING_POINT, resolver=resolver())
+
+    assert len(asyncio.run(notebook_cell())) == 3
+
+
+def test_process_pool_parser_matches_inline(monkeypatch):
+    monkeypatch.setattr(collect, '_client', lambda *args: client())
+    feeds = ['https://a.example.com/feed', 'https://b.example.com/feed']
+
+    inline = new_articles(feeds, STARTING_POINT, resolver=resolver())
+    with ProcessPoolExecutor(1) as parser:
+        pooled = new_articles(feeds, STARTING_POINT, resolver=resolver(), parser=parser)
+
+    # IDs are random, everything else comes from the parsed feeds
+    assert [a.model_dump(exclude={'id'}) for a in pooled] == [a.model_dump(exclude={'id'}) for a in inline]
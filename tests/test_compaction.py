@@ -0,0 +1,55 @@
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+
+from accounts.compaction import SUMMARY_ID, make_compaction_node, split_history
+
+
+def tool_loop(calls: int):
+    messages = []
+    for index in range(calls):
+        call_id = f'call-{index}'
+        messages.append(AIMessage('', tool_calls=[{'name': 'get_user_details', 'args': {'user_id': 1}, 'id': call_id}]))
+        messages.append(ToolMessage('{"accounts": []}', tool_call_id=call_id))
+    return messages
+
+
+def test_long_single_turn_keeps_question():
+    question = HumanMessage('What are my accounts?')
+    messages = [question, *tool_loop(5)]
+
+    for keep in range(1, len(messages)):
+        older, recent = split_history(messages, keep)
+        assert recent[0] is question
+        assert question not in older
+        # After the question the model sees an AI call, never an orphaned tool result
+        assert len(recent) == 1 or isinstance(recent[1], AIMessage)
+        assert older + recent[1:] == messages[1:]
+
+
+def test_whole_turns_kept():
+    first = [HumanMessage('Hi'), AIMessage('Hello')]
+    second = [HumanMessage('Balance?'), *tool_loop(1), AIMessage('100')]
+    older, recent = split_history(first + second, 3)
+    assert older == first
+    assert recent == second
+
+
+def test_turns_after_earlier_summary():
+    summary = SystemMessage('Summary', id=SUMMARY_ID)
+    turn = [HumanMessage('Balance?'), *tool_loop(2)]
+    older, recent = split_history([summary, AIMessage('Done'), *turn], 6)
+    assert older == [summary, AIMessage('Done')]
+    assert recent == turn
+
+
+def test_compaction_node_keeps_question():
+    question = HumanMessage('What are my accounts?', id='question')
+    messages = [question, *tool_loop(10)]
+    node = make_compaction_node(FakeListChatModel(responses=['Looked up accounts']), threshold=10, keep=3)
+
+    update = node.invoke({'messages': messages, 'user_id': 1})['messages']
+
+    assert isinstance(update[0], RemoveMessage)
+    assert isinstance(update[1], SystemMessage) and 'Looked up accounts' in update[1].content
+    assert update[2] is question
+    assert isinstance(update[3], AIMessage)
@@ -0,0 +1,106 @@
+import asyncio
+import gzip
+import hashlib
+import tempfile
+
+import httpx
+
+from updater.collect import Article
+from updater.content import ContentFetcher, ContentStore
+
+ROBOTS = b'User-agent: *\nDisallow: /private/\n'
+BODY = b'<html><body>' + b'Agents and tools. ' * 20 + b'</body></html>'
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == '/robots.txt':
+        return httpx.Response(200, content=ROBOTS)
+    if request.url.path == '/large':
+        return httpx.Response(200, content=b'x' * 1000)
+
+    async def chunks():
+        # Streamed without Content-Length, the cap applies while reading
+        for _ in range(10):
+            yield b'y' * 100
+
+    if request.url.path == '/streamed':
+        return httpx.Response(200, content=chunks())
+    return httpx.Response(200, content=BODY, headers={'Content-Type': 'text/html'})
+
+
+def article(path: str, mime_type: str = 'text/html') -> Article:
+    return Article(url=f'https://example.com{path}', title=path, mime_type=mime_type)
+
+
+def fetched(fetcher: ContentFetcher, articles):
+    requests = []
+
+    def logged(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return handler(request)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(logged)) as client:
+            return await fetcher.afetch(articles, client)
+
+    asyncio.run(run())
+    return requests
+
+
+def test_store_deduplicates_by_sha256(tmp_path):
+    store = ContentStore(tmp_path)
+    digest = store.put(BODY)
+    assert digest == hashlib.sha256(BODY).hexdigest()
+    assert store.put(BODY) == digest
+
+    (tmp_path / 'body.html').write_bytes(BODY)
+    assert store.put_file(tmp_path / 'body.html') == digest
+    assert list(tmp_path.glob('*/*.gz')) == [store.path(digest)]
+    assert gzip.decompress(store.path(digest).read_bytes()) == BODY
+    assert store.get(digest) == BODY
+
+
+def test_fetch_stores_body_once(tmp_path):
+    store = ContentStore(tmp_path)
+    articles = [article('/a'), article('/b')]
+    fetched(ContentFetcher(store, delay=0), articles)
+
+    assert articles[0].content_hash == articles[1].content_hash == hashlib.sha256(BODY).hexdigest()
+    assert articles[0].load_content(store) == BODY
+    assert len(list(tmp_path.glob('*/*.gz'))) == 1
+
+
+def test_size_cap(tmp_path):
+    articles = [article('/large'), article('/streamed')]
+    fetched(ContentFetcher(ContentStore(tmp_path), delay=0, max_size=500), articles)
+    assert [a.content_hash for a in articles] == [None, None]
+    assert list(tmp_path.glob('*/*.gz')) == []
+
+
+def test_large_body_spills_to_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path / 'spill'))
+    (tmp_path / 'spill').mkdir()
+    store = ContentStore(tmp_path / 'store')
+    articles = [article('/streamed')]
+    fetched(ContentFetcher(store, delay=0, memory_limit=250), articles)
+
+    assert store.get(articles[0].content_hash) == b'y' * 1000
+    # Temporary file is deleted once the body is in the store
+    assert list((tmp_path / 'spill').iterdir()) == []
+
+
+def test_robots_and_media_types_are_respected(tmp_path):
+    articles = [article('/private/a'), article('/video', 'video/vnd.youtube.yt'), article('/public')]
+    requests = fetched(ContentFetcher(ContentStore(tmp_path), delay=0), articles)
+
+    assert [a.content_hash is not None for a in articles] == [False, False, True]
+    assert requests == ['/robots.txt', '/public']
+
+
+def test_fetcher_is_reused_across_runs(tmp_path):
+    fetcher = ContentFetcher(ContentStore(tmp_path), delay=0)
+    first, second = [article('/a')], [article('/private/b'), article('/b')]
+    fetched(fetcher, first)
+    # Second run has its own event loop, robots.txt is fetched again within it
+    assert fetched(fetcher, second) == ['/robots.txt', '/b']
+    assert first[0].content_hash == second[1].content_hash
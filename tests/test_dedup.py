@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import httpx
+
+from updater import collect
+from updater.collect import Article, new_articles
+from updater.dedup import Deduplicator
+from updater.media import MediaTypeResolver
+
+STORY = (
+    'The new agent framework lets developers compose tools, memory and planning into reliable '
+    'workflows, and ships with evaluation harnesses for long running tasks.'
+)
+
+
+def article(title: str, summary: str) -> Article:
+    return Article(url=f'https://example.com/{title}', title=title, summary=summary, mime_type='text/html')
+
+
+def test_near_duplicates_collapse():
+    dedup = Deduplicator(use_content=False)
+    original = article('Agent framework released', STORY)
+    reposted = article('Agent framework released', STORY.replace('reliable', 'dependable'))
+    other = article('Ocean temperatures rise', 'Researchers measured record sea surface temperatures in the Atlantic.')
+
+    assert dedup([original, reposted, other]) == [original, other]
+    assert dedup.groups == {original.id: [reposted.id]}
+    assert dedup.stats['removed'] == 1
+    assert 0 < dedup.removed_ratio < 1
+
+
+def test_index_is_kept_until_reset():
+    dedup = Deduplicator(use_content=False)
+    original = article('Agent framework released', STORY)
+    assert dedup([original]) == [original]
+    assert dedup([article('Agent framework released', STORY)]) == []
+    dedup.reset()
+    assert len(dedup([article('Agent framework released', STORY)])) == 1
+
+
+def test_new_articles_applies_dedup(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == 'HEAD':
+            return httpx.Response(200, headers={'Content-Type': 'text/html'})
+        # Both feeds syndicate the same story under different URLs
+        feed = (
+            f'<?xml version="1.0"?><rss version="2.0"><channel><title>{request.url.host}</title>'
+            f'<item><title>Agent framework released</title><link>https://{request.url.host}/story</link>'
+            f'<description>{STORY}</description><pubDate>Fri, 10 Jan 2025 12:00:00 GMT</pubDate></item>'
+            f'<item><title>Post only on {request.url.host}</title><link>https://{request.url.host}/own</link>'
+            f'<description>Notes from {request.url.host}</description><pubDate>Fri, 10 Jan 2025 11:00:00 GMT</pubDate></item>'
+            '</channel></rss>'
+        )
+        return httpx.Response(200, content=feed.encode(), headers={'Content-Type': 'application/rss+xml'})
+
+    monkeypatch.setattr(collect, '_client', lambda *args: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    feeds = ['https://a.example.com/feed', 'https://b.example.com/feed']
+    articles = new_articles(
+        feeds, datetime(2000, 1, 1), resolver=MediaTypeResolver(rules=[]), dedup=Deduplicator(use_content=False)
+    )
+
+    assert [a.url for a in articles] == [
+        'https://a.example.com/story', 'https://a.example.com/own', 'https://b.example.com/own'
+    ]
@@ -0,0 +1,41 @@
+from datetime import date
+
+import pytest
+
+from accounts.directory import Directory
+from accounts.tools import USERS, ACCOUNTS
+
+pd = pytest.importorskip('pandas')
+
+
+def test_directory_indexes():
+    directory = Directory(USERS, ACCOUNTS)
+    assert len(directory) == len(USERS)
+    assert directory.identify(' JAMES ', 'smith', credit_card_last_four='8248') == 1
+    assert directory.identify('James', 'Smith', account_last_four='8248') is None
+    assert directory.user(1)['DOB'] == date(1982, 5, 8)
+    assert directory.accounts(99) == []
+
+
+def test_load_csv_with_missing_dob(tmp_path):
+    (tmp_path / 'users.csv').write_text('id,first,last,DOB\n1,James,Smith,1982-05-08\n2,Mary,Jones,\n')
+    (tmp_path / 'accounts.csv').write_text('account_no,user,type\n4000123412348248,1,CREDIT\n987654321567,2,CHECKING\n')
+    directory = Directory.load(tmp_path / 'users.csv', tmp_path / 'accounts.csv')
+
+    assert directory.user(1) == {'id': 1, 'name': {'first': 'James', 'last': 'Smith'}, 'DOB': date(1982, 5, 8)}
+    assert directory.user(2)['DOB'] is None
+    assert directory.identify('Mary', 'Jones', account_last_four='1567') == 2
+
+
+def test_load_parquet_matches_csv(tmp_path):
+    pytest.importorskip('pyarrow')
+    users = pd.DataFrame({
+        'id': [1, 2], 'first': ['James', 'Mary'], 'last': ['Smith', 'Jones'],
+        'DOB': pd.to_datetime(['1982-05-08', None])
+    })
+    accounts = pd.DataFrame({'account_no': [4000123412348248], 'user': [1], 'type': ['CREDIT']})
+    users.to_parquet(tmp_path / 'users.parquet')
+    accounts.to_parquet(tmp_path / 'accounts.parquet')
+    directory = Directory.load(tmp_path / 'users.parquet', tmp_path / 'accounts.parquet')
+
+    assert [directory.user(1)['DOB'], directory.user(2)['DOB']] == [date(1982, 5, 8), None]
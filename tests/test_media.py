@@ -0,0 +1,84 @@
+import time
+import asyncio
+
+import httpx
+
+from updater.media import MediaTypeCache, MediaTypeResolver
+from updater.net import HostLimiter
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == '/moved':
+        return httpx.Response(301, headers={'Location': '/paper', 'Content-Type': 'text/html'})
+    if request.url.path == '/paper':
+        return httpx.Response(200, headers={'Content-Type': 'application/pdf'})
+    if request.url.path == '/no-head':
+        # Rejects HEAD, answers the first byte of a GET
+        if request.method == 'HEAD':
+            return httpx.Response(405, headers={'Content-Type': 'text/html'})
+        assert request.headers['Range'] == 'bytes=0-0'
+        return httpx.Response(206, content=b'%', headers={'Content-Type': 'application/pdf'})
+    return httpx.Response(404, headers={'Content-Type': 'text/html; charset=utf-8'})
+
+
+def resolver() -> MediaTypeResolver:
+    return MediaTypeResolver(rules=[], cache=MediaTypeCache(':memory:'))
+
+
+def test_resolve_follows_redirects():
+    media_types = resolver()
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        assert media_types.resolve('https://example.com/moved', client) == 'application/pdf'
+    assert media_types.cache.get('https://example.com/moved') == 'application/pdf'
+
+
+def test_resolve_does_not_cache_errors():
+    media_types = resolver()
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        assert media_types.resolve('https://example.com/missing', client) is None
+    assert media_types.cache.get('https://example.com/missing') is None
+    assert media_types.stats['error'] == 1
+
+
+def test_resolve_falls_back_to_get():
+    media_types = resolver()
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        assert media_types.resolve('https://example.com/no-head', client) == 'application/pdf'
+    assert media_types.cache.get('https://example.com/no-head') == 'application/pdf'
+    assert media_types.stats['fallback'] == 1
+    assert media_types.stats['error'] == 0
+
+
+def test_aresolve_status_handling():
+    media_types = resolver()
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            limiter = HostLimiter()
+            return (
+                await media_types.aresolve('https://example.com/moved', client, limiter),
+                await media_types.aresolve('https://example.com/missing', client, limiter),
+                await media_types.aresolve('https://example.com/no-head', client, limiter),
+            )
+
+    assert asyncio.run(run()) == ('application/pdf', None, 'application/pdf')
+    assert media_types.cache.get('https://example.com/missing') is None
+
+
+def test_cached_media_type_skips_network():
+    media_types = resolver()
+    media_types.cache.put('https://example.com/cached', 'application/pdf')
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        assert media_types.resolve('https://example.com/cached', client) == 'application/pdf'
+    assert media_types.stats['cache'] == 1
+    assert media_types.stats['network'] == 0
+
+
+def test_purge_deletes_expired():
+    cache = MediaTypeCache(':memory:')
+    cache.put('https://example.com/old', 'text/html')
+    cache.put('https://example.com/new', 'text/html')
+    cache._db.execute('UPDATE media_types SET checked = ? WHERE url LIKE ?', (time.time() - 100, '%/old'))
+    assert cache.purge(ttl=50) == 1
+    assert cache.get('https://example.com/old', ttl=1000) is None
+    assert cache.get('https://example.com/new') == 'text/html'
@@ -0,0 +1,74 @@
+import time
+import uuid
+import threading
+
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.output_parsers import PydanticOutputParser
+
+from updater.newsletter import build_graph
+
+
+class FakePlanner(FakeListChatModel):
+    def with_structured_output(self, schema, **kwargs):
+        return self | PydanticOutputParser(pydantic_object=schema)
+
+
+def test_newsletter_from_plain_dicts():
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    plan = (
+        '{"sections": ['
+        f'{{"title": "Models", "plan": "New models", "ids": ["{ids[0]}", "{ids[1]}"]}},'
+        f'{{"title": "Tools", "plan": "New tools", "ids": ["{ids[2]}"]}}'
+        ']}'
+    )
+    graph = build_graph(planner=FakePlanner(responses=[plan]), writer=FakeListChatModel(responses=['Section text']))
+
+    # Same input as a JSON run on a LangGraph server
+    result = graph.invoke({
+        'format': {
+            'topic': 'AI', 'audience': 'Engineers', 'description': 'Weekly news',
+            'sections': [{'title': 'Models'}, {'title': 'Tools'}]
+        },
+        'articles': [
+            {'id': id, 'url': f'https://example.com/{i}', 'title': f'Article {i}', 'mime_type': 'text/html'}
+            for i, id in enumerate(ids)
+        ],
+    })
+
+    assert result['document'] == '## Models\n\nSection text\n\n## Tools\n\nSection text'
+
+
+# Sections being written at the same time and the most seen so far
+writing = {'now': 0, 'peak': 0}
+lock = threading.Lock()
+
+
+class SlowWriter(FakeListChatModel):
+    def _call(self, *args, **kwargs):
+        with lock:
+            writing['now'] += 1
+            writing['peak'] = max(writing['peak'], writing['now'])
+        time.sleep(0.05)
+        with lock:
+            writing['now'] -= 1
+        return super()._call(*args, **kwargs)
+
+
+def test_sections_written_within_limit():
+    sections = ','.join(f'{{"title": "Section {i}", "plan": "Plan", "ids": []}}' for i in range(6))
+    graph = build_graph(
+        planner=FakePlanner(responses=[f'{{"sections": [{sections}]}}']),
+        writer=SlowWriter(responses=['Section text']),
+        max_concurrent_sections=2
+    )
+    newsletter = {'topic': 'AI', 'audience': 'Engineers', 'description': 'Weekly news', 'sections': []}
+
+    writing['peak'] = 0
+    result = graph.invoke({'format': newsletter, 'articles': []})
+    assert result['document'].count('## Section') == 6
+    assert writing['peak'] == 2
+
+    # Config of the run overrides the default limit
+    writing['peak'] = 0
+    graph.invoke({'format': newsletter, 'articles': []}, {'max_concurrency': 6})
+    assert writing['peak'] > 2
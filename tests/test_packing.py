@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime
+
+from updater.collect import Article
+from updater.packing import (
+    ID_TOKENS, MIN_SUMMARY_TOKENS, TokenCountCache, TokenCounter, _truncate, approximate_tokens, pack_articles
+)
+
+NOW = datetime(2025, 1, 1)
+
+
+def articles():
+    # New IDs on every call, like separate collection runs
+    return [
+        Article(url=f'https://example.com/{i}', title=f'Title {i}', summary='word ' * 50, mime_type='text/html', published=NOW)
+        for i in range(20)
+    ]
+
+
+def counting(calls: list):
+    def count(text: str) -> int:
+        calls.append(text)
+        return approximate_tokens(text)
+    return count
+
+
+def test_token_cache_hits_across_runs():
+    cache = TokenCountCache(':memory:')
+    first, second = [], []
+
+    pack_articles(articles(), budget=100_000, counter=TokenCounter(counting(first), cache=cache), now=NOW)
+    pack_articles(articles(), budget=100_000, counter=TokenCounter(counting(second), cache=cache), now=NOW)
+
+    assert len(first) == 21
+    assert second == []
+
+
+def test_article_tokens_close_to_xml():
+    counter = TokenCounter()
+    for article in articles():
+        assert abs(counter.article(article) - approximate_tokens(article.to_xml())) <= 1
+
+
+def test_pack_within_budget():
+    counter = TokenCounter()
+    candidates = articles()
+    packed = pack_articles(candidates, budget=500, counter=counter, now=NOW)
+    assert packed.tokens <= 500
+    assert packed.dropped == len(candidates) - len(packed.articles)
+    assert approximate_tokens(packed.to_xml()) <= 500 + len(packed.articles)
+
+
+def characters() -> TokenCounter:
+    # One token per character makes token counts exact
+    return TokenCounter(len, name='characters', id_tokens=len(f' ID={uuid.UUID(int=0)}'))
+
+
+def test_id_tokens_accounting():
+    article = articles()[0]
+    assert characters().article(article) == len(article.to_xml())
+    assert TokenCounter().article(article) - TokenCounter(id_tokens=0).article(article) == ID_TOKENS
+    # Counts without the ID are shared by copies of the article with another ID
+    calls = []
+    counter = TokenCounter(counting(calls))
+    counter.article(article)
+    counter.article(article.model_copy(update={'id': uuid.uuid4()}))
+    assert len(calls) == 1
+
+
+def test_truncate_at_budget_boundary():
+    counter = characters()
+    article = articles()[0]
+    bare = counter.article(article.model_copy(update={'summary': None}))
+
+    assert _truncate(article, bare + MIN_SUMMARY_TOKENS - 1, counter) is None
+    shortened = _truncate(article, bare + MIN_SUMMARY_TOKENS, counter)
+    assert shortened is not None and counter.article(shortened) <= bare + MIN_SUMMARY_TOKENS
+    shortened = _truncate(article, counter.article(article) - 1, counter)
+    assert shortened.summary.endswith('...') and counter.article(shortened) < counter.article(article)
+
+
+def test_pack_exact_budget():
+    counter = characters()
+    candidates = articles()[:3]
+    budget = len('<ARTICLES></ARTICLES>') + sum(counter.article(article) for article in candidates)
+
+    packed = pack_articles(candidates, budget=budget, counter=counter, now=NOW)
+    assert (packed.tokens, packed.truncated, packed.dropped) == (budget, [], 0)
+
+    packed = pack_articles(candidates, budget=budget - 1, counter=counter, now=NOW)
+    assert packed.tokens <= budget - 1
+    assert len(packed.truncated) == 1 and packed.dropped == 0
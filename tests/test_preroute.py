@@ -0,0 +1,102 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from accounts import preroute as module
+from accounts.preroute import extract_identification, preroute, route
+
+
+@pytest.fixture(autouse=True)
+def stats():
+    module.stats.clear()
+    yield module.stats
+    module.stats.clear()
+
+
+@pytest.mark.parametrize('text, expected', [
+    (
+        "Hi, I'm James Smith, my credit card ends in 1234. What is my balance?",
+        {'first_name': 'James', 'last_name': 'Smith', 'credit_card_last_four': '1234'}
+    ),
+    (
+        "This is Mary-Ann O'Neil, checking account 5555-6666-7777-8888",
+        {'first_name': 'Mary-Ann', 'last_name': "O'Neil", 'account_last_four': '8888'}
+    ),
+    (
+        'James Smith here, card number 4111 1111 1111 4321 and savings account 9876',
+        {'first_name': 'James', 'last_name': 'Smith', 'credit_card_last_four': '4321', 'account_last_four': '9876'}
+    ),
+    (
+        # The same name and number repeated are not ambiguous
+        'James Smith, card 1234. Again, James Smith with card ending 1234',
+        {'first_name': 'James', 'last_name': 'Smith', 'credit_card_last_four': '1234'}
+    ),
+    (
+        'Hi James Smith, CREDIT CARD: 1234',
+        {'first_name': 'James', 'last_name': 'Smith', 'credit_card_last_four': '1234'}
+    ),
+    (
+        'Hello, Dr James Smith, CREDIT CARD: 1234',
+        {'first_name': 'James', 'last_name': 'Smith', 'credit_card_last_four': '1234'}
+    ),
+])
+def test_extracts_identification(text, expected):
+    assert extract_identification(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    # No name
+    'My credit card ends in 1234',
+    'i am james smith, card 1234',
+    # Two people
+    'James Smith and Mary Jones, card 1234',
+    # Three capitalized words, which two are the name is ambiguous
+    'Mary Ann Smith, card 1234',
+    # Capitalized words which are not a name
+    'Hello There, card 1234',
+    'Credit Card 1234',
+    # No number
+    "I'm James Smith, what's my balance?",
+    # Number not next to a card or an account
+    'James Smith, my phone is 555 1234',
+    # Number too short
+    'James Smith, card 12',
+    # Conflicting numbers
+    'James Smith, card 1234, or maybe card 5678',
+    'James Smith, checking 1111 or savings 2222',
+])
+def test_ambiguous_messages_are_not_routed(text):
+    assert extract_identification(text) is None
+
+
+def test_preroute_hit(stats):
+    update = preroute({'messages': [HumanMessage('James Smith, card 1234')], 'user_id': None})
+    [message] = update['messages']
+    [call] = message.tool_calls
+    assert call['name'] == 'identify_user'
+    assert call['args'] == {'first_name': 'James', 'last_name': 'Smith', 'credit_card_last_four': '1234'}
+    assert call['id'].startswith('preroute-')
+    assert route({'messages': [HumanMessage('James Smith, card 1234'), message]}) == 'tools'
+    assert stats == {'hit': 1}
+
+
+def test_preroute_miss(stats):
+    state = {'messages': [HumanMessage('What is my balance?')], 'user_id': None}
+    assert preroute(state) == {}
+    assert route(state) == 'agent'
+    assert stats == {'miss': 1}
+
+
+@pytest.mark.parametrize('state', [
+    # User already identified
+    {'messages': [HumanMessage('James Smith, card 1234')], 'user_id': 7},
+    # Last message is not from the user
+    {'messages': [HumanMessage('James Smith, card 1234'), AIMessage('Hello James')], 'user_id': None},
+    {'messages': [], 'user_id': None},
+])
+def test_preroute_skipped(state, stats):
+    assert preroute(state) == {}
+    assert stats == {'skipped': 1}
+
+
+def test_route_ignores_answers():
+    assert route({'messages': [AIMessage('Your balance is 10')]}) == 'agent'
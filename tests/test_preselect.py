@@ -0,0 +1,68 @@
+from updater.collect import Article
+from updater.preselect import EmbeddingCache, Embeddings, HashingEmbedder, preselect
+
+TOPIC = 'AI agents with tools and memory'
+
+
+def article(i: int, title: str, summary: str) -> Article:
+    return Article(url=f'https://example.com/{i}', title=title, summary=summary, mime_type='text/html')
+
+
+def articles():
+    agents = [
+        article(i, f'AI agents with tools, part {i}', 'Agents call tools and keep memory between steps')
+        for i in range(4)
+    ]
+    others = [
+        article(4, 'Ocean temperatures rise', 'Record sea surface temperatures in the Atlantic'),
+        article(5, 'Sourdough at home', 'Flour, water and patience make good bread'),
+    ]
+    return agents + others
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts += texts
+        return super().__call__(texts)
+
+
+def test_ranks_by_similarity_to_topic():
+    selected = preselect(articles(), TOPIC, k=4)
+    # Agent articles differ only in their part number, their order among themselves is arbitrary
+    assert {a.url for a in selected.articles} == {f'https://example.com/{i}' for i in range(4)}
+    assert selected.scores == sorted(selected.scores, reverse=True)
+    assert selected.scores[-1] > 0.5
+    assert selected.total == 6
+
+
+def test_max_per_cluster():
+    uncapped = preselect(articles(), TOPIC, k=2, clusters=2)
+    assert len(set(uncapped.clusters)) == 1
+
+    capped = preselect(articles(), TOPIC, k=2, clusters=2, max_per_cluster=1)
+    assert capped.articles[0].url == uncapped.articles[0].url
+    assert len(set(capped.clusters)) == 2
+
+    # Places left by the cap are filled by score
+    filled = preselect(articles(), TOPIC, k=5, clusters=2, max_per_cluster=1)
+    assert len(filled.articles) == 5
+
+
+def test_embeddings_are_reused():
+    embedder = CountingEmbedder()
+    cache = EmbeddingCache(':memory:')
+    embeddings = Embeddings(embedder, cache=cache)
+
+    preselect(articles(), TOPIC, embeddings=embeddings)
+    assert len(embedder.texts) == 7
+    preselect(articles(), TOPIC, embeddings=embeddings)
+    assert len(embedder.texts) == 7
+
+    # Persistent cache serves a new instance too
+    other = CountingEmbedder()
+    preselect(articles(), TOPIC, embeddings=Embeddings(other, cache=cache))
+    assert other.texts == []
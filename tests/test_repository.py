@@ -0,0 +1,62 @@
+import asyncio
+import random
+
+import pytest
+
+from accounts.directory import Directory
+from accounts.repository import DirectoryRepository, SQLiteRepository
+
+NAMES = [('Alex', 'Kim'), ('Maria', 'Garcia'), ('Sam', 'Lee')]
+
+
+def book(count: int = 60, seed: int = 0):
+    rng = random.Random(seed)
+    # IDs out of order, so the order of users differs from the order of IDs
+    ids = rng.sample(range(1, 10 * count), count)
+    users = [
+        {'id': id, 'name': dict(zip(('first', 'last'), rng.choice(NAMES))), 'DOB': None}
+        for id in ids
+    ]
+    accounts = [
+        {'account_no': rng.randrange(10 ** 11, 10 ** 12) * 10_000 + rng.randrange(20), 'user': id, 'type': kind}
+        for id in ids for kind in ('CREDIT', 'CHECKING')
+    ]
+    return users, accounts
+
+
+@pytest.fixture
+def repositories(tmp_path):
+    users, accounts = book()
+    sqlite = SQLiteRepository(tmp_path / 'accounts.sqlite')
+    # Two batches, ranks continue across them
+    sqlite.populate(users[:30], accounts)
+    sqlite.populate(users[30:], [])
+    yield DirectoryRepository(Directory(users, accounts)), sqlite
+    sqlite.close()
+
+
+def queries():
+    return [
+        (first, last, f'{number:04d}' if credit else None, None if credit else f'{number:04d}')
+        for first, last in NAMES + [('Nobody', 'Here')] for number in range(22) for credit in (True, False)
+    ]
+
+
+def test_identify_matches_directory(repositories):
+    directory, sqlite = repositories
+    expected = [directory.identify(*query) for query in queries()]
+    # Many users share a name and the last four digits, the first added one wins
+    assert sum(user_id is not None for user_id in expected) > 50
+    assert [sqlite.identify(*query) for query in queries()] == expected
+
+    async def identify_all():
+        return await asyncio.gather(*(sqlite.aidentify(*query) for query in queries()))
+
+    assert asyncio.run(identify_all()) == expected
+
+
+def test_details_match_directory(repositories):
+    directory, sqlite = repositories
+    for user_id in [user['id'] for user in book()[0]][:10]:
+        assert sqlite.get_user(user_id) == directory.get_user(user_id)
+        assert sqlite.get_accounts(user_id) == sorted(directory.get_accounts(user_id), key=lambda a: a['account_no'])
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from updater import scheduler
+from updater.collect import _Pass
+from updater.media import MediaTypeResolver
+from updater.scheduler import (
+    FeedSchedule, FeedScheduler, learn_interval, MAX_BACKOFF, MAX_INTERVAL, MIN_INTERVAL
+)
+from updater.utils import FeedEntry
+
+FEED = 'https://example.com/feed'
+
+
+def entries(gap: timedelta, count: int = 5):
+    now = datetime.now()
+    return [FeedEntry(title=str(i), url=f'https://example.com/{i}', published=now - gap * (i + 1)) for i in range(count)]
+
+
+def test_learn_interval_bounds_and_smoothing():
+    assert learn_interval(entries(timedelta(hours=1), count=1), 1234) == 1234
+    assert learn_interval(entries(timedelta(seconds=10)), MIN_INTERVAL) == MIN_INTERVAL
+    assert learn_interval(entries(timedelta(days=30)), 3600) == MAX_INTERVAL
+    # Hourly feed is polled twice an hour, halfway there from the previous interval
+    assert learn_interval(entries(timedelta(hours=1)), 3600) == pytest.approx(2700, abs=1)
+
+
+def test_backoff(monkeypatch):
+    monkeypatch.setattr(scheduler.random, 'uniform', lambda low, high: 1.0)
+    feeds = FeedScheduler([], print)
+    schedule = FeedSchedule(url=FEED, interval=1000)
+
+    feeds._reschedule(schedule, now=0)
+    assert schedule.next_poll == 1000
+    schedule.failures = 3
+    feeds._reschedule(schedule, now=0)
+    assert schedule.next_poll == 8000
+    schedule.failures = 20
+    feeds._reschedule(schedule, now=0)
+    assert schedule.next_poll == MAX_BACKOFF
+
+
+def test_save_interval(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(scheduler.time, 'monotonic', lambda: now[0])
+
+    class State:
+        saves = 0
+
+        def save(self):
+            self.saves += 1
+
+    state = State()
+    feeds = FeedScheduler([], print, state=state, save_interval=60)
+    feeds._unsaved = 3
+    feeds._save()
+    assert state.saves == 0
+    now[0] += 61
+    feeds._save()
+    assert state.saves == 1
+    # Nothing polled since the last save
+    now[0] += 61
+    feeds._save(force=True)
+    assert state.saves == 1
+    feeds._unsaved = 1
+    feeds._save(force=True)
+    assert state.saves == 2
+
+
+def test_skipped_entries_are_retried():
+    newest = datetime(2025, 1, 10, 12)
+    broken = {'/new'}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == '/feed':
+            items = ''.join(
+                f'<item><title>{path}</title><link>https://example.com{path}</link>'
+                f'<pubDate>{format_datetime(published)}</pubDate></item>'
+                for path, published in [('/new', newest), ('/old', newest - timedelta(hours=1))]
+            )
+            feed = f'<?xml version="1.0"?><rss version="2.0"><channel><title>Feed</title>{items}</channel></rss>'
+            return httpx.Response(200, content=feed.encode(), headers={'Content-Type': 'application/rss+xml'})
+        if request.url.path in broken:
+            return httpx.Response(404)
+        return httpx.Response(200, headers={'Content-Type': 'text/html'})
+
+    emitted = []
+    feeds = FeedScheduler([FEED], emitted.extend, starting_point=datetime(2000, 1, 1))
+
+    async def poll():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            collection = _Pass(client, resolver=MediaTypeResolver(rules=[]))
+            await feeds.poll(collection, feeds.schedules[FEED])
+
+    asyncio.run(poll())
+    assert [a.url for a in emitted] == ['https://example.com/old']
+    assert feeds.schedules[FEED].newest == newest - timedelta(hours=1)
+
+    broken.clear()
+    asyncio.run(poll())
+    assert [a.url for a in emitted] == ['https://example.com/old', 'https://example.com/new']
+    assert feeds.schedules[FEED].newest == newest
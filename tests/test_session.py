@@ -0,0 +1,147 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from accounts import session
+from accounts.session import SessionCache, thread_id
+
+DETAILS = {'user': {'id': 7}, 'accounts': []}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_thread_id():
+    assert thread_id({'configurable': {'thread_id': 'abc'}}) == 'abc'
+    assert thread_id({'configurable': {}}) is None
+    assert thread_id(None) is None
+
+
+def test_prefetch_runs_once_in_background():
+    cache = SessionCache()
+    calls = []
+    release = threading.Event()
+
+    def fetch(user_id):
+        calls.append((user_id, threading.current_thread().name))
+        release.wait(5)
+        return DETAILS
+
+    cache.prefetch('t1', 7, fetch)
+    # Already running for the same thread and user
+    cache.prefetch('t1', 7, fetch)
+    # Nothing is cached without a thread
+    cache.prefetch(None, 7, fetch)
+
+    threading.Timer(0.05, release.set).start()
+    # get waits for the running prefetch
+    assert cache.get('t1', 7) == DETAILS
+    assert len(calls) == 1 and calls[0][0] == 7
+    assert calls[0][1].startswith('accounts-prefetch')
+    assert cache.stats == {'prefetched': 1, 'hits': 1, 'misses': 0}
+
+
+def test_other_user_or_thread_misses():
+    cache = SessionCache()
+    cache.put('t1', 7, DETAILS)
+    assert cache.get('t2', 7) is None
+    assert cache.get(None, 7) is None
+    assert cache.get('t1', None) is None
+    # Thread identified a different user, the old entry is dropped
+    assert cache.get('t1', 8) is None
+    assert cache.get('t1', 7) is None
+    assert cache.stats['hits'] == 0 and cache.stats['misses'] == 3
+
+
+def test_failed_or_slow_prefetch_is_dropped():
+    cache = SessionCache()
+
+    def fail(user_id):
+        raise RuntimeError('database is down')
+
+    cache.prefetch('t1', 7, fail)
+    assert cache.get('t1', 7) is None
+
+    release = threading.Event()
+    cache.prefetch('t1', 7, lambda user_id: release.wait(5) and DETAILS)
+    assert cache.get('t1', 7, wait=0.01) is None
+    release.set()
+    # The slow entry was dropped, so the next prefetch fetches again
+    cache.prefetch('t1', 7, lambda user_id: DETAILS)
+    assert cache.get('t1', 7) == DETAILS
+    assert cache.stats == {'prefetched': 3, 'hits': 1, 'misses': 2}
+
+
+def test_aprefetch():
+    cache = SessionCache()
+    calls = []
+
+    async def fetch(user_id):
+        calls.append(user_id)
+        await asyncio.sleep(0.01)
+        return DETAILS
+
+    async def fail(user_id):
+        raise RuntimeError('database is down')
+
+    async def run():
+        cache.aprefetch('t1', 7, fetch)
+        cache.aprefetch('t1', 7, fetch)
+        cache.aprefetch(None, 7, fetch)
+        cache.aprefetch('t2', 8, fail)
+        return await cache.aget('t1', 7), await cache.aget('t2', 8), await cache.aget('t1', 7)
+
+    assert asyncio.run(run()) == (DETAILS, None, DETAILS)
+    assert calls == [7]
+    assert cache.stats == {'prefetched': 2, 'hits': 2, 'misses': 1}
+
+
+def test_ttl_expiry(clock):
+    cache = SessionCache(ttl=10)
+    cache.put('t1', 7, DETAILS)
+    clock.now += 10
+    assert cache.get('t1', 7) == DETAILS
+    clock.now += 0.1
+    assert cache.get('t1', 7) is None
+
+    # Expired entry does not stop a new prefetch
+    calls = []
+    cache.prefetch('t1', 7, lambda user_id: calls.append(user_id) or DETAILS)
+    assert cache.get('t1', 7) == DETAILS
+    assert calls == [7]
+
+
+def test_lru_eviction():
+    cache = SessionCache(max_sessions=2)
+    cache.put('t1', 1, DETAILS)
+    cache.put('t2', 2, DETAILS)
+    # Reading t1 makes t2 the least recently used
+    assert cache.get('t1', 1) == DETAILS
+    cache.put('t3', 3, DETAILS)
+
+    assert cache.get('t2', 2) is None
+    assert cache.get('t1', 1) == DETAILS
+    assert cache.get('t3', 3) == DETAILS
+    assert len(cache._entries) == 2
+
+
+def test_invalidate():
+    cache = SessionCache()
+    cache.put('t1', 7, DETAILS)
+    cache.invalidate('t1')
+    cache.invalidate('missing')
+    assert cache.get('t1', 7) is None
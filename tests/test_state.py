@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from updater.collect import _Pass
+from updater.state import BloomFilter, FeedState, HIGH_WATER_SLACK
+from updater.utils import FeedEntry
+
+FEED = 'https://example.com/feed'
+NEWEST = datetime(2025, 1, 10)
+
+
+def entry(i: int, published: datetime = NEWEST) -> FeedEntry:
+    return FeedEntry(title=f'Post {i}', url=f'https://example.com/{i}', published=published, guid=f'urn:{i}')
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter.for_capacity(10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f'seen-{i}')
+    assert all(f'seen-{i}' in bloom for i in range(10_000))
+    false_positives = sum(f'other-{i}' in bloom for i in range(10_000))
+    assert false_positives < 200
+
+
+def test_seen_set_membership():
+    state = FeedState(':memory:')
+    assert state.is_new(['https://example.com/1'])
+    assert state.record(FEED, [entry(1), entry(2)]) == [entry(1), entry(2)]
+    # Either key of an entry marks it as seen
+    assert not state.is_new(['https://example.com/1'])
+    assert not state.is_new(['https://example.com/other', 'urn:2'])
+    assert state.record(FEED, [entry(2), entry(3)]) == [entry(3)]
+    assert state.count == 6
+
+
+def test_high_water_filtering():
+    state = FeedState(':memory:')
+    state.record(FEED, [entry(1)])
+    assert state.high_water(FEED) == NEWEST
+
+    late = entry(2, NEWEST - HIGH_WATER_SLACK + timedelta(hours=1))
+    stale = entry(3, NEWEST - HIGH_WATER_SLACK - timedelta(hours=1))
+    # Entry 1 is seen, late entry is within the slack, stale one is below it
+    entries = _Pass(None, state=state).filter_entries(FEED, [entry(1), late, stale], datetime(2000, 1, 1))
+    assert entries == [late]
+
+
+def test_reopened_state_filters_emitted_entries(tmp_path):
+    with FeedState(tmp_path / 'state.sqlite') as state:
+        state.record(FEED, [entry(1), entry(2)])
+
+    with FeedState(tmp_path / 'state.sqlite') as state:
+        assert state.count == 4
+        assert state.high_water(FEED) == NEWEST
+        assert _Pass(None, state=state).filter_entries(FEED, [entry(1), entry(2)], datetime(2000, 1, 1)) == []
+        assert state.record(FEED, [entry(2), entry(3)]) == [entry(3)]
+
+
+def test_stale_bloom_filter_is_rebuilt(tmp_path):
+    with FeedState(tmp_path / 'state.sqlite') as state:
+        state.record(FEED, [entry(1)])
+    # Crash after recording more entries, before saving the Bloom filter
+    state = FeedState(tmp_path / 'state.sqlite')
+    state.record(FEED, [entry(2)])
+    state._db.close()
+
+    with FeedState(tmp_path / 'state.sqlite') as state:
+        assert 'https://example.com/2' in state.bloom
+        assert not state.is_new(['https://example.com/2'])
+
+
+def test_filter_grows_beyond_capacity(tmp_path):
+    with FeedState(tmp_path / 'state.sqlite', capacity=10) as state:
+        size = state.bloom.size
+        state.record(FEED, [entry(i) for i in range(8)])
+        assert state.capacity == 20
+        assert state.bloom.size > size
+        assert all(not state.is_new([f'urn:{i}']) for i in range(8))
+
+    with FeedState(tmp_path / 'state.sqlite', capacity=10) as state:
+        assert state.capacity >= 20
+        assert state.bloom.size > size
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from updater.collect import Article
+from updater.store import ArticleStore
+
+
+def articles(count: int, start: int = 0):
+    return [
+        Article(
+            url=f'https://example.com/{i}', title=f'Mars mission {i}' if i % 2 else f'Ocean report {i}',
+            summary='Summary', mime_type='text/html', feed='https://example.com/feed',
+            published=datetime(2025, 1, 1 + i)
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def test_add_counts_new_articles():
+    with ArticleStore(':memory:') as store:
+        assert store.add(articles(10)) == 10
+        # Same URLs are ignored, only 5 are new
+        assert store.add(articles(10, start=5)) == 5
+        assert store.add([]) == 0
+        assert len(store) == 15
+
+
+def test_query_filters_and_search():
+    with ArticleStore(':memory:') as store:
+        store.add(articles(10))
+        assert store.count(text='mars') == 5
+        newest = next(store.query(since=datetime(2025, 1, 5)))
+        assert newest.url == 'https://example.com/9'
+        assert [a.url for a in store.query(until=datetime(2025, 1, 3), newest_first=False)] == [
+            'https://example.com/0', 'https://example.com/1'
+        ]
+        assert store.get_by_url('https://example.com/3').title == 'Mars mission 3'
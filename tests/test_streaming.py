@@ -0,0 +1,148 @@
+import asyncio
+import json
+from typing import List
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableGenerator, RunnableLambda
+from langchain_core.tracers.langchain import LangChainTracer
+
+from accounts import streaming
+from accounts.streaming import LatencyStats, stream_model, astream_model
+
+MESSAGES = [HumanMessage('What is my balance?')]
+
+
+class StreamingChatModel(BaseChatModel):
+    """Answers with text streamed word by word, then a tool call in the last chunk"""
+    model_name: str = 'fake-streaming'
+    text: str = 'Your balance is 10 dollars'
+    tool_call: dict = {'name': 'get_user_details', 'args': {'user_id': 1}, 'id': 'call-1'}
+
+    @property
+    def _llm_type(self) -> str:
+        return 'fake-streaming'
+
+    def _chunks(self) -> List[AIMessageChunk]:
+        words = self.text.split(' ')
+        chunks = [AIMessageChunk(content=word if i == 0 else ' ' + word) for i, word in enumerate(words)]
+        call = {**self.tool_call, 'args': json.dumps(self.tool_call['args']), 'index': 0}
+        return chunks + [AIMessageChunk(content='', tool_call_chunks=[call], response_metadata={'finish_reason': 'STOP'})]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = AIMessage(content=self.text, tool_calls=[self.tool_call], response_metadata={'finish_reason': 'STOP'})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for chunk in self._chunks():
+            yield ChatGenerationChunk(message=chunk)
+
+
+class Events(BaseCallbackHandler):
+    def __init__(self):
+        self.events = []
+
+    def on_custom_event(self, name, data, **kwargs):
+        self.events.append((name, data))
+
+
+class Tracer(LangChainTracer):
+    """Keeps finished runs instead of sending them to LangSmith"""
+
+    def __init__(self):
+        super().__init__(project_name='test', client=MagicMock())
+        self.finished = []
+
+    def _persist_run_single(self, run):
+        pass
+
+    def _update_run_single(self, run):
+        self.finished.append(run)
+
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    stats = LatencyStats()
+    monkeypatch.setattr(streaming, 'latency_stats', stats)
+    return stats
+
+
+def without_latency(message: AIMessage) -> AIMessage:
+    message = message.model_copy(deep=True)
+    del message.response_metadata['latency']
+    return message
+
+
+def check_latency(metrics):
+    assert metrics['model'] == 'fake-streaming'
+    assert metrics['chunks'] == 6
+    assert 0 <= metrics['ttft'] <= metrics['total']
+
+
+def test_streamed_message_equals_invoked(stats):
+    model = StreamingChatModel()
+    message = stream_model(model, MESSAGES)
+
+    expected = model.invoke(MESSAGES)
+    assert isinstance(message, AIMessage)
+    assert without_latency(message).model_dump(exclude={'id'}) == expected.model_dump(exclude={'id'})
+    check_latency(message.response_metadata['latency'])
+    assert stats.summary()['calls'] == 1
+
+
+def test_async_streamed_message_equals_invoked(stats):
+    model = StreamingChatModel()
+    message = asyncio.run(astream_model(model, MESSAGES))
+
+    assert without_latency(message).model_dump(exclude={'id'}) == model.invoke(MESSAGES).model_dump(exclude={'id'})
+    check_latency(message.response_metadata['latency'])
+    assert stats.summary()['calls'] == 1
+
+
+def test_empty_stream():
+    def silent(messages):
+        yield from ()
+
+    message = stream_model(RunnableGenerator(silent), MESSAGES)
+    assert message.content == ''
+    assert message.response_metadata['latency']['ttft'] is None
+    assert message.response_metadata['latency']['chunks'] == 0
+
+
+@pytest.mark.parametrize('use_async', [False, True])
+def test_latency_reaches_event_and_run_metadata(use_async):
+    model = StreamingChatModel()
+    events, tracer = Events(), Tracer()
+
+    def node(messages, config):
+        return stream_model(model, messages, config)
+
+    async def anode(messages, config):
+        return await astream_model(model, messages, config)
+
+    config = {'callbacks': [events, tracer], 'run_name': 'agent'}
+    if use_async:
+        message = asyncio.run(RunnableLambda(anode).ainvoke(MESSAGES, config))
+    else:
+        message = RunnableLambda(node).invoke(MESSAGES, config)
+
+    metrics = message.response_metadata['latency']
+    check_latency(metrics)
+    assert events.events == [('model_latency', metrics)]
+    [run] = [run for run in tracer.finished if run.name == 'agent']
+    assert run.extra['metadata']['model_latency'] == metrics
+
+
+def test_latency_stats_percentiles():
+    stats = LatencyStats(window=4)
+    assert stats.percentile('ttft', 50) is None
+    for value in [5.0, 1.0, 2.0, 3.0, 4.0]:
+        stats.record({'ttft': value, 'total': value * 2})
+    # First call fell out of the window
+    assert stats.summary() == {'calls': 4, 'ttft_p50': 2.0, 'ttft_p95': 4.0, 'total_p50': 4.0, 'total_p95': 8.0}
+    stats.record({'ttft': None, 'total': 1.0})
+    assert stats.percentile('ttft', 0) == 2.0
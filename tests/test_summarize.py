@@ -0,0 +1,77 @@
+import httpx
+
+from updater import summarize
+from updater.collect import Article
+from updater.summarize import Summarizer, Summary, SummaryCache, TokenBucket, _is_rate_limited
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class FakeLLM:
+    """Returns a summary titled after the article URL, failing first with errors queued per URL"""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.calls = []
+
+    async def ainvoke(self, messages):
+        url = messages[0][1][1]['file_uri']
+        self.calls.append(url)
+        if self.errors.get(url):
+            raise self.errors[url].pop(0)
+        return Summary(title=url, short='short', long='long', links=[])
+
+
+def articles(count: int = 3):
+    return [Article(url=f'https://example.com/{i}', title=f'Post {i}', mime_type='text/html') for i in range(count)]
+
+
+def test_rate_limited_errors():
+    response = httpx.Response(429, request=httpx.Request('GET', 'https://example.com'))
+    assert _is_rate_limited(RateLimited())
+    assert _is_rate_limited(httpx.HTTPStatusError('quota', request=response.request, response=response))
+    assert not _is_rate_limited(ValueError('context of 4290 tokens is too long'))
+    assert not _is_rate_limited(ValueError('https://example.com/429'))
+
+
+def test_token_bucket_across_sync_calls():
+    llm = FakeLLM()
+    summarizer = Summarizer(llm, 'fake', rate_limiter=TokenBucket(rate=50, capacity=1))
+    # Articles wait for each other on the lock of the bucket in both calls
+    for _ in range(2):
+        assert [s.title for s in summarizer.summarize(articles())] == [f'https://example.com/{i}' for i in range(3)]
+
+
+def test_retry_after_rate_limit(monkeypatch):
+    monkeypatch.setattr(summarize.random, 'uniform', lambda low, high: 0)
+    llm = FakeLLM({'https://example.com/1': [RateLimited(), RateLimited()], 'https://example.com/2': [ValueError()]})
+    summaries = Summarizer(llm, 'fake').summarize(articles())
+
+    assert [s.title if s else None for s in summaries] == ['https://example.com/0', 'https://example.com/1', None]
+    assert llm.calls.count('https://example.com/1') == 3
+    assert llm.calls.count('https://example.com/2') == 1
+
+
+def test_limiter_failure_drops_one_article():
+    class Limiter:
+        calls = 0
+
+        async def acquire(self):
+            self.calls += 1
+            if self.calls == 2:
+                raise RuntimeError('limiter is broken')
+
+    summaries = Summarizer(FakeLLM(), 'fake', max_concurrency=1, rate_limiter=Limiter()).summarize(articles())
+    assert [s is not None for s in summaries] == [True, False, True]
+
+
+def test_cached_summaries_skip_model():
+    cache = SummaryCache(':memory:')
+    Summarizer(FakeLLM(), 'fake', cache=cache).summarize(articles())
+    llm = FakeLLM()
+    assert [s.title for s in Summarizer(llm, 'fake', cache=cache).summarize(articles())] == [
+        f'https://example.com/{i}' for i in range(3)
+    ]
+    assert llm.calls == []
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, ConfigDict, computed_field
+
+from updater.utils import BaseXMLModel
+
+
+class Extra(BaseXMLModel):
+    model_config = ConfigDict(extra='allow')
+
+    title: str
+
+    @computed_field
+    @property
+    def length(self) -> int:
+        return len(self.title)
+
+
+class Inner(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    name: str
+
+    @computed_field
+    @property
+    def upper(self) -> str:
+        return self.name.upper()
+
+
+class Outer(BaseXMLModel):
+    inner: Inner
+
+
+def test_extras_before_computed_fields():
+    xml = Extra(title='News', source='rss').to_xml()
+    assert xml.index('<source>') < xml.index('<length>')
+
+
+def test_nested_model_in_model_dump_order():
+    xml = Outer(inner=Inner(name='a', note='b')).to_xml()
+    assert xml.index('<name>') < xml.index('<note>') < xml.index('<upper>')
+
+
+def test_escaping():
+    assert '<title>a &lt;b&gt; &amp; c</title>' in Extra(title='a <b> & c').to_xml()
@@ -0,0 +1,254 @@
+from typing import TYPE_CHECKING, Optional, Union, List, Dict, Iterable, Iterator, Sequence
+
+import sys
+import uuid
+import math
+from array import array
+from datetime import datetime, timezone
+
+from updater.collect import Article
+
+if TYPE_CHECKING:
+    from updater.content import ContentStore
+
+# Width of the fixed-size columns in bytes
+ID_SIZE = 16
+HASH_SIZE = 32
+
+_NO_HASH = bytes(HASH_SIZE)
+# Published timestamps of aware datetimes are kept in UTC, naive ones as local time
+_NAIVE, _AWARE, _MISSING = 0, 1, 2
+
+
+class _Strings:
+    """
+    Column of optional strings packed into one UTF-8 buffer
+
+    A row costs its encoded length plus an 8-byte offset instead of a full str object.
+    """
+    __slots__ = ('data', 'offsets', 'nulls')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('Q', [0])
+        self.nulls = set()
+
+    def append(self, value: Optional[str]):
+        if value is None:
+            self.nulls.add(len(self.offsets) - 1)
+        else:
+            self.data += value.encode()
+        self.offsets.append(len(self.data))
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if index in self.nulls:
+            return None
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode()
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class _Interned:
+    """Column of optional strings with few distinct values, stored as codes into a table"""
+    __slots__ = ('values', 'codes', 'column')
+
+    def __init__(self):
+        # Code 0 is None
+        self.values: List[Optional[str]] = [None]
+        self.codes: Dict[Optional[str], int] = {None: 0}
+        self.column = array('I')
+
+    def append(self, value: Optional[str]):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        self.column.append(code)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        return self.values[self.column[index]]
+
+    @property
+    def nbytes(self) -> int:
+        return self.column.itemsize * len(self.column)
+
+
+class ArticleBatch:
+    """
+    Compact columnar container of articles for large backlogs
+
+    Instead of one pydantic model per article, every field is a column:
+    - IDs and content hashes are fixed-width byte arrays
+    - URLs, titles and summaries are packed UTF-8 buffers
+    - feed and mime type are interned, each row keeps only a 4-byte code
+    - publication times are an array of timestamps
+
+    Fields are decoded on access and an Article is materialized only when asked for,
+    e.g. batch[i] or iteration. Inline content is rare for feed entries and is kept aside,
+    bodies in the content store are loaded lazily by content().
+
+    Aware publication times are converted to UTC on the way in.
+    """
+
+    def __init__(self, articles: Iterable[Article] = ()):
+        self._ids = bytearray()
+        self._hashes = bytearray()
+        self._urls = _Strings()
+        self._titles = _Strings()
+        self._summaries = _Strings()
+        self._feeds = _Interned()
+        self._mime_types = _Interned()
+        self._published = array('d')
+        self._published_kind = bytearray()
+        self._contents: Dict[int, Union[str, bytes]] = {}
+        self.extend(articles)
+
+    def __len__(self) -> int:
+        return len(self._published)
+
+    def append(self, article: Article):
+        """Add article as the last row"""
+        index = len(self)
+        self._ids += article.id.bytes
+        self._hashes += bytes.fromhex(article.content_hash) if article.content_hash else _NO_HASH
+        self._urls.append(article.url)
+        self._titles.append(article.title)
+        self._summaries.append(article.summary)
+        self._feeds.append(article.feed)
+        self._mime_types.append(article.mime_type)
+
+        published = article.published
+        if published is None:
+            self._published.append(math.nan)
+            self._published_kind.append(_MISSING)
+        else:
+            self._published.append(published.timestamp())
+            self._published_kind.append(_NAIVE if published.tzinfo is None else _AWARE)
+
+        if article.content is not None:
+            self._contents[index] = article.content
+
+    def extend(self, articles: Iterable[Article]):
+        """Add articles as the last rows"""
+        for article in articles:
+            self.append(article)
+
+    def _index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('ArticleBatch index out of range')
+        return index
+
+    def id(self, index: int) -> uuid.UUID:
+        index = self._index(index)
+        return uuid.UUID(bytes=bytes(self._ids[index * ID_SIZE:(index + 1) * ID_SIZE]))
+
+    def url(self, index: int) -> str:
+        return self._urls[self._index(index)]
+
+    def title(self, index: int) -> str:
+        return self._titles[self._index(index)]
+
+    def summary(self, index: int) -> Optional[str]:
+        return self._summaries[self._index(index)]
+
+    def feed(self, index: int) -> Optional[str]:
+        return self._feeds[self._index(index)]
+
+    def mime_type(self, index: int) -> str:
+        return self._mime_types[self._index(index)]
+
+    def content_hash(self, index: int) -> Optional[str]:
+        index = self._index(index)
+        digest = bytes(self._hashes[index * HASH_SIZE:(index + 1) * HASH_SIZE])
+        return None if digest == _NO_HASH else digest.hex()
+
+    def published(self, index: int) -> Optional[datetime]:
+        index = self._index(index)
+        kind = self._published_kind[index]
+        if kind == _MISSING:
+            return None
+        if kind == _AWARE:
+            return datetime.fromtimestamp(self._published[index], timezone.utc)
+        return datetime.fromtimestamp(self._published[index])
+
+    def content(self, index: int, store: Optional['ContentStore'] = None) -> Optional[Union[str, bytes]]:
+        """
+        Get body of the article, inline content or loaded from content store
+
+        Args:
+            index: Row of the article
+            store: Content store, default updater.content.content_store if not provided
+
+        Returns:
+            Body of the article if known, None otherwise
+        """
+        index = self._index(index)
+        if index in self._contents:
+            return self._contents[index]
+        content_hash = self.content_hash(index)
+        if content_hash is None:
+            return None
+        if store is None:
+            from updater.content import content_store as store
+        return store.get(content_hash)
+
+    def index(self, article_id: uuid.UUID) -> int:
+        """
+        Find row of the article by ID
+
+        Raises:
+            ValueError: If there is no article with this ID
+        """
+        key = article_id.bytes
+        position = self._ids.find(key)
+        while position != -1:
+            if position % ID_SIZE == 0:
+                return position // ID_SIZE
+            position = self._ids.find(key, position + 1)
+        raise ValueError(f'Article {article_id} is not in the batch')
+
+    def __getitem__(self, index: int) -> Article:
+        """Materialize article in the row, without loading content from the store"""
+        index = self._index(index)
+        return Article(
+            id=self.id(index),
+            url=self._urls[index],
+            title=self._titles[index],
+            summary=self._summaries[index],
+            content=self._contents.get(index),
+            content_hash=self.content_hash(index),
+            mime_type=self._mime_types[index],
+            feed=self._feeds[index],
+            published=self.published(index),
+        )
+
+    def __iter__(self) -> Iterator[Article]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def take(self, indices: Sequence[int]) -> 'ArticleBatch':
+        """New batch with the rows in given order"""
+        return ArticleBatch(self[index] for index in indices)
+
+    def to_articles(self) -> List[Article]:
+        """Materialize all articles"""
+        return list(self)
+
+    @property
+    def feeds(self) -> List[str]:
+        """Distinct feeds in the batch"""
+        return [value for value in self._feeds.values if value is not None]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the columns in bytes, without the interned tables and inline content"""
+        return (
+            len(self._ids) + len(self._hashes)
+            + self._urls.nbytes + self._titles.nbytes + self._summaries.nbytes
+            + self._feeds.nbytes + self._mime_types.nbytes
+            + self._published.itemsize * len(self._published) + len(self._published_kind)
+        )
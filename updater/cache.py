@@ -0,0 +1,92 @@
+from typing import Optional, Union, List
+
+import os
+import sqlite3
+from pathlib import Path
+
+from pydantic import BaseModel, TypeAdapter
+
+from updater.utils import FeedEntry
+
+# Directory of persistent caches, can be overridden by environment
+CACHE_DIR = Path(os.environ.get('UPDATER_CACHE_DIR', '.cache/updater'))
+
+
+class SQLiteCache:
+    """
+    Base class of small persistent caches backed by a single SQLite file
+
+    Subclasses define SCHEMA (executed on open) and FILENAME (used when no path is given).
+    """
+    SCHEMA = ''
+    FILENAME = 'cache.sqlite'
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        if path is None:
+            path = CACHE_DIR / self.FILENAME
+        if str(path) != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(self.SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CachedFeed(BaseModel):
+    """Validators and last parse result of a feed"""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: str
+    entries: List[FeedEntry]
+
+
+_entries = TypeAdapter(List[FeedEntry])
+
+
+class FeedCache(SQLiteCache):
+    """
+    Persistent feed-metadata cache keyed by feed URL
+
+    Stores ETag, Last-Modified, hash of the body and the parsed entries, so unchanged
+    feeds can be answered by a conditional GET without downloading or parsing them again.
+    """
+    FILENAME = 'feeds.sqlite'
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS feeds (
+        url TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        content_hash TEXT NOT NULL,
+        entries TEXT NOT NULL
+    );
+    """
+
+    def get(self, url: str) -> Optional[CachedFeed]:
+        row = self._db.execute(
+            'SELECT etag, last_modified, content_hash, entries FROM feeds WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return CachedFeed(
+            etag=row[0],
+            last_modified=row[1],
+            content_hash=row[2],
+            entries=_entries.validate_json(row[3])
+        )
+
+    def put(self, url: str, feed: CachedFeed):
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO feeds (url, etag, last_modified, content_hash, entries) VALUES (?, ?, ?, ?, ?)',
+                (url, feed.etag, feed.last_modified, feed.content_hash, _entries.dump_json(feed.entries).decode())
+            )
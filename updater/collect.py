@@ -1,30 +1,70 @@
-from typing import Optional, Union, List
+from typing import TYPE_CHECKING, Optional, Union, List, Dict, Tuple, AsyncIterator, Awaitable, Callable
 
 import uuid
+import asyncio
+import hashlib
+from contextlib import suppress
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import datetime
 from time import mktime
 
 import httpx
 import feedparser
-from pydantic import BaseModel, Field
+from pydantic import Field
+
+from updater.cache import CachedFeed, FeedCache
+from updater.media import MediaTypeResolver
+from updater.net import HostLimiter, MAX_CONNECTIONS, MAX_PER_HOST, REQUEST_TIMEOUT, request
+from updater.state import FeedState, HIGH_WATER_SLACK, entry_keys
+from updater.utils import BaseXMLModel, FeedEntry, XMLBuffer
+
+if TYPE_CHECKING:
+    from updater.content import ContentStore
+    from updater.dedup import Deduplicator
+    from updater.store import ArticleStore
 
 # Common globals
 http_client = httpx.Client()
+# In memory only, pass a resolver with updater.media.MediaTypeCache to keep media types across runs
+media_types = MediaTypeResolver()
+
+# Articles waiting for the consumer of astream_articles
+STREAM_BUFFER = 32
 
-class Article(BaseModel):
+class Article(BaseXMLModel):
     id: uuid.UUID = Field(default_factory=uuid.uuid4)
     url: str
     title: str
     summary: Optional[str] = None
     content: Optional[Union[str, bytes]] = None
+    # SHA-256 of the body in content store, see updater.content
+    content_hash: Optional[str] = None
     mime_type: str
+    feed: Optional[str] = None
+    published: Optional[datetime] = None
 
-    def to_xml(self):
+    def load_content(self, store: Optional['ContentStore'] = None) -> Optional[Union[str, bytes]]:
+        """
+        Get body of the article, loading it from content store only when needed
 
-        content = f'<TITLE>{self.title}</TITLE>'
+        Args:
+            store: Content store, default updater.content.content_store if not provided
+
+        Returns:
+            Inline content if set, stored body if content_hash is set, None otherwise
+        """
+        if self.content is not None or self.content_hash is None:
+            return self.content
+        if store is None:
+            from updater.content import content_store as store
+        return store.get(self.content_hash)
+
+    def write_xml(self, out: XMLBuffer):
+        # Title and summary go into the prompt as they are in the feed
         if self.summary:
-            content += f'\n<SUMMARY>{self.summary}</SUMMARY>'
-        return f'<ARTICLE ID={self.id}\n' + content + '\n</ARTICLE>'
+            out.write(f'<ARTICLE ID={self.id}\n<TITLE>{self.title}</TITLE>\n<SUMMARY>{self.summary}</SUMMARY>\n</ARTICLE>')
+        else:
+            out.write(f'<ARTICLE ID={self.id}\n<TITLE>{self.title}</TITLE>\n</ARTICLE>')
 
 """
 
@@ -44,75 +84,400 @@ works only for robot allowed URLs (not for twitter for example)
 
 """
 
-def get_media_type(feed_url: str) -> Optional[str]:
+def get_media_type(feed_url: str, resolver: Optional[MediaTypeResolver] = None) -> Optional[str]:
+    """
+    Determine the media type of an RSS entry based on the entry URL
+
+    Known hosts are resolved by rules, others by cache or a HEAD request over the module-level http_client.
+
+    Args:
+        feed_url: URL of the RSS entry
+        resolver: Media type resolver, module-level media_types if not provided
+
+    Returns:
+        Optional[str]: Media type if detected, None otherwise
+    """
+    return (resolver or media_types).resolve(feed_url, http_client)
+
+
+async def aget_media_type(
+    url: str,
+    client: httpx.AsyncClient,
+    limiter: HostLimiter,
+    timeout: float = REQUEST_TIMEOUT,
+    resolver: Optional[MediaTypeResolver] = None
+) -> Optional[str]:
     """
-    Determine the media type of an RSS entry based on the feed URL and entry content.
-    
+    Async version of get_media_type using the shared client and limiter.
+
     Args:
-        feed_url: URL of the RSS feed
-        entry: feedparser entry object
-    
+        url: URL of the article
+        client: Shared async HTTP client
+        limiter: Limiter for in-flight requests
+        timeout: Timeout of the HEAD request in seconds
+        resolver: Media type resolver, module-level media_types if not provided
+
     Returns:
         Optional[str]: Media type if detected, None otherwise
     """
-    # Check for youtube content
-    if 'youtube.com' in feed_url:
-        return 'video/vnd.youtube.yt'
-
-    with httpx.Client() as h:
-        head = h.head(feed_url).headers
-        if 'Content-Type' in head:
-            return head['Content-Type'].split(';')[0]
-    
+    return await (resolver or media_types).aresolve(url, client, limiter, timeout)
+
+
+def _published(entry) -> Optional[datetime]:
+    """Get published date from the entry, falling back to updated date"""
+    if entry.get('published_parsed'):
+        return datetime.fromtimestamp(mktime(entry.published_parsed))
+    if entry.get('updated_parsed'):
+        return datetime.fromtimestamp(mktime(entry.updated_parsed))
     return None
 
-def new_articles(feeds: List[str], starting_point: datetime) -> List[Article]:
+
+def parse_records(content: bytes, headers: Optional[Dict[str, str]] = None) -> Optional[List[Tuple]]:
+    """
+    Parse raw feed into plain (title, url, summary, published, guid) tuples
+
+    Tuples are cheap to send back from a worker process, see parse_entries.
+
+    Args:
+        content: Body of the feed
+        headers: HTTP response headers, used by feedparser for encoding and base URL
+
+    Returns:
+        List of tuples of entries with a link, None if the feed could not be parsed
+    """
+    feed = feedparser.parse(content, response_headers=headers)
+
+    # Check if feed parsing was successful
+    if 'bozo_exception' in feed:
+        print(f"Warning: Error parsing feed {(headers or {}).get('content-location')}: {feed.bozo_exception}")
+        return None
+
+    return [
+        (entry.get('title', ''), entry.link, entry.get('summary'), _published(entry), entry.get('id'))
+        for entry in feed.entries
+        if hasattr(entry, 'link')
+    ]
+
+
+def _entries(records: List[Tuple]) -> List[FeedEntry]:
+    return [
+        FeedEntry(title=title, url=url, summary=summary, published=published, guid=guid)
+        for title, url, summary, published, guid in records
+    ]
+
+
+def parse_entries(content: bytes, headers: Optional[Dict[str, str]] = None) -> Optional[List[FeedEntry]]:
+    """
+    Parse raw feed into compact entry records
+
+    Args:
+        content: Body of the feed
+        headers: HTTP response headers, used by feedparser for encoding and base URL
+
+    Returns:
+        List of FeedEntry objects with a link, None if the feed could not be parsed
+    """
+    records = parse_records(content, headers)
+    return _entries(records) if records is not None else None
+
+
+def _client(max_connections: int = MAX_CONNECTIONS, timeout: float = REQUEST_TIMEOUT) -> httpx.AsyncClient:
+    """Create async HTTP client shared by all requests of a collection pass"""
+    return httpx.AsyncClient(
+        headers={'User-Agent': feedparser.USER_AGENT},
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout
+    )
+
+
+class _Pass:
+    """Shared resources and options of one collection pass"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        max_connections: int = MAX_CONNECTIONS,
+        max_per_host: int = MAX_PER_HOST,
+        timeout: float = REQUEST_TIMEOUT,
+        cache: Optional[FeedCache] = None,
+        resolver: Optional[MediaTypeResolver] = None,
+        state: Optional[FeedState] = None,
+        parser: Optional[Executor] = None
+    ):
+        self.client = client
+        self.limiter = HostLimiter(max_connections, max_per_host)
+        self.timeout = timeout
+        self.cache = cache
+        self.resolver = resolver
+        self.state = state
+        self.parser = parser
+
+    async def parse(self, content: bytes, headers: Dict[str, str]) -> Optional[List[FeedEntry]]:
+        """Parse feed in the parser executor, or inline if there is none"""
+        if self.parser is None:
+            return parse_entries(content, headers)
+        records = await asyncio.get_running_loop().run_in_executor(self.parser, parse_records, content, headers)
+        return _entries(records) if records is not None else None
+
+    async def fetch_entries(self, feed_url: str) -> Optional[List[FeedEntry]]:
+        """Fetch one feed with a conditional GET and parse it unless it has not changed"""
+        cached = self.cache.get(feed_url) if self.cache is not None else None
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        try:
+            response = await request(
+                self.client, self.limiter, 'GET', feed_url, self.timeout, headers=headers, follow_redirects=True
+            )
+            if response.status_code == 304 and cached is not None:
+                return cached.entries
+            response.raise_for_status()
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            print(f"Warning: Error fetching feed {feed_url}: {e!r}")
+            return None
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if cached is not None and cached.content_hash == content_hash:
+            entries = cached.entries
+        else:
+            response_headers = dict(response.headers)
+            response_headers['content-location'] = str(response.url)
+            entries = await self.parse(response.content, response_headers)
+            if entries is None:
+                return None
+
+        if self.cache is not None:
+            self.cache.put(feed_url, CachedFeed(
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+                content_hash=content_hash,
+                entries=entries
+            ))
+
+        return entries
+
+    async def new_entries(self, feed_url: str, starting_point: datetime) -> List[FeedEntry]:
+        """Entries of one feed newer than starting_point (and high-water mark) and not seen before"""
+        entries = await self.fetch_entries(feed_url)
+        if entries is None:
+            return []
+        return self.filter_entries(feed_url, entries, starting_point)
+
+    def filter_entries(self, feed_url: str, entries: List[FeedEntry], starting_point: datetime) -> List[FeedEntry]:
+        """Keep entries newer than starting_point (and high-water mark) and not seen before"""
+        cutoff = starting_point
+        if self.state is not None:
+            high_water = self.state.high_water(feed_url)
+            if high_water is not None:
+                cutoff = max(cutoff, high_water - HIGH_WATER_SLACK)
+
+        # Skip entries without date, older than cutoff or already seen
+        return [
+            entry for entry in entries
+            if entry.published is not None and entry.published > cutoff
+            and (self.state is None or self.state.is_new(entry_keys(entry)))
+        ]
+
+    async def article(self, feed_url: str, entry: FeedEntry) -> Optional[Article]:
+        """Resolve media type of entry and turn it into Article, None if it should be skipped"""
+        media_type = await aget_media_type(entry.url, self.client, self.limiter, self.timeout, self.resolver)
+        if media_type is None:
+            print(f"Warning: Unknown media type of {entry.url}, skipping")
+            return None
+
+        # Recording also drops entries which another feed emitted in the meantime
+        if self.state is not None and not self.state.record(feed_url, [entry]):
+            return None
+
+        return Article(
+            title=entry.title,
+            url=entry.url,
+            mime_type=media_type,
+            summary=entry.summary,
+            feed=feed_url,
+            published=entry.published
+        )
+
+    async def feed_articles(self, feed_url: str, starting_point: datetime) -> List[Article]:
+        """Get new entries of one feed, then resolve their media types concurrently"""
+        entries = await self.new_entries(feed_url, starting_point)
+        articles = await asyncio.gather(*(self.article(feed_url, entry) for entry in entries))
+        return [article for article in articles if article is not None]
+
+    async def stream_feed(self, feed_url: str, starting_point: datetime, emit: Callable[[Article], Awaitable[None]]):
+        """Emit articles of one feed as soon as their media type is known"""
+        entries = await self.new_entries(feed_url, starting_point)
+        tasks = [asyncio.ensure_future(self.article(feed_url, entry)) for entry in entries]
+        try:
+            for next_article in asyncio.as_completed(tasks):
+                article = await next_article
+                if article is not None:
+                    await emit(article)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def anew_articles(
+    feeds: List[str],
+    starting_point: datetime,
+    client: Optional[httpx.AsyncClient] = None,
+    max_connections: int = MAX_CONNECTIONS,
+    max_per_host: int = MAX_PER_HOST,
+    timeout: float = REQUEST_TIMEOUT,
+    cache: Optional[FeedCache] = None,
+    resolver: Optional[MediaTypeResolver] = None,
+    state: Optional[FeedState] = None,
+    dedup: Optional['Deduplicator'] = None,
+    parser: Optional[Executor] = None,
+    store: Optional['ArticleStore'] = None
+) -> List[Article]:
+    """
+    Concurrently check RSS feeds in feeds and return all entries which are new from starting_point
+
+    All feeds and media type checks share one HTTP client, so a pass takes roughly as long
+    as the slowest feed instead of the sum of all of them.
+
+    Args:
+        feeds: List of RSS feed URLs to check
+        starting_point: datetime object representing the cutoff point for new articles
+        client: Shared async HTTP client, a new one is created (and closed) if not provided
+        max_connections: Maximum number of in-flight requests
+        max_per_host: Maximum number of in-flight requests to a single host
+        timeout: Timeout of each request in seconds
+        cache: Feed cache for conditional GETs, feeds are always downloaded and parsed if not provided
+        resolver: Media type resolver, module-level media_types if not provided
+        state: Collection state, if provided only entries not returned by previous runs are returned
+        dedup: Near-duplicate filter (see updater.dedup), only the first article of each story is returned
+        parser: Executor parsing feeds, e.g. ProcessPoolExecutor() to parse large feeds on all cores;
+            feeds are parsed on the event loop thread if not provided
+        store: Article store (see updater.store) new articles are also written into
+
+    Returns:
+        List of Article objects that were published after the starting_point, in order of feeds
+    """
+    if client is None:
+        async with _client(max_connections, timeout) as client:
+            return await anew_articles(
+                feeds, starting_point, client,
+                max_connections=max_connections, max_per_host=max_per_host, timeout=timeout,
+                cache=cache, resolver=resolver, state=state, dedup=dedup, parser=parser, store=store
+            )
+
+    collection = _Pass(client, max_connections, max_per_host, timeout, cache, resolver, state, parser)
+    try:
+        results = await asyncio.gather(*(collection.feed_articles(feed_url, starting_point) for feed_url in feeds))
+    finally:
+        if state is not None:
+            state.save()
+    articles = [article for articles in results for article in articles]
+    if dedup is not None:
+        articles = dedup(articles)
+    if store is not None:
+        store.add(articles)
+    return articles
+
+
+async def astream_articles(
+    feeds: List[str],
+    starting_point: datetime,
+    client: Optional[httpx.AsyncClient] = None,
+    max_connections: int = MAX_CONNECTIONS,
+    max_per_host: int = MAX_PER_HOST,
+    timeout: float = REQUEST_TIMEOUT,
+    cache: Optional[FeedCache] = None,
+    resolver: Optional[MediaTypeResolver] = None,
+    state: Optional[FeedState] = None,
+    dedup: Optional['Deduplicator'] = None,
+    parser: Optional[Executor] = None,
+    store: Optional['ArticleStore'] = None,
+    buffer: int = STREAM_BUFFER
+) -> AsyncIterator[Article]:
+    """
+    Streaming version of anew_articles
+
+    Articles are yielded as soon as their feed is parsed and their media type is known, so
+    downstream processing can start before the slowest feed is done. At most buffer articles
+    are held ready, collection pauses while the consumer is behind.
+
+    Args:
+        Same as anew_articles
+        buffer: Maximum number of collected articles waiting for the consumer
+
+    Yields:
+        Article objects that were published after the starting_point, in order of completion
+    """
+    if client is None:
+        async with _client(max_connections, timeout) as client:
+            async for article in astream_articles(
+                feeds, starting_point, client,
+                max_connections=max_connections, max_per_host=max_per_host, timeout=timeout,
+                cache=cache, resolver=resolver, state=state, dedup=dedup, parser=parser, store=store, buffer=buffer
+            ):
+                yield article
+        return
+
+    collection = _Pass(client, max_connections, max_per_host, timeout, cache, resolver, state, parser)
+    # Queue itself is unbounded so the end marker always fits, slots bound the articles in it
+    queue = asyncio.Queue()
+    slots = asyncio.Semaphore(buffer)
+    done = object()
+
+    async def emit(article: Article):
+        if dedup is not None and dedup.add(article) is not None:
+            return
+        if store is not None:
+            store.add([article])
+        await slots.acquire()
+        queue.put_nowait(article)
+
+    producer = asyncio.ensure_future(
+        asyncio.gather(*(collection.stream_feed(feed_url, starting_point, emit) for feed_url in feeds))
+    )
+    producer.add_done_callback(lambda _: queue.put_nowait(done))
+    try:
+        while (article := await queue.get()) is not done:
+            slots.release()
+            yield article
+        # Re-raise unexpected errors of the producer
+        producer.result()
+    finally:
+        if not producer.done():
+            producer.cancel()
+            with suppress(asyncio.CancelledError):
+                await producer
+        if state is not None:
+            state.save()
+
+
+def _run(coro):
+    """Run coroutine to completion, also from inside a running event loop (e.g. Jupyter)"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def new_articles(feeds: List[str], starting_point: datetime, **kwargs) -> List[Article]:
     """
     Function will check RSS feeds in feeds and return all entries which are new from starting_point
 
+    Synchronous wrapper around anew_articles.
+
     Args:
         feeds: List of RSS feed URLs to check
         starting_point: datetime object representing the cutoff point for new articles
+        **kwargs: Options passed to anew_articles
 
     Returns:
-        List of RSSEntry objects that were published after the starting_point
+        List of Article objects that were published after the starting_point
     """
-    new_entries = []
-    
-    for feed_url in feeds:
-        feed = feedparser.parse(feed_url)
-            
-        # Check if feed parsing was successful
-        if 'bozo_exception' in feed:
-            print(f"Warning: Error parsing feed {feed_url}: {feed.bozo_exception}")
-            continue
-    
-        for entry in feed.entries:
-            # Get published date from the entry
-            if hasattr(entry, 'published_parsed'):
-                pub_date = datetime.fromtimestamp(mktime(entry.published_parsed))
-            elif hasattr(entry, 'updated_parsed'):
-                pub_date = datetime.fromtimestamp(mktime(entry.updated_parsed))
-            else:
-                continue  # Skip if no date available
-                    
-            # Check if article is newer than starting_point
-            if pub_date > starting_point:
-                if hasattr(entry, 'link'):
-                    # Determine media type based on feed URL and entry content
-                    media_type = get_media_type(entry.link)
-                    # Extract summary, handling potential missing field
-                    summary = None
-                    if hasattr(entry, 'summary'):
-                        summary = entry.summary
-                        
-                    # Create RSSEntry object
-                    rss_entry = Article(
-                        title=entry.title,
-                        url=entry.link,
-                        mime_type=media_type,
-                        summary=summary
-                    )
-                    new_entries.append(rss_entry)
-
-    return new_entries
+    return _run(anew_articles(feeds, starting_point, **kwargs))
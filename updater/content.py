@@ -0,0 +1,337 @@
+from typing import Optional, Union, List, Dict, Tuple
+
+import os
+import gzip
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import time
+from pathlib import Path
+from urllib.robotparser import RobotFileParser
+
+import httpx
+import feedparser
+
+from updater.cache import CACHE_DIR
+from updater.collect import Article, _run
+from updater.net import HostLimiter, REQUEST_TIMEOUT, request
+
+# Defaults for content fetching, more conservative than feed collection
+MAX_CONNECTIONS = 16
+MAX_PER_HOST = 2
+# Minimum delay between two requests to the same host in seconds
+POLITENESS_DELAY = 1.0
+# Bodies larger than this are not stored at all
+MAX_SIZE = 20 * 1024 * 1024
+# Bodies larger than this are streamed to a temporary file instead of memory
+MEMORY_LIMIT = 1024 * 1024
+# Media types of articles which are not downloaded
+SKIP_MEDIA_TYPES = ('video/', 'audio/')
+
+
+class ContentStore:
+    """
+    Compressed, content-addressed storage of article bodies
+
+    Bodies are stored gzipped under their SHA-256, so the same body is stored only once
+    whichever feed or article it comes from.
+    """
+
+    def __init__(self, root: Optional[Union[str, Path]] = None):
+        self.root = Path(root) if root is not None else CACHE_DIR / 'content'
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f'{digest}.gz'
+
+    def __contains__(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def _commit(self, digest: str, source) -> str:
+        """Compress source file object into store under digest, unless already stored"""
+        path = self.path(digest)
+        if path.exists():
+            return digest
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as compressed:
+                shutil.copyfileobj(source, compressed)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return digest
+
+    def put(self, data: bytes) -> str:
+        """
+        Store body
+
+        Args:
+            data: Body to store
+
+        Returns:
+            str: SHA-256 of the body
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self:
+            return digest
+        with tempfile.SpooledTemporaryFile() as source:
+            source.write(data)
+            source.seek(0)
+            return self._commit(digest, source)
+
+    def put_file(self, path: Union[str, Path], digest: Optional[str] = None) -> str:
+        """
+        Store body from file without loading it into memory
+
+        Args:
+            path: File with the body
+            digest: SHA-256 of the file if already known
+
+        Returns:
+            str: SHA-256 of the body
+        """
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+        with open(path, 'rb') as source:
+            return self._commit(digest, source)
+
+    def get(self, digest: str) -> bytes:
+        """Load body stored under digest, raises FileNotFoundError if not stored"""
+        with gzip.open(self.path(digest), 'rb') as f:
+            return f.read()
+
+    def open(self, digest: str):
+        """Open body stored under digest for streaming reads"""
+        return gzip.open(self.path(digest), 'rb')
+
+
+# Default store used by Article.load_content
+content_store = ContentStore()
+
+
+class _Hosts:
+    """robots.txt and politeness locks of hosts in one fetch run, they belong to its event loop"""
+
+    def __init__(self):
+        self.robots: Dict[str, asyncio.Future] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+
+class ContentFetcher:
+    """
+    Downloads article bodies into ContentStore
+
+    Requests are capped globally and per host, requests to one host are spaced by a
+    politeness delay, and robots.txt of every host is fetched once and respected.
+    """
+
+    def __init__(
+        self,
+        store: Optional[ContentStore] = None,
+        max_connections: int = MAX_CONNECTIONS,
+        max_per_host: int = MAX_PER_HOST,
+        delay: float = POLITENESS_DELAY,
+        max_size: int = MAX_SIZE,
+        memory_limit: int = MEMORY_LIMIT,
+        timeout: float = REQUEST_TIMEOUT,
+        user_agent: str = feedparser.USER_AGENT,
+        skip_media_types: Tuple[str, ...] = SKIP_MEDIA_TYPES
+    ):
+        self.store = store if store is not None else content_store
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.delay = delay
+        self.max_size = max_size
+        self.memory_limit = memory_limit
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.skip_media_types = skip_media_types
+
+        # Kept across runs, so a host is not hit again right after the previous run
+        self._next_request: Dict[str, float] = {}
+
+    async def _robots_parser(
+        self,
+        client: httpx.AsyncClient,
+        limiter: HostLimiter,
+        hosts: _Hosts,
+        url: httpx.URL
+    ) -> RobotFileParser:
+        """Fetch robots.txt of the origin of url, once per origin"""
+        origin = f'{url.scheme}://{url.netloc.decode()}'
+        if origin not in hosts.robots:
+            hosts.robots[origin] = asyncio.ensure_future(self._fetch_robots(client, limiter, origin))
+        return await hosts.robots[origin]
+
+    async def _fetch_robots(self, client: httpx.AsyncClient, limiter: HostLimiter, origin: str) -> RobotFileParser:
+        parser = RobotFileParser(f'{origin}/robots.txt')
+        try:
+            response = await request(client, limiter, 'GET', parser.url, self.timeout, follow_redirects=True)
+        except (httpx.HTTPError, asyncio.TimeoutError):
+            # Same as RobotFileParser.read, unreachable robots.txt allows everything
+            parser.allow_all = True
+            return parser
+
+        # Same status handling as RobotFileParser.read
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif response.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        return parser
+
+    async def _polite(self, hosts: _Hosts, host: str):
+        """Wait until the next request to host is allowed"""
+        lock = hosts.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            wait = self._next_request.get(host, now) - now
+            self._next_request[host] = max(now, self._next_request.get(host, now)) + self.delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _download(self, client: httpx.AsyncClient, url: str) -> Optional[Tuple[str, Union[bytes, str]]]:
+        """
+        Stream body of url, spilling it to a temporary file when it is large
+
+        Returns:
+            SHA-256 of the body and the body, or the path of the temporary file the caller has to delete;
+            None if the body is too large
+        """
+        sha = hashlib.sha256()
+        size = 0
+        buffer = bytearray()
+        spill = None
+        try:
+            async with client.stream('GET', url, timeout=self.timeout, follow_redirects=True) as response:
+                response.raise_for_status()
+                length = response.headers.get('Content-Length')
+                if length and length.isdigit() and int(length) > self.max_size:
+                    print(f"Warning: Content of {url} is too large ({length} bytes), skipping")
+                    return None
+
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > self.max_size:
+                        print(f"Warning: Content of {url} is larger than {self.max_size} bytes, skipping")
+                        return None
+                    sha.update(chunk)
+                    if spill is not None:
+                        spill.write(chunk)
+                    else:
+                        buffer += chunk
+                        if len(buffer) > self.memory_limit:
+                            spill = tempfile.NamedTemporaryFile(delete=False)
+                            spill.write(buffer)
+                            buffer = bytearray()
+
+            if spill is None:
+                return sha.hexdigest(), bytes(buffer)
+            spill.close()
+            path, spill = spill.name, None
+            return sha.hexdigest(), path
+        finally:
+            if spill is not None:
+                spill.close()
+                os.unlink(spill.name)
+
+    async def _store(self, digest: str, body: Union[bytes, str]) -> str:
+        """Compress body into store on a worker thread, so it does not block other downloads"""
+        if isinstance(body, bytes):
+            return await asyncio.to_thread(self.store.put, body)
+        try:
+            return await asyncio.to_thread(self.store.put_file, body, digest)
+        finally:
+            os.unlink(body)
+
+    async def fetch(
+        self,
+        url: str,
+        client: httpx.AsyncClient,
+        limiter: HostLimiter,
+        hosts: Optional[_Hosts] = None
+    ) -> Optional[str]:
+        """
+        Download body of url into store
+
+        Args:
+            url: URL to download
+            client: Shared async HTTP client
+            limiter: Limiter for in-flight requests
+            hosts: robots.txt and politeness locks shared by the fetches of one run, own ones if not provided
+
+        Returns:
+            Optional[str]: SHA-256 of the stored body, None if not allowed or failed
+        """
+        hosts = hosts if hosts is not None else _Hosts()
+        parsed = httpx.URL(url)
+        robots = await self._robots_parser(client, limiter, hosts, parsed)
+        if not robots.can_fetch(self.user_agent, url):
+            print(f"Warning: {url} is disallowed by robots.txt, skipping")
+            return None
+
+        await self._polite(hosts, parsed.host)
+        try:
+            async with limiter.slot(url):
+                downloaded = await asyncio.wait_for(self._download(client, url), self.timeout)
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            print(f"Warning: Error fetching content of {url}: {e!r}")
+            return None
+
+        if downloaded is None:
+            return None
+        return await self._store(*downloaded)
+
+    async def afetch(self, articles: List[Article], client: Optional[httpx.AsyncClient] = None) -> List[Article]:
+        """
+        Download bodies of articles and set their content_hash
+
+        Args:
+            articles: Articles to download, articles with content_hash or skipped media type are left as they are
+            client: Shared async HTTP client, a new one is created (and closed) if not provided
+
+        Returns:
+            The same list of articles
+        """
+        if client is None:
+            async with httpx.AsyncClient(
+                headers={'User-Agent': self.user_agent},
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                timeout=self.timeout
+            ) as client:
+                return await self.afetch(articles, client)
+
+        limiter = HostLimiter(self.max_connections, self.max_per_host)
+        hosts = _Hosts()
+        pending = [
+            article for article in articles
+            if article.content_hash is None and not article.mime_type.startswith(self.skip_media_types)
+        ]
+        digests = await asyncio.gather(*(self.fetch(article.url, client, limiter, hosts) for article in pending))
+        for article, digest in zip(pending, digests):
+            article.content_hash = digest
+        return articles
+
+
+def fetch_content(articles: List[Article], **kwargs) -> List[Article]:
+    """
+    Download bodies of articles into content store and set their content_hash
+
+    Synchronous wrapper around ContentFetcher.afetch.
+
+    Args:
+        articles: Articles to download
+        **kwargs: Options passed to ContentFetcher
+
+    Returns:
+        The same list of articles
+    """
+    return _run(ContentFetcher(**kwargs).afetch(articles))
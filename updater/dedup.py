@@ -0,0 +1,148 @@
+from typing import Optional, List, Dict, Iterable
+
+import re
+import uuid
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from updater.collect import Article
+
+_TAGS = re.compile(r'<[^>]+>')
+_WORDS = re.compile(r'\w+')
+
+# Only the beginning of long bodies is used for signatures
+CONTENT_CHARS = 20_000
+
+
+def article_text(article: Article, use_content: bool = True) -> str:
+    """Plain text of title, summary and (beginning of) content of the article"""
+    parts = [article.title, article.summary or '']
+    if use_content:
+        content = article.load_content()
+        if isinstance(content, bytes):
+            content = content[:4 * CONTENT_CHARS].decode('utf-8', errors='ignore')
+        if content:
+            parts.append(content[:CONTENT_CHARS])
+    return _TAGS.sub(' ', '\n'.join(parts))
+
+
+class Deduplicator:
+    """
+    Near-duplicate article suppression with MinHash signatures and an LSH index
+
+    Each article is reduced to a MinHash signature of its word shingles. The signature is split
+    into bands, and articles sharing any band are candidates; a candidate is a duplicate when the
+    estimated Jaccard similarity reaches threshold. Only kept articles are indexed, so the index
+    grows with unique stories and each check costs roughly the same however many were seen.
+
+    The index is kept across calls (e.g. between new_articles runs) until reset().
+
+    Counters in stats:
+        articles: articles checked
+        removed: articles dropped as duplicates
+        chars: prompt volume (length of to_xml) of checked articles
+        removed_chars: prompt volume of dropped articles
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle: int = 3,
+        use_content: bool = True,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError('num_perm must be divisible by bands')
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+        self.use_content = use_content
+
+        rng = np.random.default_rng(seed)
+        # Odd multipliers for multiply-shift hashing
+        self._a = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64, endpoint=True)
+
+        self.stats = Counter()
+        self.reset()
+
+    def reset(self):
+        """Forget all indexed articles"""
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+        self._kept: List[uuid.UUID] = []
+        # Representative ID -> IDs of its dropped duplicates
+        self.groups: Dict[uuid.UUID, List[uuid.UUID]] = {}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of text, None if text has no words"""
+        words = _WORDS.findall(text.lower())
+        if not words:
+            return None
+        size = min(self.shingle, len(words))
+        shingles = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # High bits of (a * h + b) mod 2^64 for every permutation and shingle, minimum per permutation
+        return ((np.outer(self._a, hashes) + self._b[:, None]) >> np.uint64(32)).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, article: Article) -> Optional[uuid.UUID]:
+        """
+        Check article against indexed articles and index it if it is not a duplicate
+
+        Args:
+            article: Article to check
+
+        Returns:
+            ID of the kept article it duplicates, None if article is kept
+        """
+        self.stats['articles'] += 1
+        size = len(article.to_xml())
+        self.stats['chars'] += size
+
+        signature = self.signature(article_text(article, self.use_content))
+        if signature is None:
+            return None
+
+        keys = self._band_keys(signature)
+        candidates = {index for band, key in enumerate(keys) for index in self._buckets[band].get(key, ())}
+        for index in sorted(candidates):
+            if np.mean(self._signatures[index] == signature) >= self.threshold:
+                representative = self._kept[index]
+                self.groups.setdefault(representative, []).append(article.id)
+                self.stats['removed'] += 1
+                self.stats['removed_chars'] += size
+                return representative
+
+        index = len(self._kept)
+        self._kept.append(article.id)
+        self._signatures.append(signature)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(index)
+        return None
+
+    def __call__(self, articles: Iterable[Article]) -> List[Article]:
+        """
+        Drop near-duplicates, keeping the first article of every group
+
+        Args:
+            articles: Articles to deduplicate
+
+        Returns:
+            List of kept articles in original order
+        """
+        return [article for article in articles if self.add(article) is None]
+
+    @property
+    def removed_ratio(self) -> float:
+        """Share of prompt volume removed"""
+        return self.stats['removed_chars'] / self.stats['chars'] if self.stats['chars'] else 0.0
@@ -0,0 +1,183 @@
+from typing import Optional, List, Tuple
+
+import re
+import time
+import asyncio
+from collections import Counter
+
+import httpx
+
+from updater.cache import SQLiteCache
+from updater.net import HostLimiter, REQUEST_TIMEOUT, request
+
+# Known URL patterns which do not need a network round trip, first match wins
+MEDIA_TYPE_RULES: List[Tuple[str, str]] = [
+    (r'^https?://([a-z0-9-]+\.)?youtube\.com/', 'video/vnd.youtube.yt'),
+    (r'^https?://youtu\.be/', 'video/vnd.youtube.yt'),
+    (r'^https?://(export\.)?arxiv\.org/pdf/', 'application/pdf'),
+    (r'^https?://(export\.)?arxiv\.org/(abs|html)/', 'text/html'),
+    (r'^https?://[^?#]+\.pdf([?#].*)?$', 'application/pdf'),
+]
+
+# How long resolved media types are trusted
+MEDIA_TYPE_TTL = 30 * 24 * 3600
+# Asks for the first byte only when a server rejects HEAD and a GET is needed
+RANGE_HEADERS = {'Range': 'bytes=0-0'}
+
+
+class MediaTypeCache(SQLiteCache):
+    """Persistent per-URL cache of resolved media types"""
+    FILENAME = 'media_types.sqlite'
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS media_types (
+        url TEXT PRIMARY KEY,
+        mime_type TEXT NOT NULL,
+        checked REAL NOT NULL
+    );
+    """
+
+    def get(self, url: str, ttl: float = MEDIA_TYPE_TTL) -> Optional[str]:
+        row = self._db.execute(
+            'SELECT mime_type FROM media_types WHERE url = ? AND checked > ?', (url, time.time() - ttl)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, url: str, mime_type: str):
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO media_types (url, mime_type, checked) VALUES (?, ?, ?)',
+                (url, mime_type, time.time())
+            )
+
+    def purge(self, ttl: float = MEDIA_TYPE_TTL) -> int:
+        """
+        Delete media types older than ttl
+
+        Args:
+            ttl: Age in seconds after which entries are not trusted anymore
+
+        Returns:
+            int: Number of deleted entries
+        """
+        with self._db:
+            cursor = self._db.execute('DELETE FROM media_types WHERE checked <= ?', (time.time() - ttl,))
+        return cursor.rowcount
+
+
+class MediaTypeResolver:
+    """
+    Resolves media type of an URL by rule table, then by cache, and only then by HEAD request
+
+    Servers rejecting HEAD (e.g. 405 or 403) are asked again by a GET of the first byte,
+    its body is not downloaded.
+
+    Counters in stats:
+        rule: resolved by MEDIA_TYPE_RULES
+        cache: resolved from cache
+        network: resolved by HEAD request
+        fallback: resolved by GET after HEAD was rejected
+        error: request failed, was not successful or did not return Content-Type
+    """
+
+    def __init__(
+        self,
+        rules: List[Tuple[str, str]] = MEDIA_TYPE_RULES,
+        cache: Optional[MediaTypeCache] = None,
+        ttl: float = MEDIA_TYPE_TTL
+    ):
+        self.rules = [(re.compile(pattern, re.IGNORECASE), mime_type) for pattern, mime_type in rules]
+        self.cache = cache
+        self.ttl = ttl
+        self.stats = Counter()
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Resolve media type without network, None if unknown"""
+        for pattern, mime_type in self.rules:
+            if pattern.search(url):
+                self.stats['rule'] += 1
+                return mime_type
+
+        if self.cache is not None:
+            mime_type = self.cache.get(url, self.ttl)
+            if mime_type is not None:
+                self.stats['cache'] += 1
+                return mime_type
+
+        return None
+
+    @staticmethod
+    def _resolved(response: httpx.Response) -> bool:
+        # Error pages and redirects carry their own Content-Type, usually text/html
+        return response.is_success and 'Content-Type' in response.headers
+
+    def _store(self, url: str, response: httpx.Response, counter: str = 'network') -> Optional[str]:
+        if not self._resolved(response):
+            print(f"Warning: Error getting media type of {url}: HTTP {response.status_code}")
+            self.stats['error'] += 1
+            return None
+
+        mime_type = response.headers['Content-Type'].split(';')[0].strip()
+        self.stats[counter] += 1
+        if self.cache is not None:
+            self.cache.put(url, mime_type)
+        return mime_type
+
+    def resolve(self, url: str, client: httpx.Client, timeout: float = REQUEST_TIMEOUT) -> Optional[str]:
+        """
+        Resolve media type, HEAD request goes over the pooled client
+
+        Args:
+            url: URL of the article
+            client: Shared HTTP client
+            timeout: Timeout of the HEAD request in seconds
+
+        Returns:
+            Optional[str]: Media type if detected, None otherwise
+        """
+        mime_type = self.lookup(url)
+        if mime_type is not None:
+            return mime_type
+
+        try:
+            response = client.head(url, timeout=timeout, follow_redirects=True)
+            if self._resolved(response):
+                return self._store(url, response)
+            with client.stream('GET', url, headers=RANGE_HEADERS, timeout=timeout, follow_redirects=True) as response:
+                return self._store(url, response, 'fallback')
+        except httpx.HTTPError as e:
+            print(f"Warning: Error getting media type of {url}: {e!r}")
+            self.stats['error'] += 1
+            return None
+
+    async def aresolve(
+        self,
+        url: str,
+        client: httpx.AsyncClient,
+        limiter: HostLimiter,
+        timeout: float = REQUEST_TIMEOUT
+    ) -> Optional[str]:
+        """Async version of resolve, HEAD request goes over the shared async client within limiter"""
+        mime_type = self.lookup(url)
+        if mime_type is not None:
+            return mime_type
+
+        async def first_byte() -> httpx.Response:
+            async with client.stream('GET', url, headers=RANGE_HEADERS, timeout=timeout, follow_redirects=True) as response:
+                return response
+
+        try:
+            response = await request(client, limiter, 'HEAD', url, timeout, follow_redirects=True)
+            if self._resolved(response):
+                return self._store(url, response)
+            async with limiter.slot(url):
+                response = await asyncio.wait_for(first_byte(), timeout)
+            return self._store(url, response, 'fallback')
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            print(f"Warning: Error getting media type of {url}: {e!r}")
+            self.stats['error'] += 1
+            return None
+
+    @property
+    def saved(self) -> int:
+        """Number of network round trips saved by rules and cache"""
+        return self.stats['rule'] + self.stats['cache']
@@ -0,0 +1,47 @@
+from typing import Dict
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+
+# Defaults for concurrent requests
+MAX_CONNECTIONS = 64
+MAX_PER_HOST = 4
+REQUEST_TIMEOUT = 15.0
+
+
+class HostLimiter:
+    """
+    Caps the number of in-flight requests globally and per host.
+
+    Semaphores are created lazily, so the limiter must be used from a single event loop.
+    """
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS, max_per_host: int = MAX_PER_HOST):
+        self.max_per_host = max_per_host
+        self._global = asyncio.Semaphore(max_connections)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host = httpx.URL(url).host
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+        # Wait for the host first so a busy host does not hold global slots
+        async with self._hosts[host]:
+            async with self._global:
+                yield
+
+
+async def request(
+    client: httpx.AsyncClient,
+    limiter: HostLimiter,
+    method: str,
+    url: str,
+    timeout: float = REQUEST_TIMEOUT,
+    **kwargs
+) -> httpx.Response:
+    """Send a single request within the limiter and a hard per-request deadline"""
+    async with limiter.slot(url):
+        return await asyncio.wait_for(client.request(method, url, timeout=timeout, **kwargs), timeout)
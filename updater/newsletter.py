@@ -0,0 +1,187 @@
+"""
+Newsletter generation graph
+
+Plans the newsletter once, then writes every planned section in its own node (fan-out with
+Send) and assembles the sections into one Markdown document. Sections are written in
+parallel, so the latency of the whole newsletter follows the slowest section.
+
+    graph.invoke({'format': newsletter, 'articles': articles})['document']
+"""
+from typing import Annotated, TypedDict, Optional, List, Callable
+
+import operator
+from functools import lru_cache
+
+from pydantic import BaseModel, Field
+from langchain_core.language_models import BaseChatModel
+
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
+
+from updater.collect import Article
+from updater.packing import pack_articles
+from updater.utils import to_xml_many
+
+PLANNER_MODEL = 'gemini-1.5-pro-002'
+WRITER_MODEL = 'gemini-1.5-flash-002'
+# Sections written at the same time by one run, protects the model quota
+MAX_CONCURRENT_SECTIONS = 4
+# Token budget of articles in the planning prompt
+PLAN_BUDGET = 500_000
+
+
+class ArticlePlan(BaseModel):
+    ids: List[str] = Field(description='List of IDs of articles to use')
+
+
+class Section(BaseModel):
+    title: str
+    description: Optional[str] = None
+    literaly: bool = True
+
+
+class Format(BaseModel):
+    topic: str
+    audience: str
+    description: str
+    sections: List[Section]
+
+    def to_xml(self) -> str:
+
+        description = f'<TOPIC>{self.topic}</TOPIC>\n<AUDIENCE>{self.audience}</AUDIENCE>\n<DESCRIPTION>{self.description}</DESCRIPTION>'
+
+        description += '<SECTIONS>\n'
+        for section in self.sections:
+            description += f'<SECTION><TITLE>{section.title}</TITLE><DESCRIPTION>{section.description}</DESCRIPTION>'
+            if not section.literaly:
+                description += '<INSTRUCTION>Use this as a guidline to create multiple sections as described</INSTRUCTION>'
+            description += '</SECTION>'
+        description += '\n</SECTIONS>'
+
+        return '<FORMAT>\n' + description + '\n</FORMAT>'
+
+
+class SectionPlan(BaseModel):
+    title: str = Field(description='Title of the section')
+    plan: str = Field(description='How to create content of the section')
+    ids: List[str] = Field(default=[], description='List of IDs of articles to use in the section')
+
+
+class NewsletterPlan(BaseModel):
+    sections: List[SectionPlan] = Field(description='Sections of the newsletter in order')
+
+
+class SectionDraft(BaseModel):
+    index: int
+    title: str
+    text: str
+
+
+class NewsletterState(TypedDict, total=False):
+    format: Format
+    articles: List[Article]
+    plan: NewsletterPlan
+    # Written by parallel section nodes, in order of completion
+    sections: Annotated[List[SectionDraft], operator.add]
+    document: str
+
+
+class SectionState(TypedDict):
+    format: Format
+    index: int
+    section: SectionPlan
+    articles: List[Article]
+
+
+@lru_cache
+def _vertex(model: str) -> BaseChatModel:
+    from langchain_google_vertexai import ChatVertexAI
+    return ChatVertexAI(model=model)
+
+
+def build_graph(
+    planner: Optional[BaseChatModel] = None,
+    writer: Optional[BaseChatModel] = None,
+    max_concurrent_sections: int = MAX_CONCURRENT_SECTIONS,
+    plan_budget: int = PLAN_BUDGET
+):
+    """
+    Build the newsletter graph
+
+    Models are created on first use, so the graph can be imported without cloud credentials.
+
+    Args:
+        planner: Chat model planning the sections, ChatVertexAI(PLANNER_MODEL) if not provided
+        writer: Chat model writing a section, ChatVertexAI(WRITER_MODEL) if not provided
+        max_concurrent_sections: Maximum number of sections written at the same time by one run,
+            default max_concurrency of its config
+        plan_budget: Maximum number of tokens of articles in the planning prompt
+
+    Returns:
+        Compiled graph taking format and articles and returning document
+    """
+    def model(given: Optional[BaseChatModel], name: str) -> Callable[[], BaseChatModel]:
+        return lambda: given if given is not None else _vertex(name)
+
+    get_planner = model(planner, PLANNER_MODEL)
+    get_writer = model(writer, WRITER_MODEL)
+
+    def plan(state: NewsletterState):
+        # Server and JSON runs pass plain dicts, later nodes get the validated models from the update
+        newsletter = Format.model_validate(state['format'])
+        articles = [Article.model_validate(article) for article in state['articles']]
+        prompt = f"""Create outline of document with following specifications: {newsletter.to_xml()}
+
+{pack_articles(articles, budget=plan_budget).to_xml()}
+
+Respond with list of sections, each section with plan how to create content for it and IDs of articles to use.
+"""
+        response = get_planner().with_structured_output(NewsletterPlan, method='json_mode').invoke(prompt)
+        return {'plan': response, 'format': newsletter, 'articles': articles}
+
+    def fan_out(state: NewsletterState):
+        if not state['plan'].sections:
+            return 'assemble'
+        by_id = {str(article.id): article for article in state['articles']}
+        return [
+            Send('write_section', {
+                'format': state['format'],
+                'index': index,
+                'section': section,
+                'articles': [by_id[id] for id in section.ids if id in by_id]
+            })
+            for index, section in enumerate(state['plan'].sections)
+        ]
+
+    def write_section(state: SectionState):
+        section = state['section']
+        prompt = f"""Write section of the newsletter with following specifications: {state['format'].to_xml()}
+
+<SECTION><TITLE>{section.title}</TITLE><PLAN>{section.plan}</PLAN></SECTION>
+
+{to_xml_many(state['articles'], tag='ARTICLES')}
+
+Respond only with text of the section in Markdown, without the title.
+"""
+        response = get_writer().invoke(prompt)
+        return {'sections': [SectionDraft(index=state['index'], title=section.title, text=response.text())]}
+
+    def assemble(state: NewsletterState):
+        sections = sorted(state.get('sections', []), key=lambda draft: draft.index)
+        return {'document': '\n\n'.join(f'## {draft.title}\n\n{draft.text.strip()}' for draft in sections)}
+
+    builder = StateGraph(NewsletterState)
+    builder.add_node('plan', plan)
+    builder.add_node('write_section', write_section)
+    builder.add_node('assemble', assemble)
+
+    builder.add_edge(START, 'plan')
+    builder.add_conditional_edges('plan', fan_out, ['write_section', 'assemble'])
+    builder.add_edge('write_section', 'assemble')
+    builder.add_edge('assemble', END)
+
+    # Limit of every run on its own, not shared by concurrent runs of the compiled graph
+    return builder.compile().with_config(max_concurrency=max_concurrent_sections)
+
+
+graph = build_graph()
@@ -0,0 +1,202 @@
+from typing import Optional, List, Dict, Callable
+
+import math
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+
+from pydantic import BaseModel
+
+from updater.cache import SQLiteCache
+from updater.collect import Article
+from updater.utils import to_xml_many
+
+# Articles lose half of their recency score every RECENCY_HALF_LIFE
+RECENCY_HALF_LIFE = timedelta(days=7)
+# Summaries are not truncated below this many tokens, the article is left out instead
+MIN_SUMMARY_TOKENS = 32
+
+
+def approximate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) when no tokenizer is available"""
+    return math.ceil(len(text) / 4)
+
+
+# Tokens of the ID attribute of article XML, a UUID has fixed width so it is not counted per article
+ID_TOKENS = approximate_tokens(f' ID={uuid.UUID(int=0)}')
+
+
+class TokenCountCache(SQLiteCache):
+    """Persistent token counts keyed by tokenizer name and SHA-256 of the text"""
+    FILENAME = 'tokens.sqlite'
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tokens (
+        tokenizer TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (tokenizer, hash)
+    ) WITHOUT ROWID;
+    """
+
+    def get(self, tokenizer: str, digest: str) -> Optional[int]:
+        row = self._db.execute('SELECT count FROM tokens WHERE tokenizer = ? AND hash = ?', (tokenizer, digest)).fetchone()
+        return row[0] if row else None
+
+    def put(self, tokenizer: str, digest: str, count: int):
+        with self._db:
+            self._db.execute('INSERT OR REPLACE INTO tokens (tokenizer, hash, count) VALUES (?, ?, ?)', (tokenizer, digest, count))
+
+
+class TokenCounter:
+    """
+    Counts tokens of texts, remembering counts by content hash
+
+    Args:
+        count: Function counting tokens of a text, e.g. ChatVertexAI(...).get_num_tokens
+        name: Name of the tokenizer, counts of different tokenizers are cached separately
+        cache: Persistent cache, counts are only kept in memory if not provided
+        id_tokens: Tokens of the ID attribute of article XML with this tokenizer
+    """
+
+    def __init__(
+        self,
+        count: Callable[[str], int] = approximate_tokens,
+        name: str = 'approximate',
+        cache: Optional[TokenCountCache] = None,
+        id_tokens: int = ID_TOKENS
+    ):
+        self._count = count
+        self.name = name
+        self.cache = cache
+        self.id_tokens = id_tokens
+        self._memory: Dict[str, int] = {}
+
+    def __call__(self, text: str) -> int:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        count = self._memory.get(digest)
+        if count is None and self.cache is not None:
+            count = self.cache.get(self.name, digest)
+        if count is None:
+            count = self._count(text)
+            if self.cache is not None:
+                self.cache.put(self.name, digest, count)
+        self._memory[digest] = count
+        return count
+
+    def article(self, article: Article) -> int:
+        """
+        Tokens of XML of the article
+
+        IDs are new on every collection run, so the text is counted (and cached) without the ID
+        attribute and id_tokens is added for it.
+        """
+        return self(article.to_xml().replace(f' ID={article.id}', '', 1)) + self.id_tokens
+
+
+class PackedArticles(BaseModel):
+    """Articles selected to fit a token budget"""
+    articles: List[Article]
+    tokens: int
+    budget: int
+    # IDs of articles included with shortened summary
+    truncated: List[uuid.UUID] = []
+    # Number of articles left out
+    dropped: int = 0
+    tag: Optional[str] = 'ARTICLES'
+
+    def to_xml(self) -> str:
+        return to_xml_many(self.articles, tag=self.tag)
+
+
+def recency(article: Article, now: datetime, half_life: timedelta = RECENCY_HALF_LIFE) -> float:
+    """Recency score in (0, 1], 1 for articles published now or without publication time"""
+    if article.published is None:
+        return 1.0
+    age = max((now - article.published) / half_life, 0.0)
+    return 0.5 ** age
+
+
+def _truncate(article: Article, tokens: int, counter: TokenCounter) -> Optional[Article]:
+    """Copy of article with summary shortened to fit tokens, None if it does not fit"""
+    summary = article.summary or ''
+    bare = counter.article(article.model_copy(update={'summary': None}))
+    # Shorten proportionally and re-check, token density of a prefix is close to the whole
+    for _ in range(5):
+        available = tokens - bare
+        if available < MIN_SUMMARY_TOKENS:
+            return None
+        ratio = available / max(counter(summary), 1)
+        summary = summary[:int(len(summary) * min(ratio, 1.0) * 0.95)].rsplit(' ', 1)[0] + '...'
+        candidate = article.model_copy(update={'summary': summary})
+        if counter.article(candidate) <= tokens:
+            return candidate
+    return None
+
+
+def pack_articles(
+    articles: List[Article],
+    budget: int,
+    relevance: Optional[Callable[[Article], float]] = None,
+    counter: Optional[TokenCounter] = None,
+    now: Optional[datetime] = None,
+    half_life: timedelta = RECENCY_HALF_LIFE,
+    recency_weight: float = 1.0,
+    tag: Optional[str] = 'ARTICLES'
+) -> PackedArticles:
+    """
+    Select articles for a prompt within token budget
+
+    Articles are ranked by relevance plus weighted recency and added greedily; an article which
+    does not fit is added with a shortened summary if at least MIN_SUMMARY_TOKENS of it fit.
+
+    Args:
+        articles: Candidate articles
+        budget: Maximum number of tokens of the packed XML
+        relevance: Function scoring articles, higher is more relevant; only recency is used if not provided
+        counter: Token counter, approximate counter without persistent cache if not provided
+        now: Time recency is computed against, current time if not provided
+        half_life: Age at which recency score halves
+        recency_weight: Weight of recency score against relevance
+        tag: Tag wrapping packed articles
+
+    Returns:
+        PackedArticles with selected articles in original order
+    """
+    counter = counter or TokenCounter()
+    now = now or datetime.now()
+
+    def score(article: Article) -> float:
+        value = recency_weight * recency(article, now, half_life)
+        if relevance is not None:
+            value += relevance(article)
+        return value
+
+    used = counter(f'<{tag}></{tag}>') if tag else 0
+    selected: Dict[uuid.UUID, Article] = {}
+    truncated = []
+
+    for article in sorted(articles, key=score, reverse=True):
+        remaining = budget - used
+        if remaining <= 0:
+            break
+
+        tokens = counter.article(article)
+        if tokens > remaining:
+            article = _truncate(article, remaining, counter) if article.summary else None
+            if article is None:
+                continue
+            tokens = counter.article(article)
+            truncated.append(article.id)
+
+        selected[article.id] = article
+        used += tokens
+
+    packed = [selected[article.id] for article in articles if article.id in selected]
+    return PackedArticles(
+        articles=packed,
+        tokens=used,
+        budget=budget,
+        truncated=truncated,
+        dropped=len(articles) - len(packed),
+        tag=tag
+    )
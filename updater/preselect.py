@@ -0,0 +1,264 @@
+from typing import Optional, List, Dict, Callable, Sequence, Tuple
+
+import re
+import math
+import hashlib
+
+import numpy as np
+from pydantic import BaseModel
+
+from updater.cache import SQLiteCache
+from updater.collect import Article
+
+# Function embedding a batch of texts, e.g. VertexAIEmbeddings(...).embed_documents
+Embed = Callable[[List[str]], Sequence[Sequence[float]]]
+
+_TAGS = re.compile(r'<[^>]+>')
+_WORDS = re.compile(r'\w+')
+
+EMBEDDING_BATCH = 64
+
+
+def embedding_text(article: Article) -> str:
+    """Title and summary of the article as embedded for preselection"""
+    return _TAGS.sub(' ', f'{article.title}\n{article.summary or ""}')
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder using the hashing trick over words and word pairs
+
+    No model or network is needed, so it is the default and suits tests. Similarity reflects
+    shared vocabulary only, use a real embedding model for semantic ranking.
+
+    Args:
+        dim: Dimension of the embeddings
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORDS.findall(text.lower())
+        return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+                vectors[row, digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        return vectors
+
+
+class EmbeddingCache(SQLiteCache):
+    """Persistent embeddings keyed by model name and SHA-256 of the text, stored as float32 blobs"""
+    FILENAME = 'embeddings.sqlite'
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        model TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        vector BLOB NOT NULL,
+        PRIMARY KEY (model, hash)
+    ) WITHOUT ROWID;
+    """
+
+    def get_many(self, model: str, digests: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        # Stay below SQLite limit of host parameters
+        for start in range(0, len(digests), 500):
+            chunk = digests[start:start + 500]
+            rows = self._db.execute(
+                f'SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({",".join("?" * len(chunk))})',
+                (model, *chunk)
+            )
+            found.update((digest, np.frombuffer(vector, dtype=np.float32)) for digest, vector in rows)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]):
+        with self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)',
+                [(model, digest, np.asarray(vector, dtype=np.float32).tobytes()) for digest, vector in vectors.items()]
+            )
+
+
+class Embeddings:
+    """
+    Embeds texts in batches, remembering embeddings by content hash
+
+    Args:
+        embed: Function embedding a batch of texts, local HashingEmbedder if not provided
+        name: Name of the model, embeddings of different models are cached separately
+        cache: Persistent cache, embeddings are only kept in memory if not provided
+        batch_size: Number of texts per call of embed
+    """
+
+    def __init__(
+        self,
+        embed: Optional[Embed] = None,
+        name: Optional[str] = None,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = EMBEDDING_BATCH
+    ):
+        self._embed = embed or HashingEmbedder()
+        self.name = name or getattr(self._embed, 'name', 'default')
+        self.cache = cache
+        self.batch_size = batch_size
+        self._memory: Dict[str, np.ndarray] = {}
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts, calling the model only for texts not seen before
+
+        Returns:
+            Matrix with one L2-normalized float32 row per text
+        """
+        digests = [hashlib.sha256(text.encode()).hexdigest() for text in texts]
+
+        missing = list(dict.fromkeys(digest for digest in digests if digest not in self._memory))
+        if missing and self.cache is not None:
+            self._memory.update(self.cache.get_many(self.name, missing))
+            missing = [digest for digest in missing if digest not in self._memory]
+
+        if missing:
+            text_of = dict(zip(digests, texts))
+            computed = {}
+            for start in range(0, len(missing), self.batch_size):
+                batch = missing[start:start + self.batch_size]
+                vectors = np.asarray(self._embed([text_of[digest] for digest in batch]), dtype=np.float32)
+                computed.update(zip(batch, vectors))
+            if self.cache is not None:
+                self.cache.put_many(self.name, computed)
+            self._memory.update(computed)
+
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return _normalize(np.stack([self._memory[digest] for digest in digests]))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def cluster(vectors: np.ndarray, clusters: int, iterations: int = 20, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical k-means over L2-normalized vectors
+
+    Centroids are initialized with k-means++ from a seeded generator, so the result is deterministic.
+
+    Args:
+        vectors: Matrix of normalized row vectors
+        clusters: Number of clusters, at most the number of rows
+        iterations: Maximum number of iterations
+        seed: Seed of the initialization
+
+    Returns:
+        Cluster label of every row and normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    count = len(vectors)
+    clusters = max(1, min(clusters, count))
+
+    centroids = [vectors[rng.integers(count)]]
+    distance = 1 - vectors @ centroids[0]
+    for _ in range(1, clusters):
+        weights = np.clip(distance, 0, None)
+        total = weights.sum()
+        index = rng.choice(count, p=weights / total) if total > 0 else rng.integers(count)
+        centroids.append(vectors[index])
+        distance = np.minimum(distance, 1 - vectors @ vectors[index])
+    centroids = np.stack(centroids)
+
+    labels = np.full(count, -1)
+    for _ in range(iterations):
+        new_labels = np.argmax(vectors @ centroids.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        # Empty clusters keep their centroid
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = _normalize(sums)
+    return labels, centroids
+
+
+class Preselection(BaseModel):
+    """Candidate articles for planning, most relevant first"""
+    articles: List[Article]
+    # Cosine similarity of each selected article to the topic
+    scores: List[float]
+    # Cluster of each selected article
+    clusters: List[int]
+    # Number of articles considered
+    total: int
+
+
+def preselect(
+    articles: List[Article],
+    topic: str,
+    k: int = 50,
+    embeddings: Optional[Embeddings] = None,
+    clusters: Optional[int] = None,
+    max_per_cluster: Optional[int] = None,
+    seed: int = 0
+) -> Preselection:
+    """
+    Select the articles most relevant to the topic before asking LLM to plan
+
+    Titles and summaries are embedded and ranked by cosine similarity to the topic. Articles
+    are also clustered, and max_per_cluster limits how many near-identical stories of one
+    cluster are taken, so the candidates cover more of the topic; the remaining places are
+    filled by score if the limit leaves fewer than k.
+
+    Args:
+        articles: Candidate articles
+        topic: Topic of the newsletter, e.g. Format.topic
+        k: Maximum number of selected articles
+        embeddings: Embeddings of texts, local HashingEmbedder without persistent cache if not provided
+        clusters: Number of clusters, about sqrt(len(articles) / 2) if not provided
+        max_per_cluster: Maximum number of articles per cluster, no limit if not provided
+        seed: Seed of clustering
+
+    Returns:
+        Preselection with at most k articles, most relevant first
+    """
+    if not articles:
+        return Preselection(articles=[], scores=[], clusters=[], total=0)
+
+    embeddings = embeddings or Embeddings()
+    vectors = embeddings([embedding_text(article) for article in articles])
+    query = embeddings([topic])[0]
+
+    scores = vectors @ query
+    if clusters is None:
+        clusters = round(math.sqrt(len(articles) / 2))
+    labels, _ = cluster(vectors, clusters, seed=seed)
+
+    order = np.argsort(-scores, kind='stable')
+    if max_per_cluster is None:
+        chosen = order[:k].tolist()
+    else:
+        taken = np.zeros(labels.max() + 1, dtype=int)
+        chosen, rest = [], []
+        for index in order.tolist():
+            if taken[labels[index]] < max_per_cluster:
+                taken[labels[index]] += 1
+                chosen.append(index)
+            else:
+                rest.append(index)
+            if len(chosen) == k:
+                break
+        chosen += rest[:k - len(chosen)]
+        chosen.sort(key=lambda index: -scores[index])
+
+    return Preselection(
+        articles=[articles[index] for index in chosen],
+        scores=[float(scores[index]) for index in chosen],
+        clusters=[int(labels[index]) for index in chosen],
+        total=len(articles)
+    )
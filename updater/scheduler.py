@@ -0,0 +1,304 @@
+"""
+Adaptive per-feed polling scheduler
+
+Every feed has its own polling interval learned from publication times of its entries:
+busy feeds are polled often, quiet ones rarely. Failing feeds back off exponentially.
+
+Usage:
+    python -m updater.scheduler [FEED_URL ...]
+"""
+from typing import Optional, List, Dict, Callable, Awaitable, Union
+
+import sys
+import time
+import heapq
+import random
+import asyncio
+import statistics
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+
+import httpx
+from pydantic import BaseModel
+
+from updater.cache import FeedCache
+from updater.collect import Article, _Pass, _client
+from updater.media import MediaTypeCache, MediaTypeResolver
+from updater.net import MAX_CONNECTIONS, MAX_PER_HOST, REQUEST_TIMEOUT
+from updater.state import FeedState
+from updater.utils import FeedEntry, DEFAULT_FEEDS
+
+# Bounds of polling interval in seconds
+MIN_INTERVAL = 5 * 60
+MAX_INTERVAL = 24 * 3600
+# Interval of feeds with unknown cadence
+DEFAULT_INTERVAL = 3600
+# Poll this many times per typical gap between two entries
+POLLS_PER_ENTRY = 2
+# Weight of the newest estimate in the smoothed interval
+SMOOTHING = 0.5
+# Relative random jitter of every interval
+JITTER = 0.1
+# Maximum delay after repeated errors
+MAX_BACKOFF = 6 * 3600
+# Number of newest entries used to learn the cadence
+CADENCE_ENTRIES = 20
+# Feeds polled at the same time
+MAX_CONCURRENT_FEEDS = 16
+# Seconds between saves of the seen-set, it is rewritten as a whole
+STATE_SAVE_INTERVAL = 60
+
+
+class FeedSchedule(BaseModel):
+    """Polling state and metrics of one feed"""
+    url: str
+    interval: float = DEFAULT_INTERVAL
+    next_poll: float = 0.0
+    failures: int = 0
+    polls: int = 0
+    errors: int = 0
+    articles: int = 0
+    # Duration of the last poll and its moving average in seconds
+    last_latency: Optional[float] = None
+    avg_latency: Optional[float] = None
+    # Newest publication time of emitted articles, only newer entries are emitted
+    newest: Optional[datetime] = None
+
+
+def learn_interval(entries: List[FeedEntry], previous: float) -> float:
+    """
+    Polling interval from publication times of entries
+
+    Args:
+        entries: Entries of the feed
+        previous: Current interval, smoothed with the new estimate
+
+    Returns:
+        float: New interval in seconds within MIN_INTERVAL and MAX_INTERVAL
+    """
+    published = sorted((entry.published for entry in entries if entry.published is not None), reverse=True)
+    published = published[:CADENCE_ENTRIES]
+    if len(published) < 2:
+        return previous
+
+    gaps = [(newer - older).total_seconds() for newer, older in zip(published, published[1:])]
+    # Time since the newest entry counts as a gap too, so feeds going quiet slow down
+    gaps.append((datetime.now() - published[0]).total_seconds())
+    estimate = statistics.median(gaps) / POLLS_PER_ENTRY
+    interval = SMOOTHING * estimate + (1 - SMOOTHING) * previous
+    return min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+
+
+class FeedScheduler:
+    """
+    Long-running service polling each feed when it is due
+
+    New articles of every poll are passed to sink. Due feeds wait in a queue for one of
+    max_concurrent_feeds workers; metrics() reports queue depth and per-feed latency.
+
+    Args:
+        feeds: List of RSS feed URLs
+        sink: Called with new articles of each poll (may be a coroutine function)
+        starting_point: Only articles newer than this are emitted on the first poll of a feed
+        max_concurrent_feeds: Number of feeds polled at the same time
+        cache, resolver, state, parser: Same as in anew_articles
+        save_interval: Seconds between saves of state while running, it is saved on stop too
+    """
+
+    def __init__(
+        self,
+        feeds: List[str],
+        sink: Callable[[List[Article]], Union[None, Awaitable[None]]],
+        starting_point: Optional[datetime] = None,
+        max_concurrent_feeds: int = MAX_CONCURRENT_FEEDS,
+        max_connections: int = MAX_CONNECTIONS,
+        max_per_host: int = MAX_PER_HOST,
+        timeout: float = REQUEST_TIMEOUT,
+        cache: Optional[FeedCache] = None,
+        resolver: Optional[MediaTypeResolver] = None,
+        state: Optional[FeedState] = None,
+        parser: Optional[Executor] = None,
+        save_interval: float = STATE_SAVE_INTERVAL
+    ):
+        self.sink = sink
+        self.starting_point = starting_point or datetime.now()
+        self.max_concurrent_feeds = max_concurrent_feeds
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.cache = cache
+        self.resolver = resolver
+        self.state = state
+        self.parser = parser
+        self.save_interval = save_interval
+
+        self.schedules: Dict[str, FeedSchedule] = {url: FeedSchedule(url=url) for url in feeds}
+        self._heap = [(0.0, url) for url in self.schedules]
+        heapq.heapify(self._heap)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._in_flight = 0
+        self._unsaved = 0
+        self._saved = time.monotonic()
+
+    def add_feed(self, url: str):
+        """Start polling feed, immediately"""
+        if url not in self.schedules:
+            self.schedules[url] = FeedSchedule(url=url)
+            heapq.heappush(self._heap, (0.0, url))
+
+    def _reschedule(self, schedule: FeedSchedule, now: float):
+        if schedule.failures:
+            delay = min(schedule.interval * 2 ** schedule.failures, MAX_BACKOFF)
+        else:
+            delay = schedule.interval
+        schedule.next_poll = now + delay * random.uniform(1 - JITTER, 1 + JITTER)
+        heapq.heappush(self._heap, (schedule.next_poll, schedule.url))
+
+    async def poll(self, collection: _Pass, schedule: FeedSchedule):
+        """Poll one feed, emit its new articles and adapt its interval"""
+        started = time.monotonic()
+        entries = await collection.fetch_entries(schedule.url)
+        schedule.polls += 1
+
+        if entries is None:
+            schedule.failures += 1
+            schedule.errors += 1
+        else:
+            schedule.failures = 0
+            schedule.interval = learn_interval(entries, schedule.interval)
+
+            new = collection.filter_entries(schedule.url, entries, schedule.newest or self.starting_point)
+            articles = [
+                article for article in await asyncio.gather(*(collection.article(schedule.url, entry) for entry in new))
+                if article is not None
+            ]
+            # Entries which did not make an article (e.g. unknown media type) are tried again next poll
+            published = [article.published for article in articles if article.published is not None]
+            if published:
+                schedule.newest = max(published + ([schedule.newest] if schedule.newest else []))
+            if articles:
+                schedule.articles += len(articles)
+                result = self.sink(articles)
+                if asyncio.iscoroutine(result):
+                    await result
+
+        latency = time.monotonic() - started
+        schedule.last_latency = latency
+        schedule.avg_latency = latency if schedule.avg_latency is None else 0.8 * schedule.avg_latency + 0.2 * latency
+
+    async def _worker(self, collection: _Pass):
+        while True:
+            url = await self._queue.get()
+            self._in_flight += 1
+            try:
+                await self.poll(collection, self.schedules[url])
+            except Exception as e:
+                print(f"Warning: Error polling feed {url}: {e!r}")
+                self.schedules[url].failures += 1
+                self.schedules[url].errors += 1
+            finally:
+                self._in_flight -= 1
+                self._reschedule(self.schedules[url], time.monotonic())
+                self._unsaved += 1
+                self._queue.task_done()
+
+    def _save(self, force: bool = False):
+        """Save state once per save_interval, if feeds were polled since the last save"""
+        now = time.monotonic()
+        if not force and now - self._saved < self.save_interval:
+            return
+        if self.state is not None and self._unsaved:
+            self.state.save()
+        self._unsaved = 0
+        self._saved = now
+
+    async def run(self, stop: Optional[asyncio.Event] = None, client: Optional[httpx.AsyncClient] = None):
+        """
+        Poll feeds until stop is set
+
+        Args:
+            stop: Event ending the service, runs forever if not provided
+            client: Shared async HTTP client, a new one is created (and closed) if not provided
+        """
+        if client is None:
+            async with _client(self.max_connections, self.timeout) as client:
+                return await self.run(stop, client)
+
+        stop = stop or asyncio.Event()
+        collection = _Pass(
+            client, self.max_connections, self.max_per_host, self.timeout,
+            self.cache, self.resolver, self.state, self.parser
+        )
+        workers = [asyncio.create_task(self._worker(collection)) for _ in range(self.max_concurrent_feeds)]
+        try:
+            while not stop.is_set():
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    _, url = heapq.heappop(self._heap)
+                    self._queue.put_nowait(url)
+                self._save()
+
+                # Sleep until the next feed is due or state is to be saved, waking up early when stopped
+                wait = self._heap[0][0] - now if self._heap else MIN_INTERVAL
+                if self.state is not None:
+                    wait = min(wait, self._saved + self.save_interval - now)
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=max(wait, 0.05))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._save(force=True)
+
+    def metrics(self) -> Dict:
+        """
+        Current metrics of the scheduler
+
+        Returns:
+            Dict with queue_depth (due feeds waiting for a worker), in_flight (feeds being polled)
+            and feeds (per-feed interval, latency, polls, errors and articles)
+        """
+        now = time.monotonic()
+        return {
+            'queue_depth': self._queue.qsize(),
+            'in_flight': self._in_flight,
+            'feeds': {
+                url: {
+                    'interval': schedule.interval,
+                    'due_in': max(schedule.next_poll - now, 0.0),
+                    'last_latency': schedule.last_latency,
+                    'avg_latency': schedule.avg_latency,
+                    'polls': schedule.polls,
+                    'errors': schedule.errors,
+                    'articles': schedule.articles,
+                }
+                for url, schedule in self.schedules.items()
+            }
+        }
+
+
+def main(feeds: Optional[List[str]] = None):
+    """Run scheduler printing new articles as JSON lines"""
+    feeds = feeds or sys.argv[1:] or DEFAULT_FEEDS
+
+    def sink(articles: List[Article]):
+        for article in articles:
+            print(article.model_dump_json(exclude={'content'}), flush=True)
+
+    async def serve():
+        with FeedCache() as cache, MediaTypeCache() as media_types, FeedState() as state:
+            media_types.purge()
+            resolver = MediaTypeResolver(cache=media_types)
+            with ProcessPoolExecutor() as parser:
+                await FeedScheduler(feeds, sink, cache=cache, resolver=resolver, state=state, parser=parser).run()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+from typing import Optional, Union, List, Iterable
+
+import math
+import hashlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from updater.cache import SQLiteCache
+from updater.utils import FeedEntry
+
+# Entries this much older than the high-water mark are still checked against the seen-set,
+# feeds sometimes publish entries with a slightly older date than the newest one
+HIGH_WATER_SLACK = timedelta(days=1)
+# Seen keys the Bloom filter is sized for and its false positive rate at that size,
+# the filter is rebuilt twice as large when more keys are seen
+SEEN_CAPACITY = 1_000_000
+SEEN_ERROR_RATE = 0.001
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings
+
+    Membership test can return false positives but never false negatives.
+    """
+
+    def __init__(self, size: int, hashes: int, bits: Optional[bytes] = None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.001) -> 'BloomFilter':
+        """Create filter sized for capacity items with given false positive rate"""
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def entry_keys(entry: FeedEntry) -> List[str]:
+    """Keys identifying an entry in the seen-set"""
+    keys = [entry.url]
+    if entry.guid and entry.guid != entry.url:
+        keys.append(entry.guid)
+    return keys
+
+
+class FeedState(SQLiteCache):
+    """
+    Persistent collection state across runs
+
+    Keeps per-feed high-water mark (newest seen publication time) and a seen-set of entry
+    URLs and GUIDs. The seen-set is stored exactly in SQLite and fronted by a Bloom filter,
+    so checking a new entry does not touch the database at all.
+
+    Bloom filter is saved on save()/close(). If it is out of date (e.g. after a crash) or
+    too small for its false positive rate it is rebuilt from the exact storage.
+
+    Args:
+        path: SQLite file, FILENAME in CACHE_DIR if not provided
+        capacity: Number of seen keys the Bloom filter is sized for
+        error_rate: False positive rate of the Bloom filter at capacity
+    """
+    FILENAME = 'state.sqlite'
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS marks (
+        feed TEXT PRIMARY KEY,
+        high_water TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS seen (
+        id INTEGER PRIMARY KEY,
+        key TEXT NOT NULL UNIQUE,
+        feed TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS bloom (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        size INTEGER NOT NULL,
+        hashes INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        bits BLOB NOT NULL
+    );
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        capacity: int = SEEN_CAPACITY,
+        error_rate: float = SEEN_ERROR_RATE
+    ):
+        super().__init__(path)
+        self.error_rate = error_rate
+        # Rows are never deleted, so the largest id is the number of seen keys
+        self.count = self._db.execute('SELECT COALESCE(MAX(id), 0) FROM seen').fetchone()[0]
+        self.capacity = max(capacity, self.count)
+
+        row = self._db.execute('SELECT size, hashes, count, bits FROM bloom WHERE id = 0').fetchone()
+        required = BloomFilter.for_capacity(self.capacity, error_rate)
+        if row is not None and row[2] == self.count and row[0] >= required.size:
+            self.bloom = BloomFilter(row[0], row[1], row[3])
+            # Saved filter may have grown beyond capacity
+            self.capacity = max(self.capacity, math.floor(-row[0] * math.log(2) ** 2 / math.log(error_rate)))
+        else:
+            self._rebuild(required)
+
+    def _rebuild(self, bloom: BloomFilter):
+        for (key,) in self._db.execute('SELECT key FROM seen'):
+            bloom.add(key)
+        self.bloom = bloom
+
+    def high_water(self, feed: str) -> Optional[datetime]:
+        """Newest publication time seen in feed"""
+        row = self._db.execute('SELECT high_water FROM marks WHERE feed = ?', (feed,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def is_new(self, keys: Iterable[str]) -> bool:
+        """True if none of keys was seen before"""
+        candidates = [key for key in keys if key in self.bloom]
+        if not candidates:
+            return True
+        # Bloom filter can be wrong only about seen keys, confirm with exact storage
+        placeholders = ', '.join('?' * len(candidates))
+        row = self._db.execute(f'SELECT 1 FROM seen WHERE key IN ({placeholders}) LIMIT 1', candidates).fetchone()
+        return row is None
+
+    def record(self, feed: str, entries: List[FeedEntry]) -> List[FeedEntry]:
+        """
+        Mark entries of feed as seen and move its high-water mark
+
+        Args:
+            feed: URL of the feed
+            entries: Entries to record
+
+        Returns:
+            Entries which were not seen before
+        """
+        new = []
+        with self._db:
+            for entry in entries:
+                keys = entry_keys(entry)
+                if not self.is_new(keys):
+                    continue
+                new.append(entry)
+                for key in keys:
+                    cursor = self._db.execute('INSERT OR IGNORE INTO seen (key, feed) VALUES (?, ?)', (key, feed))
+                    self.count += cursor.rowcount
+                    self.bloom.add(key)
+
+            if self.count > self.capacity:
+                self.capacity *= 2
+                self._rebuild(BloomFilter.for_capacity(self.capacity, self.error_rate))
+
+            published = [entry.published for entry in entries if entry.published is not None]
+            high_water = self.high_water(feed)
+            if published and (high_water is None or max(published) > high_water):
+                self._db.execute(
+                    'INSERT OR REPLACE INTO marks (feed, high_water) VALUES (?, ?)',
+                    (feed, max(published).isoformat())
+                )
+
+        return new
+
+    def save(self):
+        """Persist Bloom filter"""
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO bloom (id, size, hashes, count, bits) VALUES (0, ?, ?, ?, ?)',
+                (self.bloom.size, self.bloom.hashes, self.count, bytes(self.bloom.bits))
+            )
+
+    def close(self):
+        self.save()
+        super().close()
@@ -0,0 +1,181 @@
+from typing import Optional, List, Iterable, Iterator, Tuple
+
+import uuid
+from datetime import datetime
+
+from updater.cache import SQLiteCache
+from updater.collect import Article
+
+# Rows fetched from SQLite at once by streaming queries
+FETCH_SIZE = 500
+
+_COLUMNS = 'id, url, title, summary, content_hash, mime_type, feed, published'
+
+
+class ArticleStore(SQLiteCache):
+    """
+    Persistent, indexed store of collected articles
+
+    Articles are indexed by feed, publication time, media type and URL, and title and summary
+    are indexed for full-text search (SQLite FTS5). Article URL is unique, adding an already
+    stored article is a no-op, so collection passes can write into the store incrementally.
+
+    Inline content is not stored, bodies are referenced by content_hash (see updater.content).
+    """
+    FILENAME = 'articles.sqlite'
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS articles (
+        rowid INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        url TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL,
+        summary TEXT,
+        content_hash TEXT,
+        mime_type TEXT NOT NULL,
+        feed TEXT,
+        published TEXT
+    );
+    CREATE INDEX IF NOT EXISTS articles_published ON articles (published);
+    CREATE INDEX IF NOT EXISTS articles_feed ON articles (feed, published);
+    CREATE INDEX IF NOT EXISTS articles_mime_type ON articles (mime_type, published);
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+        title, summary, content='articles', content_rowid='rowid'
+    );
+    CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+        INSERT INTO articles_fts (rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+    END;
+    CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+        INSERT INTO articles_fts (articles_fts, rowid, title, summary) VALUES ('delete', old.rowid, old.title, old.summary);
+    END;
+    CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+        INSERT INTO articles_fts (articles_fts, rowid, title, summary) VALUES ('delete', old.rowid, old.title, old.summary);
+        INSERT INTO articles_fts (rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+    END;
+    """
+
+    def add(self, articles: Iterable[Article]) -> int:
+        """
+        Store articles, skipping URLs already stored
+
+        Args:
+            articles: Articles to store
+
+        Returns:
+            int: Number of newly stored articles
+        """
+        rows = (
+            (
+                str(article.id), article.url, article.title, article.summary, article.content_hash,
+                article.mime_type, article.feed, article.published.isoformat() if article.published else None
+            )
+            for article in articles
+        )
+        with self._db:
+            # Sum of rows inserted by each statement, ignored duplicates and trigger writes are not counted
+            cursor = self._db.executemany(f'INSERT OR IGNORE INTO articles ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            return max(cursor.rowcount, 0)
+
+    @staticmethod
+    def _article(row: Tuple) -> Article:
+        return Article(
+            id=uuid.UUID(row[0]),
+            url=row[1],
+            title=row[2],
+            summary=row[3],
+            content_hash=row[4],
+            mime_type=row[5],
+            feed=row[6],
+            published=datetime.fromisoformat(row[7]) if row[7] else None
+        )
+
+    def get(self, article_id: uuid.UUID) -> Optional[Article]:
+        row = self._db.execute(f'SELECT {_COLUMNS} FROM articles WHERE id = ?', (str(article_id),)).fetchone()
+        return self._article(row) if row else None
+
+    def get_by_url(self, url: str) -> Optional[Article]:
+        row = self._db.execute(f'SELECT {_COLUMNS} FROM articles WHERE url = ?', (url,)).fetchone()
+        return self._article(row) if row else None
+
+    def _where(
+        self,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        feed: Optional[str],
+        media_type: Optional[str],
+        text: Optional[str]
+    ) -> Tuple[str, List]:
+        conditions, params = [], []
+        if since is not None:
+            conditions.append('a.published >= ?')
+            params.append(since.isoformat())
+        if until is not None:
+            conditions.append('a.published < ?')
+            params.append(until.isoformat())
+        if feed is not None:
+            conditions.append('a.feed = ?')
+            params.append(feed)
+        if media_type is not None:
+            conditions.append('a.mime_type = ?')
+            params.append(media_type)
+        if text is not None:
+            conditions.append('a.rowid IN (SELECT rowid FROM articles_fts WHERE articles_fts MATCH ?)')
+            params.append(text)
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+    def query(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        feed: Optional[str] = None,
+        media_type: Optional[str] = None,
+        text: Optional[str] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = True
+    ) -> Iterator[Article]:
+        """
+        Stream articles matching all given filters
+
+        Rows are read from a cursor FETCH_SIZE at a time, so large ranges are never held in memory.
+
+        Args:
+            since: Published at or after
+            until: Published before
+            feed: URL of the feed
+            media_type: Media type of the article
+            text: FTS5 query over title and summary, e.g. 'mars OR "space station"'
+            limit: Maximum number of articles
+            newest_first: Order by publication time descending, ascending otherwise
+
+        Yields:
+            Article objects
+        """
+        where, params = self._where(since, until, feed, media_type, text)
+        sql = f'SELECT {", ".join("a." + c for c in _COLUMNS.split(", "))} FROM articles a{where}'
+        sql += ' ORDER BY a.published ' + ('DESC' if newest_first else 'ASC')
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        cursor = self._db.execute(sql, params)
+        try:
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                for row in rows:
+                    yield self._article(row)
+        finally:
+            cursor.close()
+
+    def count(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        feed: Optional[str] = None,
+        media_type: Optional[str] = None,
+        text: Optional[str] = None
+    ) -> int:
+        """Number of articles matching all given filters, same as in query"""
+        where, params = self._where(since, until, feed, media_type, text)
+        return self._db.execute(f'SELECT COUNT(*) FROM articles a{where}', params).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
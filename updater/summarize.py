@@ -0,0 +1,190 @@
+from typing import Optional, List, Any
+
+import time
+import random
+import asyncio
+import hashlib
+
+from pydantic import BaseModel, Field
+
+from updater.cache import SQLiteCache
+from updater.collect import Article, _run
+
+# Defaults of the summarization stage
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 6
+# Base and maximum delay of backoff after 429 in seconds
+BACKOFF = 2.0
+MAX_BACKOFF = 60.0
+
+PROMPT = 'Analyze the article'
+
+
+class Summary(BaseModel):
+    title: str = Field(description='Title of the article')
+    short: str = Field(description='Tweet like summary of the article')
+    long: str = Field(description='Summary of the article in form of independent text. Length of the text should be 250 words. Audience of this new version will consume it on the mobile phone during their commute. Respond in Markdown, each point as header3 and short support text for point.')
+    links: List[str] = Field(description='If article refer to another interesting informations, list of urls')
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter
+
+    Args:
+        rate: Tokens added per second, e.g. requests per minute quota / 60
+        capacity: Maximum burst, rate if not provided
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # Lock belongs to the event loop it was created in, sync callers run each batch in a new loop
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until tokens are available and take them"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class SummaryCache(SQLiteCache):
+    """Persistent summaries keyed by hash of article content, prompt and model"""
+    FILENAME = 'summaries.sqlite'
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS summaries (
+        key TEXT PRIMARY KEY,
+        summary TEXT NOT NULL
+    ) WITHOUT ROWID;
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._db.execute('SELECT summary FROM summaries WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, summary: str):
+        with self._db:
+            self._db.execute('INSERT OR REPLACE INTO summaries (key, summary) VALUES (?, ?)', (key, summary))
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP status of the error, also of errors wrapping the response (e.g. httpx, openai)"""
+    response = getattr(error, 'response', None)
+    for code in (getattr(error, 'code', None), getattr(error, 'status_code', None), getattr(response, 'status_code', None)):
+        # grpc errors have code() method returning a status enum instead
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """True for quota errors (HTTP 429 / RESOURCE_EXHAUSTED) of any client library"""
+    if _status_code(error) == 429:
+        return True
+    return type(error).__name__ in ('ResourceExhausted', 'TooManyRequests', 'RateLimitError')
+
+
+class Summarizer:
+    """
+    Summarization stage with bounded concurrency, rate limiting, retries and persistent cache
+
+    Args:
+        llm: Runnable returning Summary, e.g. ChatVertexAI(model=...).with_structured_output(Summary, method='json_mode')
+        model: Name of the model, part of the cache key
+        prompt: Instruction sent with each article, part of the cache key
+        cache: Persistent cache, summaries are not cached if not provided
+        max_concurrency: Maximum number of requests in flight
+        rate_limiter: Token bucket respecting the quota, e.g. TokenBucket(rate=60 / 60) for 60 requests per minute
+        max_retries: Retries of a rate-limited request
+        output: Model the cached summaries are validated into
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        model: str,
+        prompt: str = PROMPT,
+        cache: Optional[SummaryCache] = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+        rate_limiter: Optional[TokenBucket] = None,
+        max_retries: int = MAX_RETRIES,
+        output: type = Summary
+    ):
+        self.llm = llm
+        self.model = model
+        self.prompt = prompt
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.output = output
+
+    def messages(self, article: Article) -> list:
+        """Request for one article, the model reads the article from its URL"""
+        return [
+            ("user", [{"type": "text", "text": self.prompt},
+                      {"type": "media", "mime_type": article.mime_type, "file_uri": article.url}])
+        ]
+
+    def key(self, article: Article) -> str:
+        """Cache key from article content (or its URL and text if not fetched), prompt and model"""
+        content = article.content_hash or '\0'.join([article.url, article.title, article.summary or ''])
+        return hashlib.sha256('\0'.join([content, self.prompt, self.model]).encode()).hexdigest()
+
+    async def _invoke(self, article: Article, semaphore: asyncio.Semaphore) -> Optional[BaseModel]:
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                try:
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.acquire()
+                    return await self.llm.ainvoke(self.messages(article))
+                except Exception as e:
+                    if not _is_rate_limited(e) or attempt == self.max_retries:
+                        print(f"Warning: Error summarizing {article.url}: {e!r}")
+                        return None
+            # Full jitter backoff, outside of the semaphore so other articles can proceed
+            await asyncio.sleep(random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** attempt)))
+        return None
+
+    async def _summarize(self, article: Article, semaphore: asyncio.Semaphore) -> Optional[BaseModel]:
+        key = self.key(article)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return self.output.model_validate_json(cached)
+
+        summary = await self._invoke(article, semaphore)
+        if summary is not None and self.cache is not None:
+            self.cache.put(key, summary.model_dump_json())
+        return summary
+
+    async def asummarize(self, articles: List[Article]) -> List[Optional[BaseModel]]:
+        """
+        Summarize articles concurrently
+
+        Args:
+            articles: Articles to summarize
+
+        Returns:
+            Summaries in order of articles, None where summarization failed
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(*(self._summarize(article, semaphore) for article in articles))
+
+    def summarize(self, articles: List[Article]) -> List[Optional[BaseModel]]:
+        """Synchronous wrapper around asummarize"""
+        return _run(self.asummarize(articles))